@@ -24,7 +24,7 @@ import re
 import numpy as np
 import inspect
 from matplotlib.patches import Ellipse
-from . import space
+from . import space, misc
 
 
 # =============================================================================
@@ -80,8 +80,8 @@ class Data:
         Set colour space and data.
 
         A new dictionary is constructed, and the data are added in the
-        provided colour space, as well as in the XYZ colour space
-        (using the SpaceXYZ class).
+        provided colour space. Conversions to other colour spaces,
+        including XYZ, are postponed until the data are requested.
 
         Parameters
         ----------
@@ -91,15 +91,17 @@ class Data:
             The colour data in the given space.
         """
         ndata = np.array(ndata)
+        self.space = sp
         self.data = dict()
         self.data[sp] = ndata
         self.sh = ndata.shape
-        linear_data = self.linearise(ndata)
-        if sp == space.xyz:
-            self.linear_XYZ = linear_data
-        else:
-            self.linear_XYZ = sp.to_XYZ(linear_data)
-            self.data[space.xyz] = np.reshape(self.linear_XYZ, self.sh)
+
+    @property
+    def linear_XYZ(self):
+        """
+        The colour data in the XYZ colour space in PxC format.
+        """
+        return self.get_linear(space.xyz)
 
     def get(self, sp):
         """
@@ -107,7 +109,11 @@ class Data:
 
         If the data do not currently exist in the required colour
         space, the necessary colour conversion will take place, and
-        the results stored in the object or future use.
+        the results stored in the object or future use. The conversion
+        starts from the nearest space in the chain of base spaces of sp
+        for which the data exist. If there is none, the data are
+        converted from the original space to the nearest common base
+        space, which is XYZ at the latest.
 
         Parameters
         ----------
@@ -121,11 +127,23 @@ class Data:
         """
         if sp in self.data:
             return self.data[sp]
+        chain = sp.base_chain()
+        for k, anc in enumerate(chain):
+            if anc in self.data:
+                linear_data = self.linearise(self.data[anc])
+                break
         else:
-            linear_data = sp.from_XYZ(self.linear_XYZ)
-            ndata = np.reshape(linear_data, self.sh)
-            self.data[sp] = ndata
-            return ndata
+            linear_data = self.linearise(self.data[self.space])
+            for anc in self.space.base_chain():
+                if anc in chain:
+                    break
+                linear_data = anc.to_base(linear_data)
+            k = chain.index(anc)
+        for s in reversed(chain[:k]):
+            linear_data = s.from_base(linear_data)
+        ndata = np.reshape(linear_data, self.sh)
+        self.data[sp] = ndata
+        return ndata
 
     def get_linear(self, sp):
         """
@@ -179,6 +197,15 @@ class Data:
 class TensorData:
     """
     Class for keeping colour metric data in various colour spaces.
+
+    The metric tensors are kept as structured misc.SymTensor objects in
+    each colour space: constant (e.g., identity for Euclidean metrics),
+    diagonal, or full. Full tensors are stored in packed form with the six
+    independent components (g00, g11, g22, g12, g02, g01) only, see
+    misc.pack_sym. The tensors are expanded to arrays only when requested
+    by the get methods, and converted to other colour spaces only when
+    first needed. The conversion goes through the nearest common base
+    space of the two spaces, which is XYZ at the latest.
     """
 
     # Cross sectional planes for ellipses
@@ -202,8 +229,10 @@ class TensorData:
             The colour space for the given tensor data.
         points_data : Data
             The colour points for the given tensor data.
-        metrics_ndata : ndarray
-            The tensor data in the given colour space at the given points.
+        metrics_ndata : ndarray or SymTensor
+            The tensor data in the given colour space at the given points,
+            either as N x 3 x 3 full or N x 6 packed tensors, or as a
+            structured tensor.
         """
         self.set(sp, points_data, metrics_ndata)
 
@@ -213,8 +242,8 @@ class TensorData:
 
         The points_data are taken care already of the type Data. A new
         dictionary is constructed, and the metrics_ndata are added in
-        the provided colour space, as well as in the XYZ colour space
-        (using the SpaceXYZ class).
+        the provided colour space. The conversion to the XYZ colour space
+        is postponed until the tensors are needed in another colour space.
 
         Parameters
         ----------
@@ -222,19 +251,21 @@ class TensorData:
             The colour space for the given tensor data.
         points_data : Data
             The colour points for the given tensor data.
-        metrics_ndata : ndarray
-            The tensor data in the given colour space at the given points.
+        metrics_ndata : ndarray or SymTensor
+            The tensor data in the given colour space at the given points,
+            either as N x 3 x 3 full or N x 6 packed tensors, or as a
+            structured tensor.
         """
+        if not isinstance(metrics_ndata, misc.SymTensor):
+            metrics_ndata = misc.SymFull(metrics_ndata)
+        self.space = sp
         self.points = points_data
         self.metrics = dict()
         self.metrics[sp] = metrics_ndata
-        if sp != space.xyz:
-            self.metrics[space.xyz] = \
-                sp.metrics_to_XYZ(points_data, metrics_ndata)
 
-    def get(self, sp):
+    def get_tensor(self, sp):
         """
-        Return metric data in required colour space.
+        Return metric data in required colour space as a SymTensor.
 
         If the data do not currently exist in the required colour
         space, the necessary colour conversion will take place, and
@@ -247,15 +278,54 @@ class TensorData:
 
         Returns
         -------
-        tensors : ndarray
-            Array of tensors in the given colour space.
+        tensors : SymTensor
+            The structured tensors in the given colour space.
         """
         if sp in self.metrics:
             return self.metrics[sp]
-        else:
-            self.metrics[sp] = \
-                sp.metrics_from_XYZ(self.points, self.metrics[space.xyz])
-            return self.metrics[sp]
+        chain = self.space.base_chain()
+        for anc in sp.base_chain():
+            if anc in chain:
+                break
+        jac = self.space.jacobian_ancestor_structured(self.points, anc).dot(
+            sp.inv_jacobian_ancestor_structured(self.points, anc))
+        self.metrics[sp] = self.metrics[self.space].congruence(jac)
+        return self.metrics[sp]
+
+    def get_packed(self, sp):
+        """
+        Return metric data in required colour space in packed form.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space in which to return the tensor data.
+
+        Returns
+        -------
+        tensors : ndarray
+            N x 6 array of packed tensors in the given colour space.
+        """
+        n = int(np.prod(self.points.sh[:-1]))
+        return self.get_tensor(sp).packed(n)
+
+    def get(self, sp):
+        """
+        Return metric data in required colour space.
+
+        The tensors are expanded to full matrices.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space in which to return the tensor data.
+
+        Returns
+        -------
+        tensors : ndarray
+            N x 3 x 3 array of tensors in the given colour space.
+        """
+        return misc.unpack_sym(self.get_packed(sp))
 
     def get_ellipse_parameters(self, sp, plane=plane_xy, scale=1):
         """
@@ -279,25 +349,22 @@ class TensorData:
         a_b_theta : ndarray
             N x 3 array of a, b, theta ellipse parameters.
         """
-        metrics = self.get(sp).copy()
-        points = self.points.get_linear(sp).copy()
-        a_b_theta = np.zeros(np.shape(points))
-        metrics = metrics[:, plane, plane]
-        points = points[:, plane]
-        for i in range(np.shape(metrics)[0]):
-            g11 = metrics[i, 0, 0]
-            g22 = metrics[i, 1, 1]
-            g12 = metrics[i, 0, 1]
-            theta = np.arctan2(2*g12, g11 - g22) * 0.5
-            if theta == 0:
-                a = 1 / np.sqrt(g11)
-                b = 1 / np.sqrt(g22)
-            else:
-                a = 1 / np.sqrt(g22 + g12 / np.tan(theta))
-                b = 1 / np.sqrt(g11 - g12 / np.tan(theta))
-            a_b_theta[i, 0] = a * scale
-            a_b_theta[i, 1] = b * scale
-            a_b_theta[i, 2] = theta
+        metrics = self.get_packed(sp)
+        i, j = np.arange(3)[plane]
+        g11 = metrics[:, misc.sym_index[i, i]]
+        g22 = metrics[:, misc.sym_index[j, j]]
+        g12 = metrics[:, misc.sym_index[i, j]]
+        theta = np.arctan2(2*g12, g11 - g22) * 0.5
+        a = 1 / np.sqrt(g11)
+        b = 1 / np.sqrt(g22)
+        rot = theta != 0
+        tan_theta = np.tan(theta[rot])
+        a[rot] = 1 / np.sqrt(g22[rot] + g12[rot] / tan_theta)
+        b[rot] = 1 / np.sqrt(g11[rot] - g12[rot] / tan_theta)
+        a_b_theta = np.zeros((np.shape(metrics)[0], 3))
+        a_b_theta[:, 0] = a * scale
+        a_b_theta[:, 1] = b * scale
+        a_b_theta[:, 2] = theta
         return a_b_theta
 
     def get_ellipses(self, sp, plane=plane_xy, scale=1):
@@ -334,6 +401,115 @@ class TensorData:
         return ells
 
 
+class CovarianceData:
+    """
+    Class for keeping colour data with uncertainties in various colour spaces.
+
+    Holds the mean colours as a Data object and their covariance matrices
+    as structured misc.SymTensor objects, like TensorData. Covariances are
+    contravariant tensors, and are propagated to first order by
+    Sigma' = J Sigma J^T, where J is the Jacobian of the conversion. The
+    conversion goes through the nearest common base space of the two
+    spaces, and is done only when first needed.
+    """
+
+    def __init__(self, sp, points_data, cov_ndata):
+        """
+        Construct new instance and set colour space and data.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space for the given covariance data.
+        points_data : Data
+            The mean colours for the given covariance data.
+        cov_ndata : ndarray or SymTensor
+            The covariances in the given colour space at the given points,
+            either as N x 3 x 3 full or N x 6 packed tensors, or as a
+            structured tensor.
+        """
+        if not isinstance(cov_ndata, misc.SymTensor):
+            cov_ndata = misc.SymFull(cov_ndata)
+        self.space = sp
+        self.points = points_data
+        self.cov = dict()
+        self.cov[sp] = cov_ndata
+
+    def get_tensor(self, sp):
+        """
+        Return covariance data in required colour space as a SymTensor.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space in which to return the covariance data.
+
+        Returns
+        -------
+        cov : SymTensor
+            The structured covariances in the given colour space.
+        """
+        if sp in self.cov:
+            return self.cov[sp]
+        chain = self.space.base_chain()
+        for anc in sp.base_chain():
+            if anc in chain:
+                break
+        jac = sp.jacobian_ancestor_structured(self.points, anc).dot(
+            self.space.inv_jacobian_ancestor_structured(self.points, anc))
+        self.cov[sp] = self.cov[self.space].congruence(jac.transpose())
+        return self.cov[sp]
+
+    def get_packed(self, sp):
+        """
+        Return covariance data in required colour space in packed form.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space in which to return the covariance data.
+
+        Returns
+        -------
+        cov : ndarray
+            N x 6 array of packed covariances in the given colour space.
+        """
+        n = int(np.prod(self.points.sh[:-1]))
+        return self.get_tensor(sp).packed(n)
+
+    def get(self, sp):
+        """
+        Return covariance data in required colour space.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space in which to return the covariance data.
+
+        Returns
+        -------
+        cov : ndarray
+            N x 3 x 3 array of covariances in the given colour space.
+        """
+        return misc.unpack_sym(self.get_packed(sp))
+
+    def get_std(self, sp):
+        """
+        Return the standard deviations of the coordinates.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space of the coordinates.
+
+        Returns
+        -------
+        std : ndarray
+            N x 3 array of standard deviations in the given colour space.
+        """
+        return np.sqrt(self.get_packed(sp)[:, :3])
+
+
 # =============================================================================
 # Colour data sets
 # =============================================================================
@@ -544,19 +720,8 @@ def d_regular(sp, x_val, y_val, z_val):
     data : Data
         Regular structure of colour data in the given colour space.
     """
-    x_len = np.shape(x_val)[0]
-    y_len = np.shape(y_val)[0]
-    z_len = np.shape(z_val)[0]
-    tot_len = x_len * y_len * z_len
-    ndata = np.zeros((tot_len, 3))
-    l = 0
-    for i in range(x_len):
-        for j in range(y_len):
-            for k in range(z_len):
-                ndata[l, 0] = x_val[i]
-                ndata[l, 1] = y_val[j]
-                ndata[l, 2] = z_val[k]
-                l = l + 1
+    grid = np.meshgrid(x_val, y_val, z_val, indexing='ij')
+    ndata = np.column_stack([np.ravel(g) for g in grid]).astype(float)
     return Data(sp, ndata)
 
 # TODO:
@@ -596,12 +761,11 @@ def g_MacAdam():
     g11 = (np.cos(theta)/a)**2 + (np.sin(theta)/b)**2
     g22 = (np.sin(theta)/a)**2 + (np.cos(theta)/b)**2
     g12 = np.cos(theta)*np.sin(theta)*(1/a**2 - 1/b**2)
-    g = np.zeros((25, 3, 3))
-    g[:, 0, 0] = g11
-    g[:, 1, 1] = g22
-    g[:, 2, 2] = 1e3            # arbitrary!
-    g[:, 0, 1] = g12
-    g[:, 1, 0] = g12
+    g = np.zeros((25, 6))
+    g[:, 0] = g11
+    g[:, 1] = g22
+    g[:, 2] = 1e3               # arbitrary!
+    g[:, 5] = g12
     return TensorData(space.xyY, points, g)
 
 
@@ -636,12 +800,11 @@ def g_three_observer():
     g11 = (np.cos(theta) / a)**2 + (np.sin(theta) / b)**2
     g22 = (np.sin(theta) / a)**2 + (np.cos(theta) / b)**2
     g12 = np.cos(theta)*np.sin(theta)*(1 / a**2 - 1 / b**2)
-    g = np.zeros((28, 3, 3))
-    g[:, 0, 0] = g11
-    g[:, 1, 1] = g22
-    g[:, 2, 2] = 1e3            # arbitrary!
-    g[:, 0, 1] = g12
-    g[:, 1, 0] = g12
+    g = np.zeros((28, 6))
+    g[:, 0] = g11
+    g[:, 1] = g22
+    g[:, 2] = 1e3               # arbitrary!
+    g[:, 5] = g12
     return TensorData(space.xyY, points, g)
 
 
@@ -680,16 +843,13 @@ def g_Melgosa_Lab():
     m_gLL = np.array([1.1973, 1.6246, 1.3061, 1.0817, 1.1507, 1.2378, 0.9709,
                       0.7855, 1.3469, 0.6585, 0.9418, 0.9913, 0.8693, 0.8080,
                       0.8277, 0.5755, 0.9311, 0.5322, 0.4228])
-    m_Lab_metric = np.zeros((19, 3, 3))
-    m_Lab_metric[:, 0, 0] = m_gLL
-    m_Lab_metric[:, 1, 1] = m_gaa
-    m_Lab_metric[:, 2, 2] = m_gbb
-    m_Lab_metric[:, 0, 1] = m_gLa
-    m_Lab_metric[:, 1, 0] = m_gLa
-    m_Lab_metric[:, 0, 2] = m_gLb
-    m_Lab_metric[:, 2, 0] = m_gLb
-    m_Lab_metric[:, 1, 2] = m_gab
-    m_Lab_metric[:, 2, 1] = m_gab
+    m_Lab_metric = np.zeros((19, 6))
+    m_Lab_metric[:, 0] = m_gLL
+    m_Lab_metric[:, 1] = m_gaa
+    m_Lab_metric[:, 2] = m_gbb
+    m_Lab_metric[:, 3] = m_gab
+    m_Lab_metric[:, 4] = m_gLb
+    m_Lab_metric[:, 5] = m_gLa
     return TensorData(space.cielab, d_Melgosa(), m_Lab_metric)
 
 
@@ -723,16 +883,13 @@ def g_Melgosa_xyY():
     m_g33 = np.array([5.745, 2.426, 1.146, 1.111, 0.845, 2.311, 2.878, 0.287,
                       0.912, 21.381, 0.517, 9.775, 3.823, 0.687, 23.949, 0.564,
                       6.283, 0.160, 0.169])
-    m_xyY_metric = np.zeros((19, 3, 3))
-    m_xyY_metric[:, 0, 0] = m_g11
-    m_xyY_metric[:, 1, 1] = m_g22
-    m_xyY_metric[:, 2, 2] = m_g33
-    m_xyY_metric[:, 0, 1] = m_g12
-    m_xyY_metric[:, 1, 0] = m_g12
-    m_xyY_metric[:, 0, 2] = m_g13
-    m_xyY_metric[:, 2, 0] = m_g13
-    m_xyY_metric[:, 1, 2] = m_g23
-    m_xyY_metric[:, 2, 1] = m_g23
+    m_xyY_metric = np.zeros((19, 6))
+    m_xyY_metric[:, 0] = m_g11
+    m_xyY_metric[:, 1] = m_g22
+    m_xyY_metric[:, 2] = m_g33
+    m_xyY_metric[:, 3] = m_g23
+    m_xyY_metric[:, 4] = m_g13
+    m_xyY_metric[:, 5] = m_g12
     m_xyY_metric = 1e4*m_xyY_metric
     return TensorData(space.xyY, d_Melgosa(), m_xyY_metric)
 
@@ -775,12 +932,11 @@ def g_BFD(dataset='P'):
     g11 = (np.cos(theta) / a)**2 + (np.sin(theta) / b)**2
     g22 = (np.sin(theta) / a)**2 + (np.cos(theta) / b)**2
     g12 = np.cos(theta) * np.sin(theta) * (1 / a**2 - 1 / b**2)
-    g = np.zeros((np.shape(rawdata)[0], 3, 3))
-    g[:, 0, 0] = g11
-    g[:, 1, 1] = g22
-    g[:, 2, 2] = 1e3            # arbitrary!
-    g[:, 0, 1] = g12
-    g[:, 1, 0] = g12
+    g = np.zeros((np.shape(rawdata)[0], 6))
+    g[:, 0] = g11
+    g[:, 1] = g22
+    g[:, 2] = 1e3               # arbitrary!
+    g[:, 5] = g12
     return TensorData(space.xyY, points, g)
 
 
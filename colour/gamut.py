@@ -26,6 +26,7 @@ from scipy import spatial
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import art3d
 import scipy as sci
+from . import data, metric, space
 
 
 class Gamut:
@@ -48,6 +49,10 @@ class Gamut:
         self.simplices = None    # Initialized by initialize_(modified)convex_hull
         self.neighbors = None    # Initialized by initialize_(modified)convex_hull
         self.center = None       # Initialized by initialize_(modified)convex_hull
+        self.convex = False      # True if the hull is the convex hull in the original space
+        self.gamma = 1           # Exponent of the modified convex hull method
+        self.facets = {}         # Facet coordinates for each colour space, computed by get_facets
+        self.trees = {}          # Bounding volume hierarchies for each colour space, computed by get_tree
 
         if gamma == 1:
             self.initialize_convex_hull()
@@ -69,6 +74,7 @@ class Gamut:
         self.simplices = self.hull.simplices
         self.neighbors = self.hull.neighbors
         self.center = self.center_of_mass(self.get_coordinates(self.vertices))
+        self.convex = True
 
     def initialize_modified_convex_hull(self, gamma, center):
         """Initializes the gamut with the modified convex hull method.
@@ -78,45 +84,102 @@ class Gamut:
         :param center: ndarray
             Center of expansion.
         """
-        # Move all points so that 'center' is origin
-        n_data = self.data.get(self.space)
-
-        i = 0
-        for point in n_data:
-            point -= center                             # Adjust all points, so center is origin
-            r = np.linalg.norm(point)                   # Get the points radius.
-            n_data[i] = point * (r ** gamma / r)        # Modify their radius
-            i += 1
+        self.gamma = gamma
+        self.center = center
 
         # Calculate the convex hull, with the modified radius's
-        self.hull = spatial.ConvexHull(n_data)
+        self.hull = spatial.ConvexHull(self.modify_radius(self.data.get_linear(self.space)))
         self.vertices = self.hull.vertices
         self.simplices = self.hull.simplices
         self.neighbors = self.hull.neighbors
-        self.center = center
 
-    def is_inside(self, sp, c_data):
+    def modify_radius(self, points):
+        """Applies the radial mapping of the modified convex hull method to the points.
+
+        The points are moved so that the center of expansion is origin, and the radius r of each point is replaced
+        by r ** gamma. The hull of a modified gamut is convex in the mapped coordinates.
+
+        :param points: ndarray
+            shape(N, 3) The points to be mapped.
+        :return: ndarray
+            shape(N, 3) The mapped points.
+        """
+        points = points - self.center                                   # Adjust all points, so center is origin
+        r = np.linalg.norm(points, axis=-1, keepdims=True)              # Get the points radius.
+        return points * np.where(r > 0, r, 1) ** (self.gamma - 1)      # Modify their radius
+
+    def restore_radius(self, points):
+        """Inverse of modify_radius, mapping points from the mapped coordinates back to the colour space.
+
+        :param points: ndarray
+            shape(N, 3) The mapped points.
+        :return: ndarray
+            shape(N, 3) The points in the colour space of the gamut.
+        """
+        r = np.linalg.norm(points, axis=-1, keepdims=True)
+        return self.center + points * np.where(r > 0, r, 1) ** (1 / self.gamma - 1)
+
+    def is_inside(self, sp, c_data, tol=1e-8, block=2**12, tree=None):
         """For the given data points checks if points are inn the convex hull
 
+        The points are tested with the vectorised half-space test in_half_spaces. For gamuts initialized with the
+        modified convex hull method, the points are first mapped with modify_radius, since the hull is convex in
+        the mapped coordinates only.
+
         :param sp : colour.Space
             The colour space for computing the gamut.
         :param c_data : colour.Data
             Data object with the colour points for the gamut.
+        :param tol: float
+            Tolerance for points on the surface, relative to the extent of the (mapped) gamut.
+        :param block: int
+            Number of points tested at a time.
+        :param tree: bool or None
+            Use the bounding volume hierarchy from get_tree instead of testing all facets, for large hulls. A point
+            is then inside if the line from the center of the gamut to the point does not leave the hull. If None,
+            the hierarchy is used for hulls with more than 2**13 facets, where it is the faster of the two.
         :return ndarray
             A array shape(c_data.get()-1) which contains True for each point included in the convexHull, else False.
         """
 
         nd_data = c_data.get(sp)                                    # Get the data points as ndarray
 
-        if nd_data.ndim == 1:                                       # If only one point was sent.
-            return np.array([self.feito_torres(nd_data)])    # Returns 1d boolean-array
-
+        points = np.reshape(nd_data, (-1, 3))
+        center = self.center
+        if not self.convex:
+            points = self.modify_radius(points)
+            center = np.zeros(3)                    # The center of expansion is origin in mapped coordinates
+        if tree is None:
+            tree = np.shape(self.simplices)[0] > 2**13
+        if tree:
+            alpha = self.get_tree(None).intersect(points, center, block=block)
+            inside = ~(alpha < 1 - tol)             # No intersection (NaN) or beyond the point
         else:
-            indices = np.ones(nd_data.ndim - 1, int) * -1  # Important that indices is initialized with negative numb.
-            bool_array = np.zeros(np.shape(nd_data)[:-1], bool)      # Create a bool-array with the same shape as the
-            self.traverse_ndarray(nd_data, indices, bool_array)      # nd_data(minus the last dimension)
+            inside = self.in_half_spaces(points, tol, block)
+        return np.reshape(inside, np.shape(nd_data)[:-1] or (1,))
+
+    def in_half_spaces(self, points, tol=1e-8, block=2**16):
+        """Tests if points are inside the convex hull, using the facet equations of the hull.
 
-            return bool_array                                        # Returns the boolean array
+        A point is inside if it lies on the inner side of the planes of all the facets. The points are tested
+        against all the facets in blocks of matrix products.
+
+        :param points: ndarray
+            shape(N, 3) Points to be tested for inclusion.
+        :param tol: float
+            Tolerance for points on the surface, relative to the extent of the gamut.
+        :param block: int
+            Number of points tested at a time.
+        :return: ndarray
+            shape(N,) True for each point inside (including the surface) the convex hull, else False.
+        """
+        normals = self.hull.equations[:, :-1].T                 # Outward unit normals, shape(3, F)
+        offsets = -self.hull.equations[:, -1] + tol * np.max(np.ptp(self.hull.points, 0))
+        inside = np.empty(np.shape(points)[0], bool)
+        for start in range(0, np.shape(points)[0], block):
+            distance = np.dot(points[start:start + block], normals)   # Projections onto the normals
+            inside[start:start + block] = np.all(distance <= offsets, 1)
+        return inside
 
     def traverse_ndarray(self, nda, indices, bool_array):
         """For the given data points checks if points are inn the convexhull
@@ -170,8 +233,8 @@ class Gamut:
 
             # Check if P is on the original edge of the facets first vertex.
             if(self.interior(o_v1, P)) and \
-                    ((sign_face > 0 and not (np.in1d(el[0], v_plus))) or  # and that the vertex is not already
-                        (sign_face < 0 and not (np.in1d(el[0], v_minus)))):  # in v_plus/minus
+                    ((sign_face > 0 and not (np.isin(el[0], v_plus))) or  # and that the vertex is not already
+                        (sign_face < 0 and not (np.isin(el[0], v_minus)))):  # in v_plus/minus
                 inclusion += sign_face
 
                 if sign_face < 0:               # add vertex to neg. oriented facets or pos. oriented facets
@@ -181,8 +244,8 @@ class Gamut:
 
             # Check if P is on the original edge of the facets last vertex.
             if(self.interior(o_vn, P)) and \
-                    ((sign_face > 0 and not (np.in1d(el[-1], v_plus))) or  # and that the vertex is not already
-                        (sign_face < 0 and not (np.in1d(el[-1], v_minus)))):  # in v_plus/minus
+                    ((sign_face > 0 and not (np.isin(el[-1], v_plus))) or  # and that the vertex is not already
+                        (sign_face < 0 and not (np.isin(el[-1], v_minus)))):  # in v_plus/minus
                 inclusion += sign_face
 
                 if sign_face < 0:           # add vertex to neg. oriented facets or pos. oriented facets
@@ -203,8 +266,8 @@ class Gamut:
 
                 # See if P is the original edge of vertex j
                 elif self.interior(np.array([origin, facet[j]]), P) and \
-                        ((sign_tetra > 0 and not (np.in1d(vertex[j], v_plus))) or
-                            (sign_tetra < 0 and not (np.in1d(vertex[j], v_minus)))):
+                        ((sign_tetra > 0 and not (np.isin(vertex[j], v_plus))) or
+                            (sign_tetra < 0 and not (np.isin(vertex[j], v_minus)))):
                     inclusion += sign_tetra
 
                     if sign_tetra < 0:  # add vertex to neg. oriented facets or pos. oriented facets
@@ -756,6 +819,288 @@ class Gamut:
         nearest_point = self.line_alpha(a[0], d, center)
         return nearest_point
 
+    def get_facets(self, sp):
+        """Return the coordinates of the vertices of all the facets(simplices) in the given colour space.
+
+        The coordinates are computed once for each colour space and stored in self.facets. The facets of a gamut
+        initialized with the modified convex hull method are curved in the colour space, and are not available.
+
+        :param sp: Space
+            The colour space for the coordinates.
+        :return: ndarray
+            shape(F, 3, 3) The coordinates of the three vertices of each facet.
+        """
+        if not self.convex:
+            raise ValueError('The facets of a modified convex hull are not flat, use the hull in mapped coordinates')
+        if sp not in self.facets:
+            self.facets[sp] = self.data.get_linear(sp)[self.simplices]
+        return self.facets[sp]
+
+    def get_tree(self, sp, leaf_size=8):
+        """Return the bounding volume hierarchy over the facets(simplices) in the given colour space.
+
+        The hierarchy is built once for each colour space and stored in self.trees. The space None gives the
+        hierarchy over the facets of the hull itself, i.e., in the mapped coordinates for modified convex hulls.
+
+        :param sp: Space or None
+            The colour space for the hierarchy.
+        :param leaf_size: int
+            Maximum number of facets in the leaves of a new hierarchy.
+        :return: FacetTree
+            The bounding volume hierarchy.
+        """
+        if sp not in self.trees:
+            facets = self.hull.points[self.simplices] if sp is None else self.get_facets(sp)
+            self.trees[sp] = FacetTree(facets, leaf_size)
+        return self.trees[sp]
+
+    def nearest_points(self, sp, c_data):
+        """Find the nearest points on the gamut surface in the given colour space.
+
+        Not available for gamuts initialized with the modified convex hull method, see get_facets.
+
+        :param sp: Space
+            The colour space for computing the distances.
+        :param c_data: colour.Data
+            Data object with the colour points.
+        :return: ndarray
+            Array of the same shape as c_data.get(sp) with the nearest points on the surface.
+        """
+        nd_data = c_data.get(sp)
+        nearest, _ = self.get_tree(sp).nearest(np.reshape(nd_data, (-1, 3)))
+        return np.reshape(nearest, np.shape(nd_data))
+
+    def signed_distance(self, sp, c_data):
+        """Compute the Euclidean distances to the gamut surface in the given colour space.
+
+        The distances are negative for points inside the gamut, see is_inside. Not available for gamuts initialized
+        with the modified convex hull method, see get_facets.
+
+        :param sp: Space
+            The colour space for computing the distances.
+        :param c_data: colour.Data
+            Data object with the colour points.
+        :return: ndarray
+            Array of shape(c_data.get(sp)-1) with the signed distances.
+        """
+        nd_data = c_data.get(sp)
+        _, distance = self.get_tree(sp).nearest(np.reshape(nd_data, (-1, 3)))
+        distance = np.reshape(distance, np.shape(nd_data)[:-1])
+        return np.where(self.is_inside(self.space, c_data).reshape(np.shape(distance)),
+                        -distance, distance)
+
+    def intersectionpoints_on_lines(self, d, center, sp, tol=1e-10, block=2**10, tree=False):
+        """Finding the boundary points along many lines at once.
+
+        Each line goes from the center (alpha = 0) to the start point (alpha = 1), see line_alpha. The intersections
+        of all the lines with the planes of all the facets, and their barycentric coordinates, are computed by matrix
+        products, in blocks of lines. Along each line, the intersection with the largest alpha in [0, 1], i.e., the
+        first boundary point met when going from the start point towards the center, is returned.
+
+        For a gamut initialized with the modified convex hull method, the lines must go through its center of
+        expansion in its own colour space. They are then radial, and are intersected with the hull in the mapped
+        coordinates (see modify_radius and restore_radius).
+
+        :param d: ndarray
+            shape(N, 3) The start points.
+        :param center: ndarray
+            shape(3,) or shape(N, 3) The center(s), the end point(s) of the lines.
+        :param sp: Space
+            The colour space for computing the intersections.
+        :param tol: float
+            Tolerance for the barycentric coordinates of the intersections, for lines hitting edges or vertices.
+        :param block: int
+            Number of lines intersected at a time.
+        :param tree: bool
+            Use the bounding volume hierarchy from get_tree instead of testing all facets, for large hulls.
+        :return: ndarray
+            shape(N, 3) The nearest boundary points. NaN for lines not intersecting the boundary.
+        """
+        d = np.reshape(d, (-1, 3))
+        center = np.broadcast_to(center, np.shape(d))
+        if not self.convex:
+            if sp is not self.space or not np.allclose(center, self.center):
+                raise ValueError('Lines must go through the center of a modified convex hull, in its colour space')
+            mapped = self.modify_radius(d)
+            if tree:
+                alpha = self.get_tree(None).intersect(mapped, np.zeros(np.shape(d)), tol, block)[:, np.newaxis]
+            else:
+                alpha = self.hull_alpha(self.hull.points[self.simplices], mapped, np.zeros(np.shape(d)), tol, block)
+            return self.restore_radius(alpha * mapped)
+        if tree:
+            return self.line_alpha(self.get_tree(sp).intersect(d, center, tol, block)[:, np.newaxis], d, center)
+        alpha = self.hull_alpha(self.get_facets(sp), d, center, tol, block)
+        return self.line_alpha(alpha, d, center)
+
+    @staticmethod
+    def hull_alpha(facets, d, center, tol, block):
+        """Return the largest alpha in [0, 1] of the intersections of the lines with the facets, see
+        intersectionpoints_on_lines.
+
+        :param facets: ndarray
+            shape(F, 3, 3) The coordinates of the vertices of the facets.
+        :param d: ndarray
+            shape(N, 3) The start points.
+        :param center: ndarray
+            shape(N, 3) The centers.
+        :param tol: float
+            Tolerance for the barycentric coordinates of the intersections.
+        :param block: int
+            Number of lines intersected at a time.
+        :return: ndarray
+            shape(N, 1) The alpha values, NaN for lines not intersecting the facets.
+        """
+        planes, offsets = facet_planes(facets)
+        planes = np.reshape(planes, (-1, 3)).T                  # shape(3, 3F)
+        offsets = np.ravel(offsets)
+        n_facets = np.shape(facets)[0]
+
+        alpha = np.full(np.shape(d)[0], np.nan)
+        for start in range(0, np.shape(d)[0], block):
+            c = center[start:start + block]
+            c_proj = np.dot(c, planes) - offsets                # Projections of the centers, shape(n, 3F)
+            d_proj = np.dot(d[start:start + block] - c, planes)  # Projections of the directions
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = -c_proj[:, :n_facets] / d_proj[:, :n_facets]  # Lines parallel to the facet give inf or nan
+                u = c_proj[:, n_facets:2 * n_facets] + t * d_proj[:, n_facets:2 * n_facets]
+                v = c_proj[:, 2 * n_facets:] + t * d_proj[:, 2 * n_facets:]
+                hit = (u >= -tol) & (v >= -tol) & (u + v <= 1 + tol) & (t >= 0) & (t <= 1)
+            best = np.max(np.where(hit, t, -np.inf), -1)
+            alpha[start:start + block] = np.where(np.isfinite(best), best, np.nan)
+        return alpha[:, np.newaxis]
+
+    def map_toward_center(self, sp, c_data, center=None, tile=2**16, tree=False):
+        """Map colours into the gamut by clipping them along lines toward a center.
+
+        The colours outside the gamut (see is_inside) are replaced by the boundary points on the lines from the
+        colours to the center (see intersectionpoints_on_lines), computed in the given colour space. Colours
+        inside the gamut are kept. Only the colours outside the gamut are intersected with the hull.
+
+        :param sp: Space
+            The colour space for the mapping, e.g., cielab.
+        :param c_data: colour.Data
+            Data object with the colours to be mapped, e.g., an image.
+        :param center: ndarray or str or None
+            The center of the mapping in the given colour space, shape(3,). If 'lightness', the center is the
+            point on the lightness axis with the lightness of the colour, clipped to the part of the axis inside
+            the gamut, and a ValueError is raised if the axis misses the gamut. This assumes that the first
+            coordinate of the space is lightness and that the neutral axis is at zero for the two others, as in
+            cielab. If None, the center of the gamut is used. For a gamut
+            initialized with the modified convex hull method, the center must be its center of expansion (None),
+            and the given space its colour space, see intersectionpoints_on_lines.
+        :param tile: int or None
+            Number of colours mapped at a time. The colours are then converted to the given space tile by tile,
+            so that large images can be streamed through the mapping. If None, all colours are mapped at once.
+        :param tree: bool
+            Use the bounding volume hierarchy from get_tree, for large hulls.
+        :return: colour.Data
+            Data object with the mapped colours in the given colour space, of the same shape as c_data.
+        """
+        if center is None:
+            center = data.Data(self.space, self.center).get(sp)
+        if isinstance(center, str):
+            if not self.convex:
+                raise ValueError('A modified convex hull can only be mapped toward its center of expansion')
+            lightness = self.get_facets(sp)[..., 0]
+            axis = np.zeros((2, 3))                 # The ends of the neutral axis, where it meets the boundary
+            axis[:, 0] = [np.min(lightness), np.max(lightness)]
+            l_range = self.intersectionpoints_on_lines(axis[::-1], axis, sp)[::-1, 0]
+            if np.any(np.isnan(l_range)):
+                raise ValueError('The neutral axis does not meet the gamut')
+            l_range = l_range + np.array([1e-6, -1e-6]) * (l_range[1] - l_range[0])  # Strictly inside
+
+        def mapping(points):
+            if isinstance(center, str):
+                c = np.zeros(np.shape(points))
+                c[:, 0] = np.clip(points[:, 0], *l_range)
+            else:
+                c = center
+            boundary = self.intersectionpoints_on_lines(points, c, sp, tree=tree)
+            return np.where(np.isnan(boundary), points, boundary)
+
+        return self.map_outside(sp, c_data, mapping, tile, tree)
+
+    def map_minimum_difference(self, sp, c_data, metric_function=metric.dE_00, iterations=20, tile=2**16,
+                               tree=None, **kwargs):
+        """Map colours into the gamut by minimising the colour difference to the original colours.
+
+        Each colour outside the gamut is first projected to the nearest point on the gamut surface in the given
+        colour space, which serves as a Euclidean proxy (for a convex gamut, this solves the quadratic
+        programming problem exactly). The points are then refined by projected gradient descent on the surface for
+        the squared colour difference, using the analytic gradients of metric.gradient: each step moves the point
+        by step * diff * grad, and projects it to the nearest point on the surface. The step factor of each colour
+        is halved when the step does not reduce the difference, and doubled (up to one) when it does. The
+        refinement is local, so for metrics that are not convex (e.g., dE_00) it finds the local minimum near the
+        Euclidean projection. Everything is vectorised over the colours outside the gamut. Not available for
+        gamuts initialized with the modified convex hull method, see get_facets.
+
+        :param sp: Space
+            The colour space for the mapping, e.g., cielab or din99d.
+        :param c_data: colour.Data
+            Data object with the colours to be mapped, e.g., an image.
+        :param metric_function: function
+            The colour metric to minimise, one of the functions in metric.metric_spaces.
+        :param iterations: int
+            Number of refinement steps.
+        :param tile: int or None
+            Number of colours mapped at a time, see map_toward_center.
+        :param tree: bool or None
+            Use the bounding volume hierarchy from get_tree for the inclusion tests, see is_inside. If None, the
+            hierarchy is used for large hulls only. The nearest points are always found with the hierarchy.
+        :param kwargs: dict
+            Additional parameters of the metric (e.g., k_L for dE_00).
+        :return: colour.Data
+            Data object with the mapped colours in the given colour space, of the same shape as c_data.
+        """
+        surface = self.get_tree(sp)
+
+        def mapping(points):
+            original = data.Data(sp, points)
+            mapped = surface.nearest(points)[0]
+            diff = metric_function(original, data.Data(sp, mapped), **kwargs)
+            step = np.ones(np.shape(diff))
+            for i in range(iterations):
+                mapped_data = data.Data(sp, mapped)
+                grad = metric.gradient(metric_function, original, mapped_data, sp, wrt=2, **kwargs)
+                candidate = surface.nearest(mapped - (step * diff)[:, np.newaxis] * grad)[0]
+                candidate_diff = metric_function(original, data.Data(sp, candidate), **kwargs)
+                better = candidate_diff < diff
+                mapped[better] = candidate[better]
+                diff[better] = candidate_diff[better]
+                step = np.where(better, np.minimum(2 * step, 1), step / 2)
+            return mapped
+
+        return self.map_outside(sp, c_data, mapping, tile, tree)
+
+    def map_outside(self, sp, c_data, mapping, tile=2**16, tree=False):
+        """Apply a gamut mapping to the colours outside the gamut.
+
+        :param sp: Space
+            The colour space for the mapping.
+        :param c_data: colour.Data
+            Data object with the colours to be mapped, e.g., an image.
+        :param mapping: function
+            Function mapping shape(K, 3) colours outside the gamut to shape(K, 3) colours in the given space.
+        :param tile: int or None
+            Number of colours mapped at a time, see map_toward_center.
+        :param tree: bool
+            Use the bounding volume hierarchy from get_tree for the inclusion tests.
+        :return: colour.Data
+            Data object with the mapped colours in the given colour space, of the same shape as c_data.
+        """
+        source_space = sp if sp in c_data.data else c_data.space
+        source = c_data.get_linear(source_space)
+        mapped = np.zeros(np.shape(source))
+        tile = tile or np.shape(source)[0]
+        for start in range(0, np.shape(source)[0], tile):
+            tile_data = data.Data(source_space, source[start:start + tile])
+            points = tile_data.get_linear(sp)
+            mapped[start:start + tile] = points
+            outside = ~self.is_inside(self.space, tile_data, tree=tree)
+            if np.any(outside):
+                mapped[start:start + tile][outside] = mapping(points[outside])
+        return data.Data(sp, np.reshape(mapped, c_data.sh))
+
     def line_alpha(self, alpha, d, center):
         """Equation for calculating the nearest point
 
@@ -771,3 +1116,437 @@ class Gamut:
         nearest_point = alpha * np.array(d) + center \
             - alpha * np.array(center)     # finds the coordinates for the nearest point
         return nearest_point
+
+
+def facet_planes(facets):
+    """Compute the planes of triangular facets, and the dual vectors giving barycentric coordinates.
+
+    For a point p in the plane of a facet with vertices v0, v1, v2, the barycentric coordinates u, v with
+    p = v0 + u * (v1 - v0) + v * (v2 - v0) are u = planes[1].p - offsets[1] and v = planes[2].p - offsets[2].
+    For any point, planes[0].p - offsets[0] is proportional to its signed distance to the plane.
+
+    :param facets: ndarray
+        shape(F, 3, 3) The coordinates of the three vertices of each facet.
+    :return planes: ndarray
+        shape(3, F, 3) The (non-normalised) normals, and the two dual vectors, of the facets.
+    :return offsets: ndarray
+        shape(3, F) The products of the normals and the dual vectors with the first vertices.
+    """
+    v0 = facets[:, 0]
+    e1 = facets[:, 1] - v0                                  # Edges of the facets, shape(F, 3)
+    e2 = facets[:, 2] - v0
+    normal = np.cross(e1, e2)
+    area2 = np.sum(normal ** 2, -1)[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dual1 = np.cross(e2, normal) / area2                # (u * e1 + v * e2) . dual1 = u
+        dual2 = np.cross(normal, e1) / area2                # (u * e1 + v * e2) . dual2 = v
+    planes = np.array([normal, dual1, dual2])
+    return planes, np.sum(planes * v0, -1)
+
+
+class FacetTree:
+    """Bounding volume hierarchy over the facets of a gamut, for batched geometric queries.
+
+    The tree is binary, with axis-aligned bounding boxes, split at the median facet centroid along the longest
+    axis. All queries are vectorised over the query points by traversing the tree breadth-first with arrays of
+    (query, node) pairs, so that each query only visits the nodes whose boxes it can reach.
+    """
+    def __init__(self, facets, leaf_size=8):
+        """Construct the hierarchy over the given facets.
+
+        :param facets: ndarray
+            shape(F, 3, 3) The coordinates of the three vertices of each facet.
+        :param leaf_size: int
+            Maximum number of facets in the leaves.
+        """
+        self.leaf_size = leaf_size
+        self.order = np.arange(np.shape(facets)[0])     # Facet indices, sorted so that the leaves are contiguous
+        self.centroids = np.mean(facets, 1)
+        self.facet_lo = np.min(facets, 1)
+        self.facet_hi = np.max(facets, 1)
+        nodes = []                                      # [lo, hi, left, right, start, stop] for each node
+        self.build(0, np.shape(facets)[0], nodes)
+        self.lo = np.array([node[0] for node in nodes])
+        self.hi = np.array([node[1] for node in nodes])
+        pad = 1e-9 * np.max(self.hi[0] - self.lo[0])    # Pad the boxes for robustness
+        self.lo -= pad
+        self.hi += pad
+        self.left, self.right, self.start, self.stop = np.array([node[2:] for node in nodes], int).T
+        self.facets = facets[self.order]
+        self.facet_lo = self.facet_lo[self.order]
+        self.facet_hi = self.facet_hi[self.order]
+        self.planes, self.offsets = facet_planes(self.facets)
+        self.centroid_tree = spatial.cKDTree(self.centroids)
+
+    def build(self, start, stop, nodes):
+        """Recursively build the node for the facets self.order[start:stop].
+
+        :param start: int
+            The first facet of the node in self.order.
+        :param stop: int
+            The end of the facets of the node in self.order.
+        :param nodes: list
+            The list of nodes, to which the new nodes are appended.
+        :return: int
+            The index of the new node.
+        """
+        ids = self.order[start:stop]
+        index = len(nodes)
+        nodes.append([np.min(self.facet_lo[ids], 0), np.max(self.facet_hi[ids], 0), -1, -1, start, stop])
+        if stop - start > self.leaf_size:
+            axis = np.argmax(np.ptp(self.centroids[ids], 0))        # Split along the longest axis
+            mid = (start + stop) // 2
+            self.order[start:stop] = ids[np.argpartition(self.centroids[ids, axis], mid - start)]
+            nodes[index][2] = self.build(start, mid, nodes)
+            nodes[index][3] = self.build(mid, stop, nodes)
+        return index
+
+    def leaf_pairs(self, queries, nodes):
+        """Expand (query, leaf node) pairs to (query, facet) pairs.
+
+        :param queries: ndarray
+            shape(K,) Query indices.
+        :param nodes: ndarray
+            shape(K,) Leaf node indices.
+        :return: tuple
+            The query indices and the facet indices (in sorted order) of the pairs.
+        """
+        counts = self.stop[nodes] - self.start[nodes]
+        first = np.repeat(self.start[nodes] - np.cumsum(counts) + counts, counts)
+        return np.repeat(queries, counts), first + np.arange(np.sum(counts))
+
+    def intersect(self, d, center, tol=1e-10, block=2**12):
+        """Intersect the lines from center (alpha = 0) to d (alpha = 1) with the facets.
+
+        See Gamut.intersectionpoints_on_lines. The hierarchy is traversed breadth first for a block of lines at a
+        time, which bounds the memory of the (line, node) pairs.
+
+        :param d: ndarray
+            shape(N, 3) The start points.
+        :param center: ndarray
+            shape(3,) or shape(N, 3) The center(s), the end point(s) of the lines.
+        :param tol: float
+            Tolerance for the barycentric coordinates of the intersections.
+        :param block: int
+            Number of lines traversed at a time.
+        :return: ndarray
+            shape(N,) The largest alpha in [0, 1] of the intersections along each line. NaN if there is none.
+        """
+        center = np.broadcast_to(center, np.shape(d))
+        direction = d - center
+        alpha = np.full(np.shape(d)[0], -np.inf)
+        for start in range(0, np.shape(d)[0], block):
+            queries = np.arange(start, min(start + block, np.shape(d)[0]))
+            nodes = np.zeros(np.shape(queries), int)
+            self.traverse_lines(queries, nodes, center, direction, alpha, tol)
+        alpha[np.isinf(alpha)] = np.nan
+        return alpha
+
+    def traverse_lines(self, queries, nodes, center, direction, alpha, tol):
+        """Traverse the hierarchy breadth first from the given (line, node) pairs, see intersect.
+
+        :param queries: ndarray
+            shape(K,) Line indices.
+        :param nodes: ndarray
+            shape(K,) Node indices.
+        :param center: ndarray
+            shape(N, 3) The centers of all the lines.
+        :param direction: ndarray
+            shape(N, 3) The directions of all the lines.
+        :param alpha: ndarray
+            shape(N,) The largest alpha of the intersections found so far, updated in place.
+        :param tol: float
+            Tolerance for the barycentric coordinates of the intersections.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            while queries.size:
+                c = center[queries]                                 # Slab test of the segments and the boxes
+                dq = direction[queries]
+                lo, hi = self.lo[nodes], self.hi[nodes]
+                t_lo = (lo - c) / dq
+                t_hi = (hi - c) / dq
+                t_lo, t_hi = np.minimum(t_lo, t_hi), np.maximum(t_lo, t_hi)
+                parallel = dq == 0                                  # The slab is all or nothing
+                in_slab = (lo <= c) & (c <= hi)
+                t_lo = np.where(parallel, np.where(in_slab, -np.inf, np.inf), t_lo)
+                t_hi = np.where(parallel, np.where(in_slab, np.inf, -np.inf), t_hi)
+                hit = (np.max(t_lo, -1) <= np.minimum(np.min(t_hi, -1), 1)) & (np.min(t_hi, -1) >= 0)
+                queries, nodes = queries[hit], nodes[hit]
+                leaf = self.left[nodes] < 0
+                q, f = self.leaf_pairs(queries[leaf], nodes[leaf])
+                c_proj = np.einsum('ij,kij->ki', center[q], self.planes[:, f]) - self.offsets[:, f]
+                d_proj = np.einsum('ij,kij->ki', direction[q], self.planes[:, f])
+                t = -c_proj[0] / d_proj[0]
+                u = c_proj[1] + t * d_proj[1]
+                v = c_proj[2] + t * d_proj[2]
+                hit = (u >= -tol) & (v >= -tol) & (u + v <= 1 + tol) & (t >= 0) & (t <= 1)
+                np.maximum.at(alpha, q[hit], t[hit])
+                queries, nodes = queries[~leaf], nodes[~leaf]
+                queries = np.concatenate((queries, queries))
+                nodes = np.concatenate((self.left[nodes], self.right[nodes]))
+
+    def nearest(self, points, block=2**12):
+        """Find the nearest points on the facets.
+
+        The nodes are pruned with an upper bound of the distance, initially the distance to the nearest facet
+        centroid, and then the distance to the farthest corner of any box visited, since every box contains at
+        least one facet. The hierarchy is traversed breadth first for a block of points at a time.
+
+        :param points: ndarray
+            shape(N, 3) The query points.
+        :param block: int
+            Number of points traversed at a time.
+        :return nearest: ndarray
+            shape(N, 3) The nearest points on the facets.
+        :return distance: ndarray
+            shape(N,) The Euclidean distances to the nearest points.
+        """
+        best = np.full(np.shape(points)[0], np.inf)     # Squared distances
+        bound = self.centroid_tree.query(points)[0] ** 2
+        nearest = np.zeros(np.shape(points))
+        for start in range(0, np.shape(points)[0], block):
+            queries = np.arange(start, min(start + block, np.shape(points)[0]))
+            nodes = np.zeros(np.shape(queries), int)
+            self.traverse_points(queries, nodes, points, nearest, best, bound)
+        return nearest, np.sqrt(best)
+
+    def traverse_points(self, queries, nodes, points, nearest, best, bound):
+        """Traverse the hierarchy breadth first from the given (point, node) pairs, see nearest.
+
+        :param queries: ndarray
+            shape(K,) Point indices.
+        :param nodes: ndarray
+            shape(K,) Node indices.
+        :param points: ndarray
+            shape(N, 3) All the query points.
+        :param nearest: ndarray
+            shape(N, 3) The nearest points found so far, updated in place.
+        :param best: ndarray
+            shape(N,) The squared distances of the nearest points found so far, updated in place.
+        :param bound: ndarray
+            shape(N,) Upper bounds of the squared distances, updated in place.
+        """
+        while queries.size:
+            p = points[queries]
+            lo, hi = self.lo[nodes], self.hi[nodes]
+            d_min = np.sum(np.maximum(np.maximum(lo - p, p - hi), 0) ** 2, -1)
+            d_max = np.sum(np.maximum(np.abs(p - lo), np.abs(p - hi)) ** 2, -1)
+            np.minimum.at(bound, queries, d_max)
+            keep = d_min <= np.minimum(bound, best)[queries]
+            queries, nodes = queries[keep], nodes[keep]
+            leaf = self.left[nodes] < 0
+            q, f = self.leaf_pairs(queries[leaf], nodes[leaf])
+            p = points[q]                               # Prune the facets by their own boxes
+            d_min = np.sum(np.maximum(np.maximum(self.facet_lo[f] - p, p - self.facet_hi[f]), 0) ** 2, -1)
+            keep = d_min <= np.minimum(bound, best)[q]
+            q, f = q[keep], f[keep]
+            closest = self.closest_points(points[q], f)
+            dist = np.sum((closest - points[q]) ** 2, -1)
+            np.minimum.at(best, q, dist)
+            update = dist == best[q]
+            nearest[q[update]] = closest[update]
+            queries, nodes = queries[~leaf], nodes[~leaf]
+            queries = np.concatenate((queries, queries))
+            nodes = np.concatenate((self.left[nodes], self.right[nodes]))
+
+    def closest_points(self, points, f):
+        """Find the closest points on the given facets.
+
+        The closest point is the projection onto the plane of the facet if it lies within the facet, and else the
+        closest point on the nearest edge.
+
+        :param points: ndarray
+            shape(K, 3) The query points.
+        :param f: ndarray
+            shape(K,) The facet indices (in sorted order).
+        :return: ndarray
+            shape(K, 3) The closest points on the facets.
+        """
+        v = self.facets[f]
+        u_proj = np.einsum('ij,kij->ki', points, self.planes[1:, f]) - self.offsets[1:, f]
+        closest = v[:, 0] + u_proj[0][:, np.newaxis] * (v[:, 1] - v[:, 0]) + \
+            u_proj[1][:, np.newaxis] * (v[:, 2] - v[:, 0])
+        inside = (u_proj[0] >= 0) & (u_proj[1] >= 0) & (u_proj[0] + u_proj[1] <= 1)
+        dist = np.where(inside, 0, np.inf)
+        for i in range(3):                                  # Closest points on the three edges
+            a = v[:, i]
+            e = v[:, (i + 1) % 3] - a
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = np.clip(np.sum((points - a) * e, -1) / np.sum(e ** 2, -1), 0, 1)
+            edge_point = a + np.nan_to_num(t)[:, np.newaxis] * e
+            edge_dist = np.sum((edge_point - points) ** 2, -1)
+            closer = ~inside & (edge_dist < dist)
+            closest[closer] = edge_point[closer]
+            dist[closer] = edge_dist[closer]
+        return closest
+
+
+class BoundaryDescriptor:
+    """Gamut boundary descriptor, with the radius of the gamut on a spherical grid around a center.
+
+    The radius of the gamut surface is computed once by intersecting rays from the center with the hull (see
+    Gamut.intersectionpoints_on_lines), at the nodes of a regular grid in the polar angle theta from the first
+    (lightness) axis and the azimuth (hue) angle phi in the plane of the two others. Boundary queries interpolate
+    the radius bilinearly, in constant time per colour. The gamut should be star-shaped around the center.
+    """
+    def __init__(self, gamut, sp, n_theta=90, n_phi=180, center=None):
+        """Construct the descriptor of the given gamut.
+
+        :param gamut: Gamut
+            The gamut to describe.
+        :param sp: colour.Space
+            The colour space of the descriptor, e.g., cielab.
+        :param n_theta: int
+            Number of intervals in the polar angle, from 0 to pi.
+        :param n_phi: int
+            Number of intervals in the azimuth angle, from -pi to pi.
+        :param center: ndarray or None
+            shape(3,) The center in the given colour space. If None, the center of the gamut is used. For a gamut
+            initialized with the modified convex hull method, the center must be None and the given space the
+            colour space of the gamut, see Gamut.intersectionpoints_on_lines.
+        """
+        if center is None:
+            center = data.Data(gamut.space, gamut.center).get(sp)
+        theta = np.linspace(0, np.pi, n_theta + 1)
+        phi = np.linspace(-np.pi, np.pi, n_phi + 1)[:-1]
+        theta_grid, phi_grid = np.meshgrid(theta, phi, indexing='ij')
+        directions = self.directions(theta_grid.ravel(), phi_grid.ravel())
+        far = 2 * np.max(np.linalg.norm(gamut.data.get_linear(sp) - center, axis=-1))   # Beyond the surface
+        boundary = gamut.intersectionpoints_on_lines(center + far * directions, center, sp)
+        radius = np.linalg.norm(boundary - center, axis=-1)
+        self.set(sp, center, np.reshape(np.nan_to_num(radius), np.shape(theta_grid)))
+
+    def set(self, sp, center, radius):
+        """Set the colour space, center and radius grid of the descriptor.
+
+        :param sp: colour.Space
+            The colour space of the descriptor.
+        :param center: ndarray
+            shape(3,) The center in the given colour space.
+        :param radius: ndarray
+            shape(n_theta + 1, n_phi) The radius at the nodes of the grid.
+        """
+        self.space = sp
+        self.center = np.array(center, float)
+        self.radius = np.array(radius, float)
+        self.n_theta = np.shape(radius)[0] - 1
+        self.n_phi = np.shape(radius)[1]
+
+    @staticmethod
+    def directions(theta, phi):
+        """Return the unit vectors with the given polar and azimuth angles.
+
+        :param theta: ndarray
+            The polar angles from the first axis.
+        :param phi: ndarray
+            The azimuth angles in the plane of the two other axes.
+        :return: ndarray
+            Array of shape(theta) x 3 with the unit vectors.
+        """
+        return np.stack((np.cos(theta), np.sin(theta) * np.cos(phi), np.sin(theta) * np.sin(phi)), -1)
+
+    def angles(self, points):
+        """Return the distances and angles of points relative to the center.
+
+        :param points: ndarray
+            Array of shape(...) x 3 with the points in the colour space of the descriptor.
+        :return: tuple
+            The distances, polar angles and azimuth angles, each of shape(...).
+        """
+        diff = points - self.center
+        r = np.linalg.norm(diff, axis=-1)
+        theta = np.arccos(np.clip(np.divide(diff[..., 0], r, out=np.ones(np.shape(r)), where=r > 0), -1, 1))
+        phi = np.arctan2(diff[..., 2], diff[..., 1])
+        return r, theta, phi
+
+    def interpolate(self, theta, phi):
+        """Interpolate the radius of the gamut bilinearly in the given directions.
+
+        :param theta: ndarray
+            The polar angles from the first axis.
+        :param phi: ndarray
+            The azimuth angles in the plane of the two other axes.
+        :return: ndarray
+            The radius of the gamut, of the broadcast shape of theta and phi.
+        """
+        t = np.clip(np.asarray(theta) * (self.n_theta / np.pi), 0, self.n_theta)
+        p = (np.asarray(phi) + np.pi) * (self.n_phi / (2 * np.pi))
+        i = np.minimum(np.floor(t).astype(int), self.n_theta - 1)
+        j = np.floor(p).astype(int)
+        t -= i
+        p -= j
+        j %= self.n_phi                                     # The azimuth is periodic
+        j1 = (j + 1) % self.n_phi
+        r = self.radius.ravel()
+        n = self.n_phi
+        return (1 - t) * ((1 - p) * np.take(r, i * n + j) + p * np.take(r, i * n + j1)) + \
+            t * ((1 - p) * np.take(r, (i + 1) * n + j) + p * np.take(r, (i + 1) * n + j1))
+
+    def boundary_points(self, c_data):
+        """Return the approximate boundary points on the lines from the center through the given colours.
+
+        :param c_data: colour.Data
+            Data object with the colours.
+        :return: ndarray
+            Array of the same shape as c_data.get(sp) with the boundary points in the colour space of the
+            descriptor.
+        """
+        points = c_data.get(self.space)
+        _, theta, phi = self.angles(points)
+        return self.center + self.interpolate(theta, phi)[..., np.newaxis] * self.directions(theta, phi)
+
+    def is_inside(self, c_data, tol=1e-8):
+        """Approximate test of the colours being inside the gamut.
+
+        :param c_data: colour.Data
+            Data object with the colours.
+        :param tol: float
+            Relative tolerance for colours on the surface.
+        :return: ndarray
+            Boolean array of shape(c_data.get(sp)-1), True for colours inside the gamut.
+        """
+        r, theta, phi = self.angles(c_data.get(self.space))
+        return r <= self.interpolate(theta, phi) * (1 + tol)
+
+    def cusp(self, hue):
+        """Return the cusps, the boundary points of maximum chroma, for the given hue angles.
+
+        Assumes that the first coordinate of the colour space is lightness and that the center is on the
+        neutral axis. The cusp is searched for along the polar angle nodes of the grid.
+
+        :param hue: ndarray
+            The hue angles (radians) of the cusps, as the azimuth angle phi.
+        :return: ndarray
+            Array of shape(hue) x 3 with the cusp points in the colour space of the descriptor.
+        """
+        hue = np.asarray(hue)
+        theta = np.linspace(0, np.pi, self.n_theta + 1)
+        radius = self.interpolate(theta, hue[..., np.newaxis])      # shape(hue) x (n_theta + 1)
+        best = np.argmax(radius * np.sin(theta), -1)
+        theta = theta[best]
+        radius = np.take_along_axis(radius, best[..., np.newaxis], -1)
+        return self.center + radius * self.directions(theta, hue)
+
+    def save(self, filename):
+        """Save the descriptor to a NumPy .npz file.
+
+        The colour space is stored by name, see space.space_name.
+
+        :param filename: str
+            The file name.
+        """
+        np.savez(filename, space=space.space_name(self.space), center=self.center, radius=self.radius)
+
+    @classmethod
+    def load(cls, filename):
+        """Load a descriptor saved by save.
+
+        :param filename: str
+            The file name.
+        :return: BoundaryDescriptor
+            The loaded descriptor.
+        """
+        f = np.load(filename)
+        descriptor = cls.__new__(cls)
+        descriptor.set(getattr(space, str(f['space'])), f['center'], f['radius'])
+        return descriptor
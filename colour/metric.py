@@ -20,7 +20,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import numpy as np
-from . import data, space
+from . import data, space, misc, statistics
 
 
 # =============================================================================
@@ -51,6 +51,87 @@ def reshape_diff(diff, sh):
         return np.reshape(diff, tuple(np.array(sh)[:-1]))
 
 
+def get_broadcast(sp, dat1, dat2):
+    """
+    Return the colour data of the two data sets in the given space.
+
+    The data are returned in their original shapes, M x ... x N x 3, and
+    the metric functions broadcast these shapes against each other
+    following the usual NumPy rules. Thus, e.g., a single colour can be
+    compared with a list of colours or an image without tiling.
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space.
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+
+    Returns
+    -------
+    d1 : ndarray
+        The colour data of the first data set.
+    d2 : ndarray
+        The colour data of the second data set.
+    """
+    return dat1.get(sp), dat2.get(sp)
+
+
+def scalar_or_array(diff):
+    """
+    Return the computed differences, as a scalar for single colour points.
+
+    Parameters
+    ----------
+    diff : ndarray
+        The computed differences in the broadcast shape of the data sets.
+
+    Returns
+    -------
+    diff : ndarray or float
+        The computed differences.
+    """
+    return diff[()]
+
+
+# =============================================================================
+# Precomputed reference data
+# =============================================================================
+
+
+class Reference(data.Data):
+    """
+    Colour data to be used as reference in many comparisons.
+
+    The reference-dependent parts of the colour metrics are computed once
+    on construction, and reused by the metric functions when the reference
+    is passed in place of a Data object. Shares the cached colour
+    conversions with the Data object it was constructed from.
+
+    For dE_00, the CIEDE00 L'C'h' coordinates and sqrt(C') are
+    precomputed. The weighting functions S_L, S_C and T depend on the
+    mean of the two colours compared, and can thus not be precomputed
+    from the reference alone.
+    """
+
+    def __init__(self, dat):
+        """
+        Construct new instance from colour data.
+
+        Parameters
+        ----------
+        dat : Data
+            The reference colour data.
+        """
+        self.space = dat.space
+        self.data = dat.data
+        self.sh = dat.sh
+        self.lch_00 = self.get(space.ciede00lch)
+        self.sqrt_C_00 = np.sqrt(self.lch_00[..., 1])
+
+
 # =============================================================================
 # Colour metric functions
 # =============================================================================
@@ -64,6 +145,10 @@ def linear(sp, dat1, dat2, metric_tensor_function):
     at the midpoint between the two data sets in the given colour space. Then
     the colour metric is computed as dC^T * g * dC.
 
+    The midpoints are given to the tensor function directly in the given
+    space, so that no conversion takes place if the tensor function is
+    native to that space (see Data.get and TensorData.get_tensor).
+
     Parameters
     ----------
     sp : Space
@@ -73,23 +158,21 @@ def linear(sp, dat1, dat2, metric_tensor_function):
     dat2 : Data
         The colour data of the second data set.
     metric_tensor_function : function
-        Function giving the metric tensors at given colour data points.
+        Function giving the metric tensors at given colour data points,
+        e.g., from the tensor module, or a precomputed tensor.TensorField.
 
     Returns
     -------
     distance : ndarray
         Array of the difference or distances between the two data sets.
     """
-    d1 = dat1.get_linear(sp)
-    d2 = dat2.get_linear(sp)
+    d1, d2 = get_broadcast(sp, dat1, dat2)
     midp = (d1 + d2) * .5
     diff = d1 - d2
     g = metric_tensor_function(data.Data(sp, midp))
-    g = g.get(sp)
-    m = np.zeros(np.shape(diff)[0])
-    for i in range(np.shape(m)[0]):
-        m[i] = np.sqrt(np.dot(diff[i].T, np.dot(g[i], diff[i])))
-    return reshape_diff(m, dat1.sh)
+    g = np.reshape(g.get_packed(sp), np.shape(diff)[:-1] + (6,))
+    m = np.sqrt(misc.norm_sq(diff, g))
+    return scalar_or_array(m)
 
 
 def euclidean(sp, dat1, dat2):
@@ -110,11 +193,10 @@ def euclidean(sp, dat1, dat2):
     distance : ndarray
         Array of the difference or distances between the two data sets.
     """
-    d1 = dat1.get_linear(sp)
-    d2 = dat2.get_linear(sp)
+    d1, d2 = get_broadcast(sp, dat1, dat2)
     diff = d1 - d2
-    m = np.sqrt(diff[:, 0]**2 + diff[:, 1]**2 + diff[:, 2]**2)
-    return reshape_diff(m, dat1.sh)
+    m = np.sqrt(diff[..., 0]**2 + diff[..., 1]**2 + diff[..., 2]**2)
+    return scalar_or_array(m)
 
 
 def poincare_disk(sp, dat1, dat2):
@@ -139,15 +221,14 @@ def poincare_disk(sp, dat1, dat2):
     distance : ndarray
         Array of the difference or distances between the two data sets.
     """
-    d1 = dat1.get_linear(sp)
-    d2 = dat2.get_linear(sp)
+    d1, d2 = get_broadcast(sp, dat1, dat2)
     diff = d1 - d2
-    delta = 2 * ((diff[:, 1]**2 + diff[:, 2]**2) /
-                 ((1 - d1[:, 1]**2 - d1[:, 2]**2) *
-                  (1 - d2[:, 1]**2 - d2[:, 2]**2)))
+    delta = 2 * ((diff[..., 1]**2 + diff[..., 2]**2) /
+                 ((1 - d1[..., 1]**2 - d1[..., 2]**2) *
+                  (1 - d2[..., 1]**2 - d2[..., 2]**2)))
     duv = sp.R * np.arccosh(1 + delta)
-    d = np.sqrt(diff[:, 0]**2 + duv**2)
-    return reshape_diff(d, dat1.sh)
+    d = np.sqrt(diff[..., 0]**2 + duv**2)
+    return scalar_or_array(d)
 
 
 def dE_ab(dat1, dat2):
@@ -283,10 +364,48 @@ def dE_DIN99d(dat1, dat2):
     return euclidean(space.din99d, dat1, dat2)
 
 
-def dE_00(dat1, dat2, k_L=1, k_C=1, k_h=1):
+# The colour spaces of the Euclidean colour metrics
+euclidean_metric_spaces = {dE_ab: space.cielab,
+                           dE_uv: space.cieluv,
+                           dE_E: space.lgj_e,
+                           dE_DIN99: space.din99,
+                           dE_DIN99b: space.din99b,
+                           dE_DIN99c: space.din99c,
+                           dE_DIN99d: space.din99d}
+
+
+def _lch_00(dat):
+    """
+    Return the CIEDE00 L'C'h' coordinates and sqrt(C') of the data.
+
+    Uses the precomputed values if dat is a Reference.
+
+    Parameters
+    ----------
+    dat : Data
+        The colour data.
+
+    Returns
+    -------
+    lch : ndarray
+        The colour data in the ciede00lch colour space.
+    sqrt_C : ndarray
+        The square root of the chroma C'.
+    """
+    if isinstance(dat, Reference):
+        return dat.lch_00, dat.sqrt_C_00
+    lch = dat.get(space.ciede00lch)
+    return lch, np.sqrt(lch[..., 1])
+
+
+def dE_00(dat1, dat2, k_L=1, k_C=1, k_h=1, fast=None):
     """
     Compute the CIEDE00 metric.
 
+    With fast approximate mathematics (see misc.fast_math), the
+    trigonometric functions are replaced by lookup tables, with a maximum
+    error below 1e-4 for colour differences up to 100.
+
     Parameters
     ----------
     dat1 : Data
@@ -299,36 +418,1592 @@ def dE_00(dat1, dat2, k_L=1, k_C=1, k_h=1):
         Parameter of the CIEDE00 metric
     k_h : float
         Parameter of the CIEDE00 metric
+    fast : bool or None
+        Whether to use fast approximate mathematics. None means the global
+        setting.
 
     Returns
     -------
     distance : ndarray
         Array of the difference or distances between the two data sets.
     """
-    lch1 = dat1.get_linear(space.ciede00lch)
-    lch2 = dat2.get_linear(space.ciede00lch)
+    fast = misc.use_fast_math(fast)
+    lch1, sqrt_C1 = _lch_00(dat1)
+    lch2, sqrt_C2 = _lch_00(dat2)
     avg_lch = .5 * (lch1 + lch2)
     d_lch = lch1 - lch2
 
-    h_deg = np.rad2deg(avg_lch[:, 2])
-    h_deg[h_deg < 0] = h_deg[h_deg < 0] + 360
-    S_L = 1 + ((0.015 * (avg_lch[:, 0] - 50)**2) /
-               np.sqrt(20 + (avg_lch[:, 0] - 50)**2))
-    S_C = 1 + 0.045 * avg_lch[:, 1]
-    T = 1 - 0.17 * np.cos(np.deg2rad(h_deg - 30)) + \
-        .24 * np.cos(2*avg_lch[:, 2]) + \
-        .32 * np.cos(np.deg2rad(3 * h_deg + 6)) - \
-        .2 * np.cos(np.deg2rad(4 * h_deg - 63))
-    S_h = 1 + 0.015 * avg_lch[:, 1] * T
-    R_C = 2 * np.sqrt(avg_lch[:, 1]**7 / (avg_lch[:, 1]**7 + 25**7))
+    h_deg = np.mod(np.rad2deg(avg_lch[..., 2]), 360)
+    if fast:
+        cos_2h = misc.cos_deg(2 * h_deg, fast)
+        sin_dh = misc.sin_deg(d_lch[..., 2] * (90 / np.pi), fast)
+    else:
+        cos_2h = np.cos(2*avg_lch[..., 2])
+        sin_dh = np.sin(d_lch[..., 2] / 2)
+    S_L = 1 + ((0.015 * (avg_lch[..., 0] - 50)**2) /
+               np.sqrt(20 + (avg_lch[..., 0] - 50)**2))
+    S_C = 1 + 0.045 * avg_lch[..., 1]
+    T = 1 - 0.17 * misc.cos_deg(h_deg - 30, fast) + \
+        .24 * cos_2h + \
+        .32 * misc.cos_deg(3 * h_deg + 6, fast) - \
+        .2 * misc.cos_deg(4 * h_deg - 63, fast)
+    S_h = 1 + 0.015 * avg_lch[..., 1] * T
+    R_C = 2 * np.sqrt(avg_lch[..., 1]**7 / (avg_lch[..., 1]**7 + 25**7))
     d_theta = 30 * np.exp(-((h_deg - 275) / 25)**2)
-    R_T = - R_C * np.sin(np.deg2rad(2 * d_theta))
-    dH = 2 * np.sqrt(lch1[:, 1] * lch2[:, 1]) * np.sin(d_lch[:, 2] / 2)
-    d = np.sqrt((d_lch[:, 0] / (k_L * S_L))**2 +
-                (d_lch[:, 1] / (k_C * S_C))**2 +
+    R_T = - R_C * misc.sin_deg(2 * d_theta, fast)
+    dH = 2 * sqrt_C1 * sqrt_C2 * sin_dh
+    d = np.sqrt((d_lch[..., 0] / (k_L * S_L))**2 +
+                (d_lch[..., 1] / (k_C * S_C))**2 +
                 (dH / (k_h * S_h))**2 +
-                R_T * d_lch[:, 1] * dH / (k_C * S_C * k_h * S_h))
-    return reshape_diff(d, dat1.sh)
+                R_T * d_lch[..., 1] * dH / (k_C * S_C * k_h * S_h))
+    return scalar_or_array(d)
+
+
+def _dE_00_kernel(lch1, sqrt_C1, lch2, sqrt_C2, k_L, k_C, k_h, out, tmp):
+    """
+    Compute CIEDE00 for a chunk of points using preallocated buffers.
+
+    Performs the same floating point operations, in the same order, as
+    dE_00, but in place in the seven scratch buffers, so that the result
+    is identical.
+
+    Parameters
+    ----------
+    lch1 : ndarray
+        n x 3 array of the first data set in the ciede00lch space.
+    sqrt_C1 : ndarray
+        The square root of the chroma of the first data set.
+    lch2 : ndarray
+        n x 3 array of the second data set in the ciede00lch space.
+    sqrt_C2 : ndarray
+        The square root of the chroma of the second data set.
+    k_L : float
+        Parameter of the CIEDE00 metric
+    k_C : float
+        Parameter of the CIEDE00 metric
+    k_h : float
+        Parameter of the CIEDE00 metric
+    out : ndarray
+        Array of length n for the result.
+    tmp : ndarray
+        7 x n array of scratch buffers.
+    """
+    a, b, h, t, u, v, w = tmp
+    np.add(lch1[:, 0], lch2[:, 0], out=a)
+    a *= .5                                         # mean L
+    np.add(lch1[:, 1], lch2[:, 1], out=b)
+    b *= .5                                         # mean C
+    np.add(lch1[:, 2], lch2[:, 2], out=h)
+    h *= .5                                         # mean h
+    np.multiply(h, 2, out=t)
+    np.cos(t, out=t)
+    t *= .24
+    np.rad2deg(h, out=h)
+    np.mod(h, 360, out=h)                           # h_deg
+    np.subtract(h, 30, out=u)
+    np.deg2rad(u, out=u)
+    np.cos(u, out=u)
+    u *= .17
+    np.subtract(1, u, out=u)
+    u += t
+    np.multiply(h, 3, out=t)
+    t += 6
+    np.deg2rad(t, out=t)
+    np.cos(t, out=t)
+    t *= .32
+    u += t
+    np.multiply(h, 4, out=t)
+    t -= 63
+    np.deg2rad(t, out=t)
+    np.cos(t, out=t)
+    t *= .2
+    u -= t                                          # T
+    np.multiply(b, 0.015, out=t)
+    t *= u
+    t += 1                                          # S_h
+    np.subtract(h, 275, out=u)
+    u /= 25
+    np.square(u, out=u)
+    np.negative(u, out=u)
+    np.exp(u, out=u)
+    u *= 30                                         # d_theta
+    u *= 2
+    np.deg2rad(u, out=u)
+    np.sin(u, out=u)
+    np.power(b, 7, out=h)                           # C**7 computed once
+    np.add(h, 25**7, out=v)
+    h /= v
+    np.sqrt(h, out=h)
+    h *= 2                                          # R_C
+    np.negative(h, out=h)
+    h *= u                                          # R_T
+    np.subtract(a, 50, out=v)
+    np.square(v, out=v)
+    np.add(v, 20, out=a)
+    np.sqrt(a, out=a)
+    v *= 0.015
+    v /= a
+    v += 1                                          # S_L
+    b *= 0.045
+    b += 1                                          # S_C
+    np.subtract(lch1[:, 2], lch2[:, 2], out=u)
+    u /= 2
+    np.sin(u, out=u)
+    np.multiply(sqrt_C1, 2, out=a)
+    a *= sqrt_C2
+    a *= u                                          # dH
+    v *= k_L
+    np.subtract(lch1[:, 0], lch2[:, 0], out=out)
+    out /= v
+    np.square(out, out=out)
+    b *= k_C                                        # k_C * S_C
+    np.subtract(lch1[:, 1], lch2[:, 1], out=u)      # dC
+    np.divide(u, b, out=v)
+    np.square(v, out=v)
+    out += v
+    np.multiply(t, k_h, out=v)
+    np.divide(a, v, out=v)
+    np.square(v, out=v)
+    out += v
+    np.multiply(b, k_h, out=w)
+    w *= t
+    h *= u
+    h *= a
+    h /= w
+    out += h
+    np.sqrt(out, out=out)
+
+
+def _dE_00_numexpr(lch1, sqrt_C1, lch2, sqrt_C2, k_L, k_C, k_h, out):
+    """
+    Compute CIEDE00 for a chunk of points using numexpr.
+
+    Parameters
+    ----------
+    lch1 : ndarray
+        n x 3 array of the first data set in the ciede00lch space.
+    sqrt_C1 : ndarray
+        The square root of the chroma of the first data set.
+    lch2 : ndarray
+        n x 3 array of the second data set in the ciede00lch space.
+    sqrt_C2 : ndarray
+        The square root of the chroma of the second data set.
+    k_L : float
+        Parameter of the CIEDE00 metric
+    k_C : float
+        Parameter of the CIEDE00 metric
+    k_h : float
+        Parameter of the CIEDE00 metric
+    out : ndarray
+        Array of length n for the result.
+    """
+    import numexpr
+    L1, C1, h1 = lch1.T
+    L2, C2, h2 = lch2.T
+    h_deg = np.mod(numexpr.evaluate('(h1 + h2) * (90 / pi)',
+                                    local_dict={'h1': h1, 'h2': h2,
+                                                'pi': np.pi}), 360)
+    numexpr.evaluate(
+        'sqrt((dL / (k_L * S_L))**2 + (dC / (k_C * S_C))**2 + '
+        '(dH / (k_h * S_h))**2 + R_T * dC * dH / (k_C * S_C * k_h * S_h))',
+        local_dict={
+            'dL': numexpr.evaluate('L1 - L2'),
+            'dC': numexpr.evaluate('C1 - C2'),
+            'dH': numexpr.evaluate(
+                '2 * sqrt_C1 * sqrt_C2 * sin((h1 - h2) / 2)'),
+            'S_L': numexpr.evaluate(
+                '1 + 0.015 * (.5 * (L1 + L2) - 50)**2 / '
+                'sqrt(20 + (.5 * (L1 + L2) - 50)**2)'),
+            'S_C': numexpr.evaluate('1 + 0.0225 * (C1 + C2)'),
+            'S_h': numexpr.evaluate(
+                '1 + 0.0075 * (C1 + C2) * (1 - 0.17 * cos(r * (h - 30)) + '
+                '.24 * cos(h1 + h2) + .32 * cos(r * (3 * h + 6)) - '
+                '.2 * cos(r * (4 * h - 63)))',
+                local_dict={'C1': C1, 'C2': C2, 'h': h_deg, 'h1': h1,
+                            'h2': h2, 'r': np.pi / 180}),
+            'R_T': numexpr.evaluate(
+                '-2 * sqrt(C7 / (C7 + 6103515625.)) * '
+                'sin(r * 60 * exp(-((h - 275) / 25)**2))',
+                local_dict={'C7': (.5 * (C1 + C2))**7, 'h': h_deg,
+                            'r': np.pi / 180}),
+            'k_L': k_L, 'k_C': k_C, 'k_h': k_h},
+        out=out)
+
+
+def dE_00_fused(dat1, dat2, k_L=1, k_C=1, k_h=1, block=2**14,
+                backend='numpy'):
+    """
+    Compute the CIEDE00 metric with few temporary arrays.
+
+    The data are processed in chunks of at most block points. With the
+    numpy backend, each chunk is computed in place in preallocated scratch
+    buffers, giving results identical to dE_00. The optional numexpr
+    backend evaluates the expressions with numexpr (if installed), and
+    agrees with dE_00 to rounding errors. Supports broadcasting and
+    Reference data like dE_00.
+
+    Parameters
+    ----------
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+    k_L : float
+        Parameter of the CIEDE00 metric
+    k_C : float
+        Parameter of the CIEDE00 metric
+    k_h : float
+        Parameter of the CIEDE00 metric
+    block : int
+        The maximum number of points per chunk.
+    backend : str
+        'numpy' or 'numexpr'.
+
+    Returns
+    -------
+    distance : ndarray
+        Array of the difference or distances between the two data sets.
+    """
+    lch1, sqrt_C1 = _lch_00(dat1)
+    lch2, sqrt_C2 = _lch_00(dat2)
+    sh = np.broadcast_shapes(np.shape(lch1)[:-1], np.shape(lch2)[:-1])
+    lch1 = np.reshape(np.broadcast_to(lch1, sh + (3,)), (-1, 3))
+    lch2 = np.reshape(np.broadcast_to(lch2, sh + (3,)), (-1, 3))
+    sqrt_C1 = np.ravel(np.broadcast_to(sqrt_C1, sh))
+    sqrt_C2 = np.ravel(np.broadcast_to(sqrt_C2, sh))
+    n = np.shape(lch1)[0]
+    d = np.empty(n)
+    tmp = np.empty((7, min(block, n)))
+    for i in range(0, n, block):
+        sl = slice(i, min(i + block, n))
+        if backend == 'numexpr':
+            _dE_00_numexpr(lch1[sl], sqrt_C1[sl], lch2[sl], sqrt_C2[sl],
+                           k_L, k_C, k_h, d[sl])
+        else:
+            _dE_00_kernel(lch1[sl], sqrt_C1[sl], lch2[sl], sqrt_C2[sl],
+                          k_L, k_C, k_h, d[sl], tmp[:, :sl.stop - sl.start])
+    return scalar_or_array(np.reshape(d, sh))
+
+
+# =============================================================================
+# Evaluation of several metrics
+# =============================================================================
+
+
+# The colour spaces in which the metrics are computed
+metric_spaces = dict(euclidean_metric_spaces)
+metric_spaces[dE_00] = space.ciede00lch
+
+all_metrics = [dE_ab, dE_uv, dE_00, dE_E,
+               dE_DIN99, dE_DIN99b, dE_DIN99c, dE_DIN99d]
+
+
+def conversion_plan(spaces):
+    """
+    Return the colour spaces to convert to for reaching the given spaces.
+
+    The plan includes the given spaces and all spaces shared by the chains
+    of base spaces of two or more of them, ordered by the length of their
+    chains. Converting Data in this order (using Data.get), each space is
+    reached from its nearest already converted base, and the common
+    chain prefixes are computed only once.
+
+    Parameters
+    ----------
+    spaces : list
+        The colour spaces.
+
+    Returns
+    -------
+    plan : list
+        The colour spaces in order of conversion.
+    """
+    count = dict()
+    for sp in set(spaces):
+        for base in sp.base_chain():
+            count[base] = count.get(base, 0) + 1
+    plan = [sp for sp in count if count[sp] > 1 or sp in spaces]
+    return sorted(plan, key=lambda sp: len(sp.base_chain()))
+
+
+def _evaluate(dat1, dat2, metrics, plan):
+    """
+    Convert the data following the plan and evaluate the metrics.
+
+    Parameters
+    ----------
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+    metrics : list
+        The (name, function) pairs of the colour metrics.
+    plan : list
+        The colour spaces in order of conversion.
+
+    Returns
+    -------
+    distances : dict
+        The differences, with the metric names as keys.
+    """
+    for sp in plan:
+        dat1.get(sp)
+        dat2.get(sp)
+    return dict((name, met(dat1, dat2)) for name, met in metrics)
+
+
+def _named_metrics(metrics):
+    """
+    Return the colour metrics as (name, function) pairs.
+
+    Functions without a name, e.g., functools.partial objects, are named
+    by their repr. Use a dict for other names.
+
+    Parameters
+    ----------
+    metrics : list or dict
+        The colour metric functions, or a dict of them with the names as
+        keys.
+
+    Returns
+    -------
+    metrics : list
+        The (name, function) pairs.
+    """
+    if isinstance(metrics, dict):
+        return list(metrics.items())
+    return [(getattr(met, '__name__', repr(met)), met) for met in metrics]
+
+
+def _metrics_plan(metrics):
+    """
+    Return the conversion plan for the (name, function) pairs of metrics.
+
+    The colour spaces of functools.partial objects are found from the
+    wrapped functions.
+
+    Parameters
+    ----------
+    metrics : list
+        The (name, function) pairs of the colour metrics.
+
+    Returns
+    -------
+    plan : list
+        The colour spaces in order of conversion (see conversion_plan).
+    """
+    funcs = [getattr(met, 'func', met) for name, met in metrics]
+    return conversion_plan([metric_spaces[met] for met in funcs
+                            if met in metric_spaces])
+
+
+def evaluate(dat1, dat2, metrics=all_metrics, block=None):
+    """
+    Compute several colour metrics between the two data sets.
+
+    The colour conversions needed by the metrics are planned together (see
+    conversion_plan), so that each conversion, including the shared
+    intermediate ones, is computed only once. The converted data are kept
+    in the Data objects. If block is given, the data are instead processed
+    in chunks of at most block points, bounding the memory use.
+
+    Parameters
+    ----------
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+    metrics : list or dict
+        The colour metric functions, by default all the standard metrics,
+        or a dict of them with the names as keys. Parameterised metrics
+        can be given by functools.partial.
+    block : int
+        The maximum number of points per chunk, or None for no chunking.
+
+    Returns
+    -------
+    distances : dict
+        The differences in the broadcast shape of the data sets, with the
+        metric function names (or the keys of metrics) as keys.
+    """
+    metrics = _named_metrics(metrics)
+    plan = _metrics_plan(metrics)
+    if block is None:
+        return _evaluate(dat1, dat2, metrics, plan)
+    sh = np.broadcast_shapes(dat1.sh[:-1], dat2.sh[:-1])
+    distances = dict((name, np.zeros(int(np.prod(sh))))
+                     for name, met in metrics)
+    for sl, chunk1, chunk2 in _chunks(dat1, dat2, block):
+        res = _evaluate(chunk1, chunk2, metrics, plan)
+        for name in res:
+            distances[name][sl] = res[name]
+    return dict((name, scalar_or_array(np.reshape(distances[name], sh)))
+                for name in distances)
+
+
+def _chunks(dat1, dat2, block):
+    """
+    Split the broadcast data sets into chunks of linearised points.
+
+    Parameters
+    ----------
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+    block : int
+        The maximum number of points per chunk.
+
+    Returns
+    -------
+    chunks : generator
+        Generator of (slice, Data, Data) for the chunks, where the slice
+        gives the points in the linearised broadcast shape.
+    """
+    sh = np.broadcast_shapes(dat1.sh[:-1], dat2.sh[:-1])
+    nd1 = np.reshape(np.broadcast_to(dat1.get(dat1.space), sh + (3,)),
+                     (-1, 3))
+    nd2 = np.reshape(np.broadcast_to(dat2.get(dat2.space), sh + (3,)),
+                     (-1, 3))
+    for i in range(0, np.shape(nd1)[0], block):
+        sl = slice(i, i + block)
+        yield (sl, data.Data(dat1.space, nd1[sl]),
+               data.Data(dat2.space, nd2[sl]))
+
+
+def accumulate(pairs, metrics=all_metrics, block=2**16, stats=None,
+               **kwargs):
+    """
+    Accumulate summary statistics of colour differences in chunks.
+
+    The data pairs are processed one at a time, in chunks of at most
+    block points, and only the statistics are kept (see
+    statistics.StreamingStatistics). The pairs can thus be, e.g., a
+    generator reading image pairs from disk.
+
+    Parameters
+    ----------
+    pairs : iterable
+        Iterable of (Data, Data) pairs of colour data sets.
+    metrics : list or dict
+        The colour metric functions, or a dict of them with the names as
+        keys (see evaluate).
+    block : int
+        The maximum number of points per chunk.
+    stats : dict
+        Statistics to continue accumulating, as returned by a previous
+        call. New statistics are constructed if None.
+    kwargs : dict
+        Keyword arguments for constructing StreamingStatistics, e.g.,
+        bins and compression.
+
+    Returns
+    -------
+    stats : dict
+        The statistics, StreamingStatistics with the metric function names
+        (or the keys of metrics) as keys.
+    """
+    metrics = _named_metrics(metrics)
+    if stats is None:
+        stats = dict((name, statistics.StreamingStatistics(**kwargs))
+                     for name, met in metrics)
+    plan = _metrics_plan(metrics)
+    for dat1, dat2 in pairs:
+        for sl, chunk1, chunk2 in _chunks(dat1, dat2, block):
+            res = _evaluate(chunk1, chunk2, metrics, plan)
+            for name in res:
+                stats[name].update(res[name])
+    return stats
+
+
+# =============================================================================
+# Gradients and uncertainties of colour metrics
+# =============================================================================
+
+
+def _div0(a, b):
+    """
+    Divide the broadcast arrays, with zero where the denominator is zero.
+
+    Parameters
+    ----------
+    a : ndarray
+        The numerator.
+    b : ndarray
+        The denominator.
+
+    Returns
+    -------
+    res : ndarray
+        The quotient a / b, zero where b == 0.
+    """
+    a, b = np.broadcast_arrays(a, b)
+    return np.divide(a, b, out=np.zeros(np.shape(a)), where=b != 0)
+
+
+def _gradient_00(lch1, sqrt_C1, lch2, sqrt_C2, k_L=1, k_C=1, k_h=1):
+    """
+    Return the gradient of CIEDE00 with respect to the first colour.
+
+    Computed analytically in the ciede00lch space. CIEDE00 is symmetric,
+    so the gradient with respect to the second colour is obtained by
+    swapping the arguments. The gradient is set to zero where it is
+    undefined, i.e., for identical colours and for C' = 0.
+
+    Parameters
+    ----------
+    lch1 : ndarray
+        The first data set in the ciede00lch space.
+    sqrt_C1 : ndarray
+        The square root of the chroma of the first data set.
+    lch2 : ndarray
+        The second data set in the ciede00lch space.
+    sqrt_C2 : ndarray
+        The square root of the chroma of the second data set.
+    k_L : float
+        Parameter of the CIEDE00 metric
+    k_C : float
+        Parameter of the CIEDE00 metric
+    k_h : float
+        Parameter of the CIEDE00 metric
+
+    Returns
+    -------
+    gradient : ndarray
+        The gradient in the broadcast shape of the data sets.
+    """
+    avg_lch = .5 * (lch1 + lch2)
+    d_lch = lch1 - lch2
+    C = avg_lch[..., 1]
+    h = avg_lch[..., 2]
+    h_deg = np.mod(np.rad2deg(h), 360)
+    x = avg_lch[..., 0] - 50
+    S_L = 1 + (0.015 * x**2) / np.sqrt(20 + x**2)
+    S_C = 1 + 0.045 * C
+    angles = [np.deg2rad(h_deg - 30), 2 * h,
+              np.deg2rad(3 * h_deg + 6), np.deg2rad(4 * h_deg - 63)]
+    T = 1 - 0.17 * np.cos(angles[0]) + \
+        .24 * np.cos(angles[1]) + \
+        .32 * np.cos(angles[2]) - \
+        .2 * np.cos(angles[3])
+    S_h = 1 + 0.015 * C * T
+    C_7 = C**7
+    R_C = 2 * np.sqrt(C_7 / (C_7 + 25**7))
+    d_theta = 30 * np.exp(-((h_deg - 275) / 25)**2)
+    sin_theta = np.sin(np.deg2rad(2 * d_theta))
+    R_T = - R_C * sin_theta
+    sin_dh = np.sin(d_lch[..., 2] / 2)
+    dH = 2 * sqrt_C1 * sqrt_C2 * sin_dh
+    a = d_lch[..., 0] / (k_L * S_L)
+    b = d_lch[..., 1] / (k_C * S_C)
+    c = dH / (k_h * S_h)
+    d = np.sqrt(a**2 + b**2 + c**2 + R_T * b * c)
+
+    # Derivatives of the weighting functions with respect to the first
+    # colour, the means contributing half of the change
+    dS_L = 0.0075 * x * (40 + x**2) / (20 + x**2)**1.5
+    dS_C = 0.0225
+    dT = .5 * (0.17 * np.sin(angles[0]) - .48 * np.sin(angles[1]) -
+               .96 * np.sin(angles[2]) + .8 * np.sin(angles[3]))
+    dR_C = 1.75 * 25**7 * _div0(R_C, C * (C_7 + 25**7))
+    dR_T_dC = - dR_C * sin_theta
+    dR_T_dh = R_C * np.cos(np.deg2rad(2 * d_theta)) * \
+        d_theta * 2 * (h_deg - 275) / 625
+    dH_dC = _div0(sqrt_C2, sqrt_C1) * sin_dh
+    dH_dh = sqrt_C1 * sqrt_C2 * np.cos(d_lch[..., 2] / 2)
+
+    da_dL = 1 / (k_L * S_L) - a * dS_L / S_L
+    db_dC = 1 / (k_C * S_C) - b * dS_C / S_C
+    dc_dC = dH_dC / (k_h * S_h) - c * 0.0075 * T / S_h
+    dc_dh = dH_dh / (k_h * S_h) - c * 0.015 * C * dT / S_h
+
+    grad = np.zeros(np.shape(d) + (3,))
+    grad[..., 0] = 2 * a * da_dL
+    grad[..., 1] = 2 * b * db_dC + 2 * c * dc_dC + \
+        dR_T_dC * b * c + R_T * (db_dC * c + b * dc_dC)
+    grad[..., 2] = 2 * c * dc_dh + dR_T_dh * b * c + R_T * b * dc_dh
+    return _div0(grad, 2 * d[..., np.newaxis])
+
+
+def gradient(metric_function, dat1, dat2, sp=None, wrt=1, **kwargs):
+    """
+    Return the gradient of a colour metric with respect to one data set.
+
+    The gradient is computed analytically in the colour space of the
+    metric (see metric_spaces), and transformed to the given colour space
+    by the chain rule using vector-Jacobian products of the colour spaces. The
+    gradient is set to zero where it is undefined, e.g., for identical
+    colours.
+
+    Parameters
+    ----------
+    metric_function : function
+        The colour metric, one of the functions in metric_spaces.
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+    sp : Space
+        The colour space of the gradient. Default is the colour space of
+        the metric.
+    wrt : int
+        The data set (1 or 2) to differentiate with respect to.
+    kwargs : dict
+        Additional parameters of the metric (e.g., k_L for dE_00).
+
+    Returns
+    -------
+    gradient : ndarray
+        The gradients, in the broadcast shape of the data sets x 3.
+    """
+    if wrt == 2:
+        dat1, dat2 = dat2, dat1
+    msp = metric_spaces[metric_function]
+    if metric_function is dE_00:
+        lch1, sqrt_C1 = _lch_00(dat1)
+        lch2, sqrt_C2 = _lch_00(dat2)
+        grad = _gradient_00(lch1, sqrt_C1, lch2, sqrt_C2, **kwargs)
+    else:
+        d1, d2 = get_broadcast(msp, dat1, dat2)
+        diff = d1 - d2
+        dist = np.sqrt(np.sum(diff**2, -1))
+        grad = _div0(diff, dist[..., np.newaxis])
+    if sp is None or sp is msp:
+        return grad
+    chain = msp.base_chain()
+    for anc in sp.base_chain():
+        if anc in chain:
+            break
+    if np.shape(grad) == dat1.sh:
+        grad = msp.vjp(dat1, np.reshape(grad, (-1, 3)), anc)
+        return np.reshape(sp.inv_vjp(dat1, grad, anc), dat1.sh)
+    n = int(np.prod(dat1.sh[:-1]))                  # dat1 is broadcast
+    jac = msp.jacobian_ancestor_structured(dat1, anc).dot(
+        sp.inv_jacobian_ancestor_structured(dat1, anc)).full(n)
+    jac = np.reshape(jac, dat1.sh[:-1] + (3, 3))
+    return np.einsum('...k,...ki->...i', grad, jac)
+
+
+def uncertainty(metric_function, dat1, dat2, **kwargs):
+    """
+    Compute a colour metric with its propagated standard uncertainty.
+
+    Either data set can be given as data.CovarianceData, whose covariances
+    are propagated to first order through the metric using the analytic
+    gradients (see gradient), assuming the two data sets to be
+    independent. Data sets given as Data are treated as exact. The first
+    order approximation requires the differences to be large compared to
+    the uncertainties; for identical colours it gives zero.
+
+    Parameters
+    ----------
+    metric_function : function
+        The colour metric, one of the functions in metric_spaces.
+    dat1 : Data or CovarianceData
+        The colour data of the first data set.
+    dat2 : Data or CovarianceData
+        The colour data of the second data set.
+    kwargs : dict
+        Additional parameters of the metric (e.g., k_L for dE_00).
+
+    Returns
+    -------
+    distance : ndarray
+        Array of the difference or distances between the two data sets.
+    std : ndarray
+        Array of the standard uncertainties of the distances.
+    """
+    msp = metric_spaces[metric_function]
+    points = [dat.points if isinstance(dat, data.CovarianceData) else dat
+              for dat in (dat1, dat2)]
+    diff = metric_function(points[0], points[1], **kwargs)
+    var = np.zeros(np.shape(diff))
+    for wrt, dat in enumerate((dat1, dat2), 1):
+        if isinstance(dat, data.CovarianceData):
+            grad = gradient(metric_function, points[0], points[1], msp, wrt,
+                            **kwargs)
+            cov = np.reshape(dat.get_packed(msp), dat.points.sh[:-1] + (6,))
+            var = var + misc.norm_sq(grad, cov)
+    return diff, scalar_or_array(np.sqrt(var))
+
+
+# =============================================================================
+# Pairwise colour differences
+# =============================================================================
+
+
+class _DataBlock(data.Data):
+    """
+    A block of the colour points of a Data object, shaped for broadcasting.
+
+    The colour conversions are done (once) for the full parent data set,
+    and the block is sliced from the parent's cached data.
+    """
+
+    def __init__(self, parent, index, shape):
+        """
+        Construct new instance as a view of the parent data.
+
+        Parameters
+        ----------
+        parent : Data
+            The full data set.
+        index : slice
+            The points of the (linearised) parent data in the block.
+        shape : tuple
+            The shape of the block colour data, e.g., (n, 1, 3).
+        """
+        self.parent = parent
+        self.index = index
+        self.space = parent.space
+        self.data = dict()
+        self.sh = shape
+
+    def get(self, sp):
+        """
+        Return the block colour data in required colour space.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space for the returned data.
+
+        Returns
+        -------
+        ndata : ndarray
+            The colour data of the block in the given colour space.
+        """
+        return np.reshape(self.parent.get_linear(sp)[self.index], self.sh)
+
+
+def _pairwise_blocks(dat1, dat2, block):
+    """
+    Return the row and column blocks for the pairwise computations.
+
+    Parameters
+    ----------
+    dat1 : Data
+        The colour data of the first data set (rows).
+    dat2 : Data
+        The colour data of the second data set (columns).
+    block : int
+        The maximum number of rows and columns per block.
+
+    Returns
+    -------
+    rows : list
+        List of (slice, _DataBlock) pairs for the rows.
+    cols : list
+        List of (slice, _DataBlock) pairs for the columns.
+    """
+    n1 = int(np.prod(dat1.sh[:-1]))
+    n2 = int(np.prod(dat2.sh[:-1]))
+    rows = []
+    for i in range(0, n1, block):
+        sl = slice(i, min(i + block, n1))
+        rows.append((sl, _DataBlock(dat1, sl, (sl.stop - sl.start, 1, 3))))
+    cols = []
+    for j in range(0, n2, block):
+        sl = slice(j, min(j + block, n2))
+        cols.append((sl, _DataBlock(dat2, sl, (1, sl.stop - sl.start, 3))))
+    return rows, cols
+
+
+def _run_blocks(func, tasks, n_threads):
+    """
+    Apply func to all tasks, optionally on a thread pool.
+
+    The first task is always run in the calling thread, so that the
+    colour conversions of the data sets are done and cached once
+    before the remaining tasks are distributed.
+
+    Parameters
+    ----------
+    func : function
+        Function taking one task as argument.
+    tasks : list
+        The tasks.
+    n_threads : int
+        The number of threads.
+
+    Returns
+    -------
+    results : list
+        The results of func for each task.
+    """
+    if not tasks:
+        return []
+    results = [func(tasks[0])]
+    if n_threads > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(n_threads) as executor:
+            results.extend(executor.map(func, tasks[1:]))
+    else:
+        results.extend(func(task) for task in tasks[1:])
+    return results
+
+
+def pairwise(metric_function, dat1, dat2, block=1024, out=None,
+             n_threads=1):
+    """
+    Compute the matrix of colour differences between all pairs of points.
+
+    The data sets are converted to the colour space(s) of the metric
+    once, and the differences are computed in blocks of at most
+    block x block pairs, bounding the temporary memory use. Metric
+    parameters can be given by using, e.g., functools.partial.
+
+    Parameters
+    ----------
+    metric_function : function
+        Colour metric function taking two Data objects, e.g., dE_00.
+    dat1 : Data
+        The colour data of the first data set (N points, rows).
+    dat2 : Data
+        The colour data of the second data set (M points, columns).
+    block : int
+        The maximum number of rows and columns per block.
+    out : ndarray or str
+        Array of shape N x M for the result, or file name of a memory
+        mapped .npy file to be created for the result. A new array is
+        returned if None.
+    n_threads : int
+        The number of threads for computing the blocks.
+
+    Returns
+    -------
+    distance : ndarray
+        N x M array (or memory map) of the differences.
+    """
+    rows, cols = _pairwise_blocks(dat1, dat2, block)
+    shape = (rows[-1][0].stop if rows else 0, cols[-1][0].stop if cols else 0)
+    if out is None:
+        out = np.empty(shape)
+    elif isinstance(out, str):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=float,
+                                        shape=shape)
+
+    def compute(task):
+        (sl1, b1), (sl2, b2) = task
+        out[sl1, sl2] = metric_function(b1, b2)
+
+    _run_blocks(compute, [(r, c) for r in rows for c in cols], n_threads)
+    return out
+
+
+def pairwise_argmin(metric_function, dat1, dat2, block=1024, n_threads=1):
+    """
+    Find the nearest point in dat2 for each point in dat1.
+
+    Computed blockwise as in pairwise, without materialising the full
+    matrix of colour differences.
+
+    Parameters
+    ----------
+    metric_function : function
+        Colour metric function taking two Data objects, e.g., dE_00.
+    dat1 : Data
+        The colour data of the first data set (queries).
+    dat2 : Data
+        The colour data of the second data set (candidates).
+    block : int
+        The maximum number of rows and columns per block.
+    n_threads : int
+        The number of threads for computing the row blocks.
+
+    Returns
+    -------
+    index : ndarray
+        Index of the nearest point in the linearised dat2, in the shape
+        of dat1.
+    distance : ndarray
+        The corresponding colour differences.
+    """
+    rows, cols = _pairwise_blocks(dat1, dat2, block)
+    n1 = rows[-1][0].stop if rows else 0
+    index = np.zeros(n1, dtype=int)
+    distance = np.full(n1, np.inf)
+
+    def compute(row):
+        sl1, b1 = row
+        for sl2, b2 in cols:
+            diff = metric_function(b1, b2)
+            j = np.argmin(diff, axis=1)
+            d = diff[np.arange(len(j)), j]
+            better = d < distance[sl1]
+            index[sl1][better] = j[better] + sl2.start
+            distance[sl1][better] = d[better]
+
+    _run_blocks(compute, rows, n_threads)
+    sh = dat1.sh[:-1]
+    return np.reshape(index, sh)[()], np.reshape(distance, sh)[()]
+
+
+# =============================================================================
+# Nearest colour search
+# =============================================================================
+
+
+class NearestIndex(object):
+    """
+    Index over colour data for k-nearest and radius queries.
+
+    For the Euclidean colour metrics (dE_ab, dE_uv, dE_E and the DIN99
+    metrics), a KD-tree is built in the corresponding colour space. For
+    dE_00, the KD-tree is built in the CIEDE00 L'a'b' space, and the
+    queries are answered exactly by re-ranking candidates with dE_00. The
+    candidates are selected using the lower bound
+
+        dE_00 >= kappa * |Delta L'a'b'|,
+
+    with kappa = min(1 / (k_L * S_L_max), sqrt(1 - sqrt(3) / 2) /
+    (max(k_C, k_h) * S_C_max)), which follows from Delta C'^2 + Delta H'^2
+    = |Delta a'b'|^2, |R_T| <= sqrt(3), S_H <= S_C and the bounds S_L_max
+    and S_C_max on S_L and S_C, see search_radius.
+    """
+
+    def __init__(self, dat, metric_function=dE_00, k_L=1, k_C=1, k_h=1):
+        """
+        Construct the index over the given colour data.
+
+        Parameters
+        ----------
+        dat : Data
+            The colour data to be indexed.
+        metric_function : function
+            The colour metric, dE_00 or one of the Euclidean metrics.
+        k_L : float
+            Parameter of the CIEDE00 metric
+        k_C : float
+            Parameter of the CIEDE00 metric
+        k_h : float
+            Parameter of the CIEDE00 metric
+        """
+        from scipy import spatial
+        self.metric_function = metric_function
+        if metric_function is dE_00:
+            self.space = space.ciede00lab
+            self.k_L = k_L
+            self.k_C = k_C
+            self.k_h = k_h
+            self.lch = dat.get_linear(space.ciede00lch)
+            self.L_range = (np.min(self.lch[:, 0]), np.max(self.lch[:, 0]))
+            self.C_max = np.max(self.lch[:, 1])
+        elif metric_function in euclidean_metric_spaces:
+            self.space = euclidean_metric_spaces[metric_function]
+        else:
+            raise ValueError('Unsupported metric function for NearestIndex')
+        self.tree = spatial.cKDTree(dat.get_linear(self.space))
+        self.n = self.tree.n
+
+    def search_radius(self, lch, distance):
+        """
+        Return the radius in L'a'b' beyond which dE_00 exceeds distance.
+
+        Based on the lower bound in the class description, where C' of an
+        indexed point at the L'a'b' distance e from the query point is
+        bounded by C'_query + e, and the lightness weighting S_L is
+        bounded over the range of L' in the index.
+
+        Parameters
+        ----------
+        lch : ndarray
+            P x 3 array of query points in the ciede00lch space.
+        distance : ndarray
+            The dE_00 distance for each query point.
+
+        Returns
+        -------
+        radius : ndarray
+            The L'a'b' radius for each query point (can be inf).
+        """
+        u = np.maximum(np.abs(.5 * (lch[:, 0] + self.L_range[0]) - 50),
+                       np.abs(.5 * (lch[:, 0] + self.L_range[1]) - 50))
+        S_L_max = 1 + 0.015 * u**2 / np.sqrt(20 + u**2)
+        radius_L = self.k_L * distance * S_L_max
+        sqrt_lam = np.sqrt(1 - np.sqrt(3) / 2)
+        k_Ch = max(self.k_C, self.k_h)
+        S_C_max = 1 + 0.045 * .5 * (lch[:, 1] + self.C_max)
+        radius_C = k_Ch * distance * S_C_max / sqrt_lam
+        denom = sqrt_lam - 0.0225 * k_Ch * distance
+        with np.errstate(divide='ignore', invalid='ignore'):
+            radius_e = np.where(denom > 0, k_Ch * distance *
+                                (1 + 0.045 * lch[:, 1]) / denom, np.inf)
+        return np.maximum(radius_L, np.minimum(radius_C, radius_e))
+
+    def _dE_00(self, lch, index):
+        """
+        Compute dE_00 between query points and indexed points.
+
+        Parameters
+        ----------
+        lch : ndarray
+            P x 3 array of query points in the ciede00lch space.
+        index : ndarray
+            P x K array of indices of the indexed points.
+
+        Returns
+        -------
+        distance : ndarray
+            P x K array of colour differences.
+        """
+        return dE_00(data.Data(space.ciede00lch, lch[:, np.newaxis, :]),
+                     data.Data(space.ciede00lch, self.lch[index]),
+                     self.k_L, self.k_C, self.k_h)
+
+    def query(self, dat, k=1, block=65536):
+        """
+        Find the k nearest indexed points for each point in dat.
+
+        Parameters
+        ----------
+        dat : Data
+            The query colour data.
+        k : int
+            The number of nearest points to find.
+        block : int
+            The number of query points processed at a time, bounding the
+            temporary memory use for dE_00.
+
+        Returns
+        -------
+        index : ndarray
+            Indices of the nearest points, sorted by increasing colour
+            difference. The shape is that of dat, with the last
+            dimension replaced by k, or dropped if k is 1.
+        distance : ndarray
+            The corresponding colour differences.
+        """
+        k = min(k, self.n)
+        pts = dat.get_linear(self.space)
+        if self.metric_function is dE_00:
+            lch = dat.get_linear(space.ciede00lch)
+            index = np.zeros((np.shape(pts)[0], k), dtype=int)
+            distance = np.zeros((np.shape(pts)[0], k))
+            for i in range(0, np.shape(pts)[0], block):
+                sl = slice(i, i + block)
+                index[sl], distance[sl] = self._query_00(pts[sl], lch[sl], k)
+        else:
+            distance, index = self.tree.query(pts, k)
+        sh = dat.sh[:-1] + ((k,) if k > 1 else ())
+        return (np.reshape(index, sh)[()], np.reshape(distance, sh)[()])
+
+    def _query_00(self, lab, lch, k):
+        """
+        Find the k nearest indexed points under dE_00.
+
+        The k-th smallest dE_00 among a few KD-tree candidates gives a
+        search radius (see search_radius) in L'a'b'. Query points with
+        indexed points within the radius not among the candidates are
+        re-queried with enough candidates to include all of them,
+        grouped by the required number (rounded up to at most 25 % more).
+
+        Parameters
+        ----------
+        lab : ndarray
+            P x 3 array of query points in the ciede00lab space.
+        lch : ndarray
+            P x 3 array of query points in the ciede00lch space.
+        k : int
+            The number of nearest points to find.
+
+        Returns
+        -------
+        index : ndarray
+            P x k array of indices of the nearest points.
+        distance : ndarray
+            P x k array of the corresponding colour differences.
+        """
+        n = np.shape(lab)[0]
+        n_cand = min(max(4 * k, 16), self.n)
+        e, cand = self.tree.query(lab, n_cand)
+        cand = np.reshape(cand, (n, n_cand))
+        index, distance = self._k_smallest(lch, cand, k)
+        radius = self.search_radius(lch, distance[:, -1])
+        redo = np.flatnonzero(np.reshape(e, (n, n_cand))[:, -1] < radius)
+        if n_cand == self.n or not len(redo):
+            return index, distance
+        count = self.tree.query_ball_point(lab[redo], radius[redo],
+                                           return_length=True)
+        step = 2**np.maximum(np.floor(np.log2(count)).astype(int) - 2, 0)
+        n_redo = np.minimum(-(-count // step) * step, self.n)
+        for nc in np.unique(n_redo):
+            sub = redo[n_redo == nc]
+            cand = np.reshape(self.tree.query(lab[sub], nc)[1], (-1, nc))
+            index[sub], distance[sub] = self._k_smallest(lch[sub], cand, k)
+        return index, distance
+
+    def _k_smallest(self, lch, cand, k):
+        """
+        Return the k candidates with the smallest dE_00 for each query point.
+
+        Parameters
+        ----------
+        lch : ndarray
+            P x 3 array of query points in the ciede00lch space.
+        cand : ndarray
+            P x K array of indices of candidate points.
+        k : int
+            The number of points to return.
+
+        Returns
+        -------
+        index : ndarray
+            P x k array of indices of the nearest candidates.
+        distance : ndarray
+            P x k array of the corresponding colour differences.
+        """
+        d = self._dE_00(lch, cand)
+        order = np.argsort(d, axis=1)[:, :k]
+        return (np.take_along_axis(cand, order, 1),
+                np.take_along_axis(d, order, 1))
+
+    def query_radius(self, dat, r):
+        """
+        Find all indexed points within the colour difference r.
+
+        Parameters
+        ----------
+        dat : Data
+            The query colour data.
+        r : float or ndarray
+            The search radius, or one radius per query point.
+
+        Returns
+        -------
+        index : list
+            List of arrays of indices of the points within the radius for
+            each point in the linearised query data.
+        """
+        pts = dat.get_linear(self.space)
+        r = np.broadcast_to(r, np.shape(pts)[:1])
+        if self.metric_function is not dE_00:
+            return [np.sort(i) for i in self.tree.query_ball_point(pts, r)]
+        lch = dat.get_linear(space.ciede00lch)
+        cands = self.tree.query_ball_point(pts, self.search_radius(lch, r))
+        if not len(cands):
+            return []
+        lengths = np.array([len(c) for c in cands], dtype=int)
+        cand = np.concatenate([np.array(c, dtype=int) for c in cands])
+        query = np.repeat(np.arange(len(cands)), lengths)
+        d = self._dE_00(lch[query], cand[:, np.newaxis])[:, 0]
+        inside = d <= r[query]
+        split = np.cumsum(lengths)[:-1]
+        return [np.sort(c[i]) for c, i in
+                zip(np.split(cand, split), np.split(inside, split))]
+
+    def query_pairs(self, r, dat=None, block=2**22):
+        """
+        Find all pairs of points within the colour difference r.
+
+        Finds the pairs within the indexed data set, or between the given
+        data and the indexed data. For dE_00, the KD-tree candidates
+        within the search radius (see search_radius) are refined
+        exactly. The query points are processed in chunks of increasing
+        search radius with at most about block candidate pairs each.
+
+        Parameters
+        ----------
+        r : float
+            The colour difference tolerance.
+        dat : Data
+            The query colour data. If None, the pairs within the indexed
+            data are found.
+        block : int
+            The approximate maximum number of candidate pairs per chunk.
+
+        Returns
+        -------
+        pairs : ndarray
+            P x 2 array of index pairs (i, j), sorted lexicographically,
+            where j is the index in the indexed data, and i is the index
+            in the linearised query data or, if dat is None, in the
+            indexed data with i < j.
+        distance : ndarray
+            The corresponding colour differences.
+        """
+        from scipy import spatial
+        if dat is None:
+            pts = self.tree.data
+        else:
+            pts = dat.get_linear(self.space)
+        if self.metric_function is not dE_00:
+            if dat is None:
+                pairs = self.tree.query_pairs(r, output_type='ndarray')
+            else:
+                sdm = spatial.cKDTree(pts).sparse_distance_matrix(
+                    self.tree, r, output_type='ndarray')
+                pairs = np.column_stack((sdm['i'], sdm['j']))
+            diff = pts[pairs[:, 0]] - self.tree.data[pairs[:, 1]]
+            distance = np.sqrt(np.sum(diff**2, axis=1))
+        else:
+            lch = self.lch if dat is None else \
+                dat.get_linear(space.ciede00lch)
+            radius = self.search_radius(lch, r * np.ones(len(lch)))
+            count = self.tree.query_ball_point(pts, radius,
+                                               return_length=True)
+            order = np.argsort(radius)
+            chunk = np.cumsum(count[order]) // block
+            pairs = []
+            distance = []
+            for c in np.unique(chunk):
+                sub = order[chunk == c]
+                sdm = spatial.cKDTree(pts[sub]).sparse_distance_matrix(
+                    self.tree, np.max(radius[sub]), output_type='ndarray')
+                i = sub[sdm['i']]
+                j = sdm['j']
+                if dat is None:
+                    i, j = i[i < j], j[i < j]
+                d = dE_00(data.Data(space.ciede00lch, lch[i]),
+                          data.Data(space.ciede00lch, self.lch[j]),
+                          self.k_L, self.k_C, self.k_h)
+                pairs.append(np.column_stack((i, j))[d <= r])
+                distance.append(d[d <= r])
+            pairs = np.concatenate(pairs + [np.zeros((0, 2), dtype=int)])
+            distance = np.concatenate(distance + [np.zeros(0)])
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        return pairs[order], distance[order]
+
+
+def pairs_within(metric_function, dat1, r, dat2=None):
+    """
+    Find all pairs of colours within the colour difference r.
+
+    Uses a NearestIndex over dat1, see NearestIndex.query_pairs.
+
+    Parameters
+    ----------
+    metric_function : function
+        The colour metric, dE_00 or one of the Euclidean metrics.
+    dat1 : Data
+        The colour data.
+    r : float
+        The colour difference tolerance.
+    dat2 : Data
+        Second colour data set. If None, the pairs within dat1 are found.
+
+    Returns
+    -------
+    pairs : ndarray
+        P x 2 array of index pairs (i, j), sorted lexicographically, where
+        i is the index in the linearised dat1 and j in the linearised dat2,
+        or i < j are both indices in dat1 if dat2 is None.
+    distance : ndarray
+        The corresponding colour differences.
+    """
+    index = NearestIndex(dat1, metric_function)
+    if dat2 is None:
+        return index.query_pairs(r)
+    pairs, distance = index.query_pairs(r, dat2)
+    pairs = pairs[:, ::-1]
+    order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+    return pairs[order], distance[order]
+
+
+# =============================================================================
+# Geodesic distances
+# =============================================================================
+
+
+def _path_tensors(sp, metric_tensor_function, points):
+    """
+    Return the packed metric tensors at an array of points.
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space of the points.
+    metric_tensor_function : function
+        Function giving the metric tensors at given colour data points.
+    points : ndarray
+        ... x 3 array of points in the given colour space.
+
+    Returns
+    -------
+    packed : ndarray
+        ... x 6 array of packed metric tensors in the given space.
+    """
+    g = metric_tensor_function(data.Data(sp, np.reshape(points, (-1, 3))))
+    return np.reshape(g.get_packed(sp), np.shape(points)[:-1] + (6,))
+
+
+def _path_length(sp, metric_tensor_function, paths):
+    """
+    Return the lengths of discretised paths.
+
+    The metric tensor is evaluated at the midpoint of each segment.
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space of the paths.
+    metric_tensor_function : function
+        Function giving the metric tensors at given colour data points.
+    paths : ndarray
+        N x (n + 1) x 3 array of paths with n segments.
+
+    Returns
+    -------
+    length : ndarray
+        Array of N path lengths.
+    """
+    mid = .5 * (paths[:, 1:] + paths[:, :-1])
+    diff = paths[:, 1:] - paths[:, :-1]
+    g = _path_tensors(sp, metric_tensor_function, mid)
+    return np.sum(np.sqrt(np.maximum(misc.norm_sq(diff, g), 0)), 1)
+
+
+def _relax_paths(sp, metric_tensor_function, paths, iterations, step, h):
+    """
+    Minimise the discrete energy of paths with fixed end points.
+
+    The energy is the sum of dx^T g dx over the segments, with g at the
+    segment midpoints. Its minimisers are constant speed geodesics. All
+    interior nodes of all paths are updated simultaneously by damped
+    Newton steps, using the metric as approximate Hessian and finite
+    differences (with step h) for the derivatives of the metric.
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space of the paths.
+    metric_tensor_function : function
+        Function giving the metric tensors at given colour data points.
+    paths : ndarray
+        N x (n + 1) x 3 array of initial paths with n segments.
+    iterations : int
+        The number of iterations.
+    step : float
+        The damping factor of the Newton steps.
+    h : float
+        The step length for the finite differences.
+
+    Returns
+    -------
+    paths : ndarray
+        N x (n + 1) x 3 array of relaxed paths.
+    """
+    paths = paths.copy()
+    for it in range(iterations):
+        mid = .5 * (paths[:, 1:] + paths[:, :-1])
+        diff = paths[:, 1:] - paths[:, :-1]
+        g = _path_tensors(sp, metric_tensor_function, mid)
+        G = misc.unpack_sym(g)
+        Gd = np.einsum('...ij,...j->...i', G, diff)
+        energy = np.einsum('...i,...i', Gd, diff)
+        force = np.zeros(np.shape(diff))
+        for i in range(3):
+            g_h = _path_tensors(sp, metric_tensor_function,
+                                mid + h * np.eye(3)[i])
+            force[..., i] = (misc.norm_sq(diff, g_h) - energy) / h
+        grad = 2 * (Gd[:, :-1] - Gd[:, 1:]) + .5 * (force[:, :-1] +
+                                                      force[:, 1:])
+        hess = 2 * (G[:, :-1] + G[:, 1:])
+        paths[:, 1:-1] -= step * np.linalg.solve(
+            hess, grad[..., np.newaxis])[..., 0]
+    return paths
+
+
+def _graph_paths(field, p1, p2):
+    """
+    Return shortest paths between points on the grid of a tensor field.
+
+    The grid nodes are connected to their 26 neighbours, with the edge
+    lengths given by the linearised metric with the mean tensor of the two
+    nodes. The paths run from the grid node nearest to p1 to the grid node
+    nearest to p2, and the end points are replaced by p1 and p2. One
+    shortest path tree is computed per distinct start node, so the cost
+    grows with the number of distinct start points.
+
+    Parameters
+    ----------
+    field : tensor.TensorField
+        The precomputed metric tensors on a grid.
+    p1 : ndarray
+        N x 3 array of start points in the colour space of the field.
+    p2 : ndarray
+        N x 3 array of end points in the colour space of the field.
+
+    Returns
+    -------
+    paths : list
+        List of N arrays of path nodes.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import dijkstra
+    shape = np.shape(field.packed)[:3]
+    grid = np.stack(np.meshgrid(*field.axes, indexing='ij'), -1)
+    index = np.reshape(np.arange(np.prod(shape)), shape)
+    rows = []
+    cols = []
+    weights = []
+    for offset in np.ndindex(3, 3, 3):
+        offset = np.array(offset) - 1
+        if not np.any(offset) or offset[np.flatnonzero(offset)[0]] < 0:
+            continue                                    # Symmetric edges
+        src = tuple(slice(max(0, -o), n - max(0, o))
+                    for o, n in zip(offset, shape))
+        dst = tuple(slice(max(0, o), n - max(0, -o))
+                    for o, n in zip(offset, shape))
+        diff = grid[dst] - grid[src]
+        g = .5 * (field.packed[src] + field.packed[dst])
+        rows.append(np.ravel(index[src]))
+        cols.append(np.ravel(index[dst]))
+        weights.append(np.ravel(np.sqrt(np.maximum(misc.norm_sq(diff, g),
+                                                   1e-300))))
+    n = int(np.prod(shape))
+    graph = coo_matrix((np.concatenate(weights),
+                        (np.concatenate(rows), np.concatenate(cols))),
+                       shape=(n, n)).tocsr()
+
+    def nearest(p):
+        i = [np.argmin(np.abs(ax[np.newaxis] - p[:, k, np.newaxis]), 1)
+             for k, ax in enumerate(field.axes)]
+        return np.ravel_multi_index(i, shape)
+
+    start = nearest(p1)
+    end = nearest(p2)
+    sources, inverse = np.unique(start, return_inverse=True)
+    _, pred = dijkstra(graph, directed=False, indices=sources,
+                       return_predecessors=True)
+    # All paths backwards at once
+    walk = [end]
+    length = np.ones(len(end), int)
+    active = (end != start) & (end >= 0)
+    while np.any(active):
+        node = np.where(active, pred[inverse, np.maximum(walk[-1], 0)],
+                        walk[-1])
+        walk.append(node)
+        length += active
+        active = active & (node != start) & (node >= 0)
+    nodes = np.reshape(grid, (-1, 3))[np.array(walk)]
+    return [np.vstack((p1[k], nodes[1:length[k] - 1, k][::-1], p2[k]))
+            for k in range(len(end))]
+
+
+def _resample_path(path, n):
+    """
+    Resample a polygonal path to n segments of equal Euclidean length.
+
+    Parameters
+    ----------
+    path : ndarray
+        m x 3 array of path nodes.
+    n : int
+        The number of segments.
+
+    Returns
+    -------
+    path : ndarray
+        (n + 1) x 3 array of path nodes.
+    """
+    s = np.concatenate(([0], np.cumsum(np.sqrt(np.sum(np.diff(path, axis=0)**2,
+                                                       1)))))
+    if s[-1] == 0:
+        return np.tile(path[0], (n + 1, 1))
+    t = np.linspace(0, s[-1], n + 1)
+    return np.column_stack([np.interp(t, s, path[:, k]) for k in range(3)])
+
+
+def _refine_paths(paths, n):
+    """
+    Resample discretised paths to n segments by linear interpolation.
+
+    The nodes are equally spaced in the path parameter, so doubling the
+    number of segments keeps the existing nodes and adds the midpoints.
+
+    Parameters
+    ----------
+    paths : ndarray
+        N x (m + 1) x 3 array of paths with m segments.
+    n : int
+        The new number of segments.
+
+    Returns
+    -------
+    paths : ndarray
+        N x (n + 1) x 3 array of paths.
+    """
+    m = np.shape(paths)[1] - 1
+    t = np.linspace(0, m, n + 1)
+    i = np.minimum(np.floor(t).astype(int), m - 1)
+    f = (t - i)[:, np.newaxis]
+    return (1 - f) * paths[:, i] + f * paths[:, i + 1]
+
+
+def geodesic(sp, dat1, dat2, metric_tensor_function, n=16, iterations=10,
+             step=1., field=None, return_paths=False):
+    """
+    Compute the geodesic distances between the two data sets.
+
+    The geodesics are approximated by discretised paths in the given
+    colour space, which are optimised for all pairs simultaneously by
+    minimising the path energy (see _relax_paths). The paths start as
+    straight lines, or, if a tensor.TensorField is given, as shortest
+    paths on its grid resampled to four segments, which helps when the
+    straight line is far from the geodesic, e.g., for strongly varying
+    metrics. They are refined by doubling the number of segments
+    until there are n, relaxing the paths for the given number of
+    iterations on every level. The distances are the lengths of the
+    final paths. The optimisation is local, so for metrics that are
+    degenerate somewhere (e.g., tensor.dE_00 at C = 0), different initial
+    paths can give different local minima.
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space in which to compute the geodesics.
+    dat1 : Data
+        The colour data of the first data set.
+    dat2 : Data
+        The colour data of the second data set.
+    metric_tensor_function : function
+        Function giving the metric tensors at given colour data points,
+        e.g., from the tensor module, or a precomputed tensor.TensorField.
+    n : int
+        The number of path segments, preferably a power of two.
+    iterations : int
+        The number of relaxation iterations for every level of refinement.
+    step : float
+        The damping factor of the relaxation steps.
+    field : TensorField
+        Field in the colour space sp for computing initial paths.
+    return_paths : bool
+        Whether to return the paths as well.
+
+    Returns
+    -------
+    distance : ndarray
+        Array of the geodesic distances between the two data sets.
+    paths : ndarray
+        ... x (n + 1) x 3 array of the geodesic paths in the colour space,
+        if return_paths is True.
+    """
+    d1, d2 = get_broadcast(sp, dat1, dat2)
+    d1, d2 = np.broadcast_arrays(d1, d2)
+    sh = np.shape(d1)[:-1]
+    p1 = np.reshape(d1, (-1, 3))
+    p2 = np.reshape(d2, (-1, 3))
+    h = 1e-6 * (1 + np.max(np.abs(np.concatenate((p1, p2)))))
+    segments = 1
+    if field is not None:
+        segments = min(4, n)
+        paths = np.array([_resample_path(path, segments)
+                          for path in _graph_paths(field, p1, p2)])
+    else:
+        paths = np.stack((p1, p2), 1)
+    while True:
+        paths = _relax_paths(sp, metric_tensor_function, paths, iterations,
+                             step, h)
+        if segments >= n:
+            break
+        segments = min(2 * segments, n)
+        paths = _refine_paths(paths, segments)
+    dist = np.reshape(_path_length(sp, metric_tensor_function, paths), sh)
+    if return_paths:
+        return scalar_or_array(dist), np.reshape(paths, sh + np.shape(
+            paths)[1:])
+    return scalar_or_array(dist)
 
 
 # =============================================================================
@@ -350,3 +2025,38 @@ def test():
     for met in [dE_ab, dE_uv, dE_00, dE_DIN99,
                 dE_DIN99b, dE_DIN99c, dE_DIN99d]:
         print(met, np.min(met(d1, d2)), np.max(met(d1, d2)))
+
+
+def benchmark_dE_00(n=10**7, block=2**14):
+    """
+    Time dE_00 against dE_00_fused on n random pairs, print results.
+
+    Parameters
+    ----------
+    n : int
+        The number of colour pairs.
+    block : int
+        The chunk size of dE_00_fused.
+    """
+    import time
+    rng = np.random.RandomState(0)
+    d1 = data.Data(space.cielab, np.column_stack(
+        (rng.uniform(0, 100, n), rng.uniform(-100, 100, (n, 2)))))
+    d2 = data.Data(space.cielab, np.column_stack(
+        (rng.uniform(0, 100, n), rng.uniform(-100, 100, (n, 2)))))
+    d1.get(space.ciede00lch)
+    d2.get(space.ciede00lch)
+    t = time.time()
+    ref = dE_00(d1, d2)
+    print('dE_00:               %.3f s' % (time.time() - t))
+    backends = ['numpy']
+    try:
+        import numexpr                                          # noqa: F401
+        backends.append('numexpr')
+    except ImportError:
+        pass
+    for backend in backends:
+        t = time.time()
+        diff = dE_00_fused(d1, d2, block=block, backend=backend)
+        print('dE_00_fused (%s): %.3f s, max deviation %g' %
+              (backend, time.time() - t, np.max(np.abs(diff - ref))))
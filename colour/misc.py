@@ -19,6 +19,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import contextlib
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -82,11 +83,109 @@ def safe_div(a, b, fill=1.):
     return res
 
 
+# =============================================================================
+# Symmetric tensors in packed storage
+#
+# A symmetric 3x3 tensor g is stored as its six independent components
+# (g00, g11, g22, g12, g02, g01), i.e., the diagonal followed by the
+# off-diagonal elements. Arrays of packed tensors have the shape ... x 6,
+# arrays of full tensors the shape ... x 3 x 3.
+# =============================================================================
+
+sym_i = np.array([0, 1, 2, 1, 0, 0])   # Row index of the packed components
+sym_j = np.array([0, 1, 2, 2, 2, 1])   # Column index of the packed components
+sym_index = np.array([[0, 5, 4],        # Packed index of the full components
+                      [5, 1, 3],
+                      [4, 3, 2]])
+
+
+def is_packed(tensor):
+    """
+    Return True if the tensor data are in packed symmetric storage.
+
+    Parameters
+    ----------
+    tensor : ndarray
+        Array of tensors, either ... x 6 (packed) or ... x 3 x 3 (full).
+
+    Returns
+    -------
+    packed : bool
+        True if the tensors are packed.
+    """
+    return np.shape(tensor)[-1] == 6
+
+
+def pack_sym(tensor):
+    """
+    Pack full symmetric tensors into the six component storage.
+
+    Only the upper triangle (including the diagonal) is read.
+
+    Parameters
+    ----------
+    tensor : ndarray
+        ... x 3 x 3 array of symmetric tensors.
+
+    Returns
+    -------
+    packed : ndarray
+        ... x 6 array of packed tensors.
+    """
+    return np.asarray(tensor)[..., sym_i, sym_j]
+
+
+def unpack_sym(packed):
+    """
+    Expand packed symmetric tensors to full 3 x 3 matrices.
+
+    Parameters
+    ----------
+    packed : ndarray
+        ... x 6 array of packed tensors.
+
+    Returns
+    -------
+    tensor : ndarray
+        ... x 3 x 3 array of symmetric tensors.
+    """
+    return np.asarray(packed)[..., sym_index]
+
+
+def congruence_sym(jacobian, packed):
+    """
+    Compute the congruence transform J^T * g * J of packed tensors.
+
+    This is the transformation of covariant tensors (e.g., colour metric
+    tensors) under a change of coordinates with Jacobian J. Only the six
+    independent components of the result are computed. The leading
+    dimensions of the two arrays are broadcast against each other, so a
+    single tensor can be transformed by a list of Jacobians and vice
+    versa.
+
+    Parameters
+    ----------
+    jacobian : ndarray
+        ... x 3 x 3 array of Jacobians.
+    packed : ndarray
+        ... x 6 array of packed symmetric tensors.
+
+    Returns
+    -------
+    packed : ndarray
+        ... x 6 array of the transformed packed tensors.
+    """
+    gj = np.einsum('...kl,...lb->...kb', unpack_sym(packed), jacobian)
+    return np.einsum('...kn,...kn->...n',
+                     jacobian[..., sym_i], gj[..., sym_j])
+
+
 def inner(data1, data2, tensor):
     """
     Compute the inner products of two datasets with a given metric tensor.
 
     The data sets and the tensor data set must have corresponding dimensions.
+    The tensors can be given either as full matrices or in packed storage.
 
     Parameters
     ----------
@@ -102,6 +201,10 @@ def inner(data1, data2, tensor):
     inner_product: ndarray
         Array with numerical values for the inner product
     """
+    if is_packed(tensor):
+        prod = data1[..., sym_i] * data2[..., sym_j]
+        prod[..., 3:] += data1[..., sym_j[3:]] * data2[..., sym_i[3:]]
+        return np.einsum('...n,...n', tensor, prod)
     return np.einsum('...ij,...i,...j', tensor, data1, data2)
 
 
@@ -110,6 +213,7 @@ def norm_sq(data, tensor):
     Compute the squared norm of a colour data set with a given metric tensor.
 
     The data set and the tensor data set must have corresponding dimensions.
+    The tensors can be given either as full matrices or in packed storage.
 
     Parameters
     ----------
@@ -123,6 +227,10 @@ def norm_sq(data, tensor):
     norms: ndarray
         Array with numerical (scalar) values of the squared norm.
     """
+    if is_packed(tensor):
+        prod = data[..., sym_i] * data[..., sym_j]
+        prod[..., 3:] *= 2
+        return np.einsum('...n,...n', tensor, prod)
     return inner(data, data, tensor)
 
 
@@ -145,3 +253,914 @@ def norm(data, tensor):
         Array with numerical (scalar) values of the norm.
     """
     return np.sqrt(norm_sq(data, tensor))
+
+
+# =============================================================================
+# Structured symmetric tensors
+#
+# Arrays of symmetric tensors that know their own structure: constant (the
+# same tensor at all points, with identity as a special case), diagonal, or
+# full (packed). The structure is exploited in the congruence transforms
+# used for converting metric tensors between colour spaces.
+# =============================================================================
+
+
+def _jacobian_matrix(jacobian):
+    """
+    Return Jacobians given as ndarray or Jacobian as a broadcastable array.
+
+    Parameters
+    ----------
+    jacobian : ndarray or Jacobian
+        The Jacobians.
+
+    Returns
+    -------
+    jacobian : ndarray
+        Array broadcastable to N x 3 x 3.
+    """
+    if isinstance(jacobian, Jacobian):
+        return jacobian.matrix()
+    return jacobian
+
+
+class SymTensor(object):
+    """
+    Base class for structured arrays of symmetric tensors.
+
+    Children must implement packed and congruence.
+    """
+
+    def full(self, n):
+        """
+        Return the tensors as full matrices.
+
+        Parameters
+        ----------
+        n : int
+            The number of tensors (points).
+
+        Returns
+        -------
+        tensor : ndarray
+            n x 3 x 3 array of tensors.
+        """
+        return unpack_sym(self.packed(n))
+
+
+class SymConstant(SymTensor):
+    """
+    The same symmetric tensor at all points.
+    """
+
+    def __init__(self, tensor):
+        """
+        Construct instance from the constant tensor.
+
+        Parameters
+        ----------
+        tensor : ndarray
+            The tensor, either 3 x 3 full or 6 packed.
+        """
+        tensor = np.asarray(tensor, dtype=float)
+        if not is_packed(tensor):
+            tensor = pack_sym(tensor)
+        self.g = tensor
+
+    def packed(self, n):
+        """
+        Return the tensors in packed storage.
+
+        Parameters
+        ----------
+        n : int
+            The number of tensors (points).
+
+        Returns
+        -------
+        packed : ndarray
+            n x 6 array of packed tensors.
+        """
+        return np.tile(self.g, (n, 1))
+
+    def congruence(self, jacobian):
+        """
+        Return the congruence transform J^T * g * J.
+
+        Parameters
+        ----------
+        jacobian : ndarray or Jacobian
+            N x 3 x 3 array of Jacobians.
+
+        Returns
+        -------
+        tensor : SymTensor
+            The transformed tensors.
+        """
+        if isinstance(jacobian, JacobianConstant):
+            return SymConstant(congruence_sym(jacobian.M, self.g))
+        if isinstance(jacobian, JacobianDiagonal):
+            d = jacobian.d
+            return SymFull(self.g * d[:, sym_i] * d[:, sym_j])
+        return SymFull(congruence_sym(_jacobian_matrix(jacobian), self.g))
+
+
+class SymIdentity(SymConstant):
+    """
+    The identity tensor at all points (Euclidean metric).
+    """
+
+    def __init__(self):
+        """
+        Construct instance.
+        """
+        super(SymIdentity, self).__init__(np.eye(3))
+
+    def congruence(self, jacobian):
+        """
+        Return the congruence transform J^T * J.
+
+        Parameters
+        ----------
+        jacobian : ndarray or Jacobian
+            N x 3 x 3 array of Jacobians.
+
+        Returns
+        -------
+        tensor : SymTensor
+            The transformed tensors.
+        """
+        if isinstance(jacobian, JacobianIdentity):
+            return self
+        if isinstance(jacobian, JacobianDiagonal):
+            return SymDiagonal(jacobian.d**2)
+        jac = _jacobian_matrix(jacobian)
+        prod = np.einsum('...kn,...kn->...n', jac[..., sym_i], jac[..., sym_j])
+        if isinstance(jacobian, JacobianConstant):
+            return SymConstant(prod)
+        return SymFull(prod)
+
+
+class SymDiagonal(SymTensor):
+    """
+    Diagonal symmetric tensors.
+    """
+
+    def __init__(self, diagonal):
+        """
+        Construct instance from the diagonal elements.
+
+        Parameters
+        ----------
+        diagonal : ndarray
+            N x 3 array of the diagonal elements.
+        """
+        self.d = np.asarray(diagonal, dtype=float)
+
+    def packed(self, n):
+        """
+        Return the tensors in packed storage.
+
+        Parameters
+        ----------
+        n : int
+            The number of tensors (points).
+
+        Returns
+        -------
+        packed : ndarray
+            n x 6 array of packed tensors.
+        """
+        packed = np.zeros((n, 6))
+        packed[:, :3] = self.d
+        return packed
+
+    def congruence(self, jacobian):
+        """
+        Return the congruence transform J^T * g * J.
+
+        Parameters
+        ----------
+        jacobian : ndarray or Jacobian
+            N x 3 x 3 array of Jacobians.
+
+        Returns
+        -------
+        tensor : SymTensor
+            The transformed tensors.
+        """
+        if isinstance(jacobian, JacobianDiagonal):
+            return SymDiagonal(self.d * jacobian.d**2)
+        jac = _jacobian_matrix(jacobian)
+        return SymFull(np.einsum('...kn,...k,...kn->...n',
+                                 jac[..., sym_i], self.d, jac[..., sym_j]))
+
+
+class SymFull(SymTensor):
+    """
+    General symmetric tensors in packed storage.
+    """
+
+    def __init__(self, tensor):
+        """
+        Construct instance from the tensors.
+
+        Parameters
+        ----------
+        tensor : ndarray
+            N x 3 x 3 full or N x 6 packed tensors.
+        """
+        if not is_packed(tensor):
+            tensor = pack_sym(tensor)
+        self.g = tensor
+
+    def packed(self, n):
+        """
+        Return the tensors in packed storage.
+
+        Parameters
+        ----------
+        n : int
+            The number of tensors (points).
+
+        Returns
+        -------
+        packed : ndarray
+            n x 6 array of packed tensors.
+        """
+        return self.g
+
+    def congruence(self, jacobian):
+        """
+        Return the congruence transform J^T * g * J.
+
+        Parameters
+        ----------
+        jacobian : ndarray or Jacobian
+            N x 3 x 3 array of Jacobians.
+
+        Returns
+        -------
+        tensor : SymTensor
+            The transformed tensors.
+        """
+        if isinstance(jacobian, JacobianDiagonal):
+            d = jacobian.d
+            return SymFull(self.g * d[:, sym_i] * d[:, sym_j])
+        return SymFull(congruence_sym(_jacobian_matrix(jacobian), self.g))
+
+
+# =============================================================================
+# Structured Jacobians
+#
+# Arrays of Jacobian matrices that know their own structure: constant (the
+# same matrix at all points, as for linear transforms, with identity as a
+# special case), diagonal (channel-wise transforms), or full. Products of
+# structured Jacobians are computed by broadcasting or elementwise scaling,
+# and the N x 3 x 3 matrices are only materialised when needed.
+# =============================================================================
+
+
+class Jacobian(object):
+    """
+    Base class for structured arrays of Jacobian matrices.
+
+    Children must implement matrix, full, dot, inv, transpose, matvec and
+    rmatvec.
+    """
+
+    pass
+
+
+class JacobianConstant(Jacobian):
+    """
+    The same Jacobian matrix at all points.
+    """
+
+    def __init__(self, matrix):
+        """
+        Construct instance from the constant matrix.
+
+        Parameters
+        ----------
+        matrix : ndarray
+            The 3 x 3 Jacobian matrix.
+        """
+        self.M = np.asarray(matrix, dtype=float)
+
+    def matrix(self):
+        """
+        Return the Jacobians as an array broadcastable to N x 3 x 3.
+
+        Returns
+        -------
+        jacobian : ndarray
+            The 3 x 3 matrix.
+        """
+        return self.M
+
+    def full(self, n):
+        """
+        Return the Jacobians as full matrices.
+
+        Parameters
+        ----------
+        n : int
+            The number of Jacobians (points).
+
+        Returns
+        -------
+        jacobian : ndarray
+            n x 3 x 3 array of Jacobians.
+        """
+        return np.tile(self.M, (n, 1, 1))
+
+    def dot(self, other):
+        """
+        Return the matrix product self * other.
+
+        Parameters
+        ----------
+        other : Jacobian
+            The right hand factor.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The product.
+        """
+        if isinstance(other, JacobianIdentity):
+            return self
+        if isinstance(other, JacobianConstant):
+            return JacobianConstant(np.dot(self.M, other.M))
+        if isinstance(other, JacobianDiagonal):
+            return JacobianFull(self.M * other.d[:, np.newaxis, :])
+        return JacobianFull(np.matmul(self.M, other.J))
+
+    def inv(self):
+        """
+        Return the inverse Jacobians.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The inverse.
+        """
+        return JacobianConstant(np.linalg.inv(self.M))
+
+    def transpose(self):
+        """
+        Return the transposed Jacobians.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The transpose.
+        """
+        return JacobianConstant(self.M.T)
+
+    def matvec(self, vectors):
+        """
+        Return the Jacobian-vector products J v.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return np.dot(vectors, self.M.T)
+
+    def rmatvec(self, vectors):
+        """
+        Return the vector-Jacobian products v^T J.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return np.dot(vectors, self.M)
+
+
+class JacobianIdentity(JacobianConstant):
+    """
+    The identity Jacobian at all points.
+    """
+
+    def __init__(self):
+        """
+        Construct instance.
+        """
+        super(JacobianIdentity, self).__init__(np.eye(3))
+
+    def dot(self, other):
+        """
+        Return the matrix product self * other, i.e., other.
+
+        Parameters
+        ----------
+        other : Jacobian
+            The right hand factor.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The product.
+        """
+        return other
+
+    def inv(self):
+        """
+        Return the inverse Jacobians, i.e., self.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The inverse.
+        """
+        return self
+
+    def transpose(self):
+        """
+        Return the transposed Jacobians, i.e., self.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The transpose.
+        """
+        return self
+
+    def matvec(self, vectors):
+        """
+        Return the Jacobian-vector products J v, i.e., v.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return vectors
+
+    def rmatvec(self, vectors):
+        """
+        Return the vector-Jacobian products v^T J, i.e., v.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return vectors
+
+
+class JacobianDiagonal(Jacobian):
+    """
+    Diagonal Jacobian matrices.
+    """
+
+    def __init__(self, diagonal):
+        """
+        Construct instance from the diagonal elements.
+
+        Parameters
+        ----------
+        diagonal : ndarray
+            N x 3 array of the diagonal elements.
+        """
+        self.d = np.asarray(diagonal, dtype=float)
+
+    def matrix(self):
+        """
+        Return the Jacobians as an array broadcastable to N x 3 x 3.
+
+        Returns
+        -------
+        jacobian : ndarray
+            N x 3 x 3 array of Jacobians.
+        """
+        return self.d[:, :, np.newaxis] * np.eye(3)
+
+    def full(self, n):
+        """
+        Return the Jacobians as full matrices.
+
+        Parameters
+        ----------
+        n : int
+            The number of Jacobians (points).
+
+        Returns
+        -------
+        jacobian : ndarray
+            n x 3 x 3 array of Jacobians.
+        """
+        return self.matrix()
+
+    def dot(self, other):
+        """
+        Return the matrix product self * other.
+
+        Parameters
+        ----------
+        other : Jacobian
+            The right hand factor.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The product.
+        """
+        if isinstance(other, JacobianIdentity):
+            return self
+        if isinstance(other, JacobianConstant):
+            return JacobianFull(self.d[:, :, np.newaxis] * other.M)
+        if isinstance(other, JacobianDiagonal):
+            return JacobianDiagonal(self.d * other.d)
+        return JacobianFull(self.d[:, :, np.newaxis] * other.J)
+
+    def inv(self):
+        """
+        Return the inverse Jacobians.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The inverse.
+        """
+        return JacobianDiagonal(1. / self.d)
+
+    def transpose(self):
+        """
+        Return the transposed Jacobians, i.e., self.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The transpose.
+        """
+        return self
+
+    def matvec(self, vectors):
+        """
+        Return the Jacobian-vector products J v.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return self.d * vectors
+
+    def rmatvec(self, vectors):
+        """
+        Return the vector-Jacobian products v^T J.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return self.d * vectors
+
+
+class JacobianFull(Jacobian):
+    """
+    General Jacobian matrices.
+    """
+
+    def __init__(self, jacobian):
+        """
+        Construct instance from the Jacobians.
+
+        Parameters
+        ----------
+        jacobian : ndarray
+            N x 3 x 3 array of Jacobians.
+        """
+        self.J = jacobian
+
+    def matrix(self):
+        """
+        Return the Jacobians as an array broadcastable to N x 3 x 3.
+
+        Returns
+        -------
+        jacobian : ndarray
+            N x 3 x 3 array of Jacobians.
+        """
+        return self.J
+
+    def full(self, n):
+        """
+        Return the Jacobians as full matrices.
+
+        Parameters
+        ----------
+        n : int
+            The number of Jacobians (points).
+
+        Returns
+        -------
+        jacobian : ndarray
+            n x 3 x 3 array of Jacobians.
+        """
+        return self.J
+
+    def dot(self, other):
+        """
+        Return the matrix product self * other.
+
+        Parameters
+        ----------
+        other : Jacobian
+            The right hand factor.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The product.
+        """
+        if isinstance(other, JacobianIdentity):
+            return self
+        if isinstance(other, JacobianConstant):
+            return JacobianFull(np.matmul(self.J, other.M))
+        if isinstance(other, JacobianDiagonal):
+            return JacobianFull(self.J * other.d[:, np.newaxis, :])
+        return JacobianFull(np.matmul(self.J, other.J))
+
+    def inv(self):
+        """
+        Return the inverse Jacobians.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The inverse.
+        """
+        return JacobianFull(np.linalg.inv(self.J))
+
+    def transpose(self):
+        """
+        Return the transposed Jacobians.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The transpose.
+        """
+        return JacobianFull(np.swapaxes(self.J, -1, -2))
+
+    def matvec(self, vectors):
+        """
+        Return the Jacobian-vector products J v.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return np.einsum('nij,nj->ni', self.J, vectors)
+
+    def rmatvec(self, vectors):
+        """
+        Return the vector-Jacobian products v^T J.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            N x 3 array of vectors.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        return np.einsum('nji,nj->ni', self.J, vectors)
+
+
+# =============================================================================
+# Fast approximate mathematics
+#
+# Opt-in approximations of the transcendental functions on the throughput
+# critical paths (sRGB conversions, CIEDE00), for e.g. real-time
+# previews. The mode is selected globally with set_fast_math or the
+# fast_math context manager, or per call where a function takes a fast
+# argument. All approximations have documented maximum errors.
+# =============================================================================
+
+_fast_math = False
+
+
+def set_fast_math(enabled=True):
+    """
+    Enable or disable the fast approximate mode globally.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to use the fast approximations.
+    """
+    global _fast_math
+    _fast_math = bool(enabled)
+
+
+def use_fast_math(fast=None):
+    """
+    Return whether to use the fast approximations.
+
+    Parameters
+    ----------
+    fast : bool or None
+        Per call setting. None means the global setting.
+
+    Returns
+    -------
+    fast : bool
+        Whether to use the fast approximations.
+    """
+    if fast is None:
+        return _fast_math
+    return fast
+
+
+@contextlib.contextmanager
+def fast_math(enabled=True):
+    """
+    Context manager setting the fast approximate mode temporarily.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to use the fast approximations within the context.
+    """
+    global _fast_math
+    previous = _fast_math
+    _fast_math = bool(enabled)
+    try:
+        yield
+    finally:
+        _fast_math = previous
+
+
+class LUT(object):
+    """
+    Lookup table with linear interpolation on a uniform grid.
+
+    Values outside [lo, hi] are clipped to the interval, or wrapped if the
+    function is periodic with period hi - lo. Non-finite values give NaN.
+    The maximum error, estimated by sampling 16 points in each cell at
+    construction, is stored as max_error.
+    """
+
+    def __init__(self, func, lo, hi, n=4096, periodic=False):
+        """
+        Construct the table.
+
+        Parameters
+        ----------
+        func : function
+            The vectorised function to tabulate.
+        lo : float
+            Lower end of the interval.
+        hi : float
+            Upper end of the interval.
+        n : int
+            The number of cells. Must be a power of two if periodic.
+        periodic : bool
+            Whether func is periodic with period hi - lo.
+        """
+        self.lo = lo
+        self.n = n
+        self.scale = n / (hi - lo)
+        self.periodic = periodic
+        self.table = func(np.linspace(lo, hi, n + 1))
+        self.slope = np.diff(self.table)
+        x = lo + (hi - lo) * (np.arange(16 * n) + .5) / (16 * n)
+        self.max_error = np.max(np.abs(self(x) - func(x)))
+
+    def __call__(self, x):
+        """
+        Evaluate the interpolated function.
+
+        Parameters
+        ----------
+        x : ndarray
+            The arguments.
+
+        Returns
+        -------
+        y : ndarray
+            The approximate function values.
+        """
+        u = np.asarray(np.multiply(x, self.scale), dtype=float)  # Also scalars
+        if self.lo != 0:
+            u -= self.lo * self.scale
+        bad = ~np.isfinite(u)                   # NaN and infinite arguments
+        has_bad = np.any(bad)
+        if has_bad:
+            u = np.where(bad, 0, u)
+        if self.periodic:
+            i = np.floor(u)
+            u -= i
+            i = i.astype(np.intp)
+            i &= self.n - 1
+        else:
+            np.clip(u, 0, self.n, out=u)
+            i = u.astype(np.intp)
+            np.minimum(i, self.n - 1, out=i)
+            u -= i
+        y = np.take(self.slope, i)
+        y *= u
+        y += np.take(self.table, i)
+        if has_bad:
+            y = np.where(bad, np.nan, y)
+        return y
+
+
+# Maximum absolute error 2.9e-7
+_cos_deg_lut = LUT(lambda x: np.cos(np.deg2rad(x)), 0, 360, 4096,
+                   periodic=True)
+
+
+def cos_deg(x, fast=None):
+    """
+    Return the cosine of angles given in degrees.
+
+    The fast approximation has a maximum absolute error of 2.9e-7.
+
+    Parameters
+    ----------
+    x : ndarray
+        Angles in degrees.
+    fast : bool or None
+        Whether to use the fast approximation. None means the global
+        setting.
+
+    Returns
+    -------
+    cos : ndarray
+        The cosine of the angles.
+    """
+    if use_fast_math(fast):
+        return _cos_deg_lut(x)
+    return np.cos(np.deg2rad(x))
+
+
+def sin_deg(x, fast=None):
+    """
+    Return the sine of angles given in degrees.
+
+    The fast approximation has a maximum absolute error of 2.9e-7.
+
+    Parameters
+    ----------
+    x : ndarray
+        Angles in degrees.
+    fast : bool or None
+        Whether to use the fast approximation. None means the global
+        setting.
+
+    Returns
+    -------
+    sin : ndarray
+        The sine of the angles.
+    """
+    if use_fast_math(fast):
+        return _cos_deg_lut(np.asarray(x) - 90)
+    return np.sin(np.deg2rad(x))
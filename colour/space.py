@@ -81,10 +81,7 @@ class Space(object):
         jacobian : ndarray
             The list of Jacobians to XYZ.
         """
-        jac = self.inv_jacobian_XYZ(data)
-        for i in range(np.shape(jac)[0]):
-            jac[i] = np.linalg.inv(jac[i])
-        return jac
+        return np.linalg.inv(self.inv_jacobian_XYZ(data))
 
     def inv_jacobian_XYZ(self, data):
         """
@@ -103,20 +100,214 @@ class Space(object):
         jacobian : ndarray
             The list of Jacobians from XYZ.
         """
-        ijac = self.jacobian_XYZ(data)
-        for i in range(np.shape(ijac)[0]):
-            ijac[i] = np.linalg.inv(ijac[i])
-        return ijac
+        return np.linalg.inv(self.jacobian_XYZ(data))
+
+    def jacobian_XYZ_structured(self, data):
+        """
+        Return the Jacobian to XYZ as a structured misc.Jacobian.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians to XYZ.
+        """
+        return misc.JacobianFull(self.jacobian_XYZ(data))
+
+    def inv_jacobian_XYZ_structured(self, data):
+        """
+        Return the inverse Jacobian to XYZ as a structured misc.Jacobian.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians from XYZ.
+        """
+        return misc.JacobianFull(self.inv_jacobian_XYZ(data))
+
+    def base_chain(self):
+        """
+        Return the chain of base spaces, starting with the space itself.
+
+        Returns
+        -------
+        chain : list
+            List of the space and all its bases, ending with XYZ.
+        """
+        return [self]
+
+    def jacobian_ancestor_structured(self, data, ancestor):
+        """
+        Return the Jacobian to an ancestor space, dx^i/dancestor^j.
+
+        The ancestor must be in the chain of base spaces (see base_chain).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+        ancestor : Space
+            A space in the chain of base spaces.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians to the ancestor colour space.
+        """
+        if ancestor is self:
+            return misc.JacobianIdentity()
+        if ancestor is xyz:
+            return self.jacobian_XYZ_structured(data)
+        raise ValueError('Space is not an ancestor')
+
+    def inv_jacobian_ancestor_structured(self, data, ancestor):
+        """
+        Return the inverse Jacobian to an ancestor space, dancestor^i/dx^j.
+
+        The ancestor must be in the chain of base spaces (see base_chain).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+        ancestor : Space
+            A space in the chain of base spaces.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians from the ancestor colour space.
+        """
+        if ancestor is self:
+            return misc.JacobianIdentity()
+        if ancestor is xyz:
+            return self.inv_jacobian_XYZ_structured(data)
+        raise ValueError('Space is not an ancestor')
+
+    def jvp(self, data, vectors, ancestor=None):
+        """
+        Return Jacobian-vector products, dx^i/dancestor^j v^j.
+
+        Maps tangent vectors in the ancestor space to this space.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in the ancestor space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in this space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        return self.jacobian_ancestor_structured(data, ancestor).matvec(
+            vectors)
+
+    def vjp(self, data, vectors, ancestor=None):
+        """
+        Return vector-Jacobian products, v_i dx^i/dancestor^j.
+
+        Pulls covectors (e.g., gradients) in this space back to the
+        ancestor space.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in this space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in the ancestor space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        return self.jacobian_ancestor_structured(data, ancestor).rmatvec(
+            vectors)
+
+    def inv_jvp(self, data, vectors, ancestor=None):
+        """
+        Return inverse Jacobian-vector products, dancestor^i/dx^j v^j.
+
+        Maps tangent vectors in this space to the ancestor space.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in this space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in the ancestor space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        return self.inv_jacobian_ancestor_structured(data, ancestor).matvec(
+            vectors)
+
+    def inv_vjp(self, data, vectors, ancestor=None):
+        """
+        Return inverse vector-Jacobian products, v_i dancestor^i/dx^j.
+
+        Pulls covectors (e.g., gradients) in the ancestor space back to
+        this space.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in the ancestor space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in this space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        return self.inv_jacobian_ancestor_structured(data, ancestor).rmatvec(
+            vectors)
 
     def metrics_to_XYZ(self, points_data, metrics_ndata):
         """
         Convert metric data to the XYZ colour space.
 
+        The metric tensors can be given either as full matrices, in
+        packed symmetric storage (see misc.pack_sym), or as a structured
+        misc.SymTensor, and are returned in the same format.
+
         Parameters
         ----------
         points_data : Data
             The colour data points.
-        metrics_ndata : ndarray
+        metrics_ndata : ndarray or SymTensor
             Array of colour metric tensors in current colour space.
 
         Returns
@@ -124,22 +315,28 @@ class Space(object):
         xyz_metrics : ndarray
             Array of colour metric tensors in XYZ.
         """
-        jacobian = self.jacobian_XYZ(points_data)
-        new_metric = np.zeros(np.shape(metrics_ndata))
-        for i in range(np.shape(jacobian)[0]):
-            new_metric[i] = np.dot(jacobian[i].T,
-                                   np.dot(metrics_ndata[i], jacobian[i]))
-        return new_metric
+        jacobian = self.jacobian_XYZ_structured(points_data)
+        if isinstance(metrics_ndata, misc.SymTensor):
+            return metrics_ndata.congruence(jacobian)
+        jacobian = jacobian.matrix()
+        if misc.is_packed(metrics_ndata):
+            return misc.congruence_sym(jacobian, metrics_ndata)
+        return misc.unpack_sym(
+            misc.congruence_sym(jacobian, misc.pack_sym(metrics_ndata)))
 
     def metrics_from_XYZ(self, points_data, metrics_ndata):
         """
         Convert metric data from the XYZ colour space.
 
+        The metric tensors can be given either as full matrices, in
+        packed symmetric storage (see misc.pack_sym), or as a structured
+        misc.SymTensor, and are returned in the same format.
+
         Parameters
         ----------
         points_data : Data
             The colour data points.
-        metrics_ndata : ndarray
+        metrics_ndata : ndarray or SymTensor
             Array of colour metric tensors in XYZ.
 
         Returns
@@ -147,12 +344,14 @@ class Space(object):
         xyz_metrics : ndarray
             Array of colour metric tensors in the current colour space.
         """
-        jacobian = self.inv_jacobian_XYZ(points_data)
-        new_metric = np.zeros(np.shape(metrics_ndata))
-        for i in range(np.shape(jacobian)[0]):
-            new_metric[i] = np.dot(jacobian[i].T,
-                                   np.dot(metrics_ndata[i], jacobian[i]))
-        return new_metric
+        jacobian = self.inv_jacobian_XYZ_structured(points_data)
+        if isinstance(metrics_ndata, misc.SymTensor):
+            return metrics_ndata.congruence(jacobian)
+        jacobian = jacobian.matrix()
+        if misc.is_packed(metrics_ndata):
+            return misc.congruence_sym(jacobian, metrics_ndata)
+        return misc.unpack_sym(
+            misc.congruence_sym(jacobian, misc.pack_sym(metrics_ndata)))
 
 
 class XYZ(Space):
@@ -238,6 +437,38 @@ class XYZ(Space):
         ijac[:] = np.eye(3)
         return ijac
 
+    def jacobian_XYZ_structured(self, data):
+        """
+        Return the Jacobian to XYZ as a structured misc.Jacobian.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The identity.
+        """
+        return misc.JacobianIdentity()
+
+    def inv_jacobian_XYZ_structured(self, data):
+        """
+        Return the inverse Jacobian to XYZ as a structured misc.Jacobian.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The identity.
+        """
+        return misc.JacobianIdentity()
+
 
 class Transform(Space):
     """
@@ -307,10 +538,7 @@ class Transform(Space):
         jacobian : ndarray
             The list of Jacobians to the base colour space.
         """
-        jac = self.inv_jacobian_base(data)
-        for i in range(np.shape(jac)[0]):
-            jac[i] = np.linalg.inv(jac[i])
-        return jac
+        return np.linalg.inv(self.inv_jacobian_base(data))
 
     def inv_jacobian_base(self, data):
         """
@@ -329,10 +557,42 @@ class Transform(Space):
         jacobian : ndarray
             The list of Jacobians from the base colour space.
        """
-        ijac = self.jacobian_base(data)
-        for i in range(np.shape(ijac)[0]):
-            ijac[i] = np.linalg.inv(ijac[i])
-        return ijac
+        return np.linalg.inv(self.jacobian_base(data))
+
+    def jacobian_base_structured(self, data):
+        """
+        Return the Jacobian to base as a structured misc.Jacobian.
+
+        Transforms with constant or diagonal Jacobians should override
+        this to return misc.JacobianConstant or misc.JacobianDiagonal.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians to the base colour space.
+        """
+        return misc.JacobianFull(self.jacobian_base(data))
+
+    def inv_jacobian_base_structured(self, data):
+        """
+        Return the inverse Jacobian to base as a structured misc.Jacobian.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians from the base colour space.
+        """
+        return misc.JacobianFull(self.inv_jacobian_base(data))
 
     def jacobian_XYZ(self, data):
         """
@@ -353,12 +613,8 @@ class Transform(Space):
             The list of Jacobians to XYZ.
 
         """
-        dxdbase = self.jacobian_base(data)
-        dbasedXYZ = self.base.jacobian_XYZ(data)
-        jac = self.empty_matrix(data.linear_XYZ)
-        for i in range(np.shape(jac)[0]):
-            jac[i] = np.dot(dxdbase[i], dbasedXYZ[i])
-        return jac
+        jac = self.jacobian_XYZ_structured(data)
+        return jac.full(np.shape(data.linear_XYZ)[0])
 
     def inv_jacobian_XYZ(self, data):
         """
@@ -378,12 +634,297 @@ class Transform(Space):
         jacobian : ndarray
             The list of Jacobians from XYZ.
         """
-        dXYZdbase = self.base.inv_jacobian_XYZ(data)
-        dbasedx = self.inv_jacobian_base(data)
-        ijac = self.empty_matrix(data.linear_XYZ)
-        for i in range(np.shape(ijac)[0]):
-            ijac[i] = np.dot(dXYZdbase[i], dbasedx[i])
-        return ijac
+        ijac = self.inv_jacobian_XYZ_structured(data)
+        return ijac.full(np.shape(data.linear_XYZ)[0])
+
+    def jacobian_XYZ_structured(self, data):
+        """
+        Return the Jacobian to XYZ as a structured misc.Jacobian.
+
+        The structured Jacobians along the chain of base spaces are
+        multiplied, exploiting constant and diagonal structure.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians to XYZ.
+        """
+        return self.jacobian_base_structured(data).dot(
+            self.base.jacobian_XYZ_structured(data))
+
+    def inv_jacobian_XYZ_structured(self, data):
+        """
+        Return the inverse Jacobian to XYZ as a structured misc.Jacobian.
+
+        The structured inverse Jacobians along the chain of base spaces
+        are multiplied, exploiting constant and diagonal structure.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians from XYZ.
+        """
+        return self.base.inv_jacobian_XYZ_structured(data).dot(
+            self.inv_jacobian_base_structured(data))
+
+    def base_chain(self):
+        """
+        Return the chain of base spaces, starting with the space itself.
+
+        Returns
+        -------
+        chain : list
+            List of the space and all its bases, ending with XYZ.
+        """
+        return [self] + self.base.base_chain()
+
+    def jacobian_ancestor_structured(self, data, ancestor):
+        """
+        Return the Jacobian to an ancestor space, dx^i/dancestor^j.
+
+        The structured Jacobians along the chain of base spaces are
+        multiplied down to the ancestor only.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+        ancestor : Space
+            A space in the chain of base spaces.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians to the ancestor colour space.
+        """
+        if ancestor is self:
+            return misc.JacobianIdentity()
+        return self.jacobian_base_structured(data).dot(
+            self.base.jacobian_ancestor_structured(data, ancestor))
+
+    def inv_jacobian_ancestor_structured(self, data, ancestor):
+        """
+        Return the inverse Jacobian to an ancestor space, dancestor^i/dx^j.
+
+        The structured inverse Jacobians along the chain of base spaces
+        are multiplied down to the ancestor only.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+        ancestor : Space
+            A space in the chain of base spaces.
+
+        Returns
+        -------
+        jacobian : Jacobian
+            The Jacobians from the ancestor colour space.
+        """
+        if ancestor is self:
+            return misc.JacobianIdentity()
+        return self.base.inv_jacobian_ancestor_structured(
+            data, ancestor).dot(self.inv_jacobian_base_structured(data))
+
+    def jvp_base(self, data, vectors):
+        """
+        Return Jacobian-vector products to base, dx^i/dbase^j v^j.
+
+        Transforms with closed form products should override this.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in the base space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in this space.
+        """
+        return self.jacobian_base_structured(data).matvec(vectors)
+
+    def vjp_base(self, data, vectors):
+        """
+        Return vector-Jacobian products to base, v_i dx^i/dbase^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in this space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in the base space.
+        """
+        return self.jacobian_base_structured(data).rmatvec(vectors)
+
+    def inv_jvp_base(self, data, vectors):
+        """
+        Return inverse Jacobian-vector products, dbase^i/dx^j v^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in this space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in the base space.
+        """
+        return self.inv_jacobian_base_structured(data).matvec(vectors)
+
+    def inv_vjp_base(self, data, vectors):
+        """
+        Return inverse vector-Jacobian products, v_i dbase^i/dx^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in the base space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in this space.
+        """
+        return self.inv_jacobian_base_structured(data).rmatvec(vectors)
+
+    def jvp(self, data, vectors, ancestor=None):
+        """
+        Return Jacobian-vector products, dx^i/dancestor^j v^j.
+
+        Maps tangent vectors in the ancestor space to this space.
+        The products are applied link by link along the chain of base
+        spaces, without forming the Jacobian matrices.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in the ancestor space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in this space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        if ancestor is self:
+            return vectors
+        return self.jvp_base(data, self.base.jvp(data, vectors, ancestor))
+
+    def vjp(self, data, vectors, ancestor=None):
+        """
+        Return vector-Jacobian products, v_i dx^i/dancestor^j.
+
+        Pulls covectors (e.g., gradients) in this space back to the
+        ancestor space.
+        The products are applied link by link along the chain of base
+        spaces, without forming the Jacobian matrices.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in this space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in the ancestor space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        if ancestor is self:
+            return vectors
+        return self.base.vjp(data, self.vjp_base(data, vectors), ancestor)
+
+    def inv_jvp(self, data, vectors, ancestor=None):
+        """
+        Return inverse Jacobian-vector products, dancestor^i/dx^j v^j.
+
+        Maps tangent vectors in this space to the ancestor space.
+        The products are applied link by link along the chain of base
+        spaces, without forming the Jacobian matrices.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in this space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in the ancestor space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        if ancestor is self:
+            return vectors
+        return self.base.inv_jvp(data, self.inv_jvp_base(data, vectors),
+                                 ancestor)
+
+    def inv_vjp(self, data, vectors, ancestor=None):
+        """
+        Return inverse vector-Jacobian products, v_i dancestor^i/dx^j.
+
+        Pulls covectors (e.g., gradients) in the ancestor space back to
+        this space.
+        The products are applied link by link along the chain of base
+        spaces, without forming the Jacobian matrices.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in the ancestor space.
+        ancestor : Space
+            A space in the chain of base spaces. Default is XYZ.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in this space.
+        """
+        if ancestor is None:
+            ancestor = xyz
+        if ancestor is self:
+            return vectors
+        return self.inv_vjp_base(data, self.base.inv_vjp(data, vectors,
+                                                         ancestor))
 
 
 class TransformxyY(Transform):
@@ -895,17 +1436,12 @@ class TransformCIEDE00(Transform):
         jac = self.empty_matrix(lab)
         jac[:, 0, 0] = 1        # dLp/dL
         jac[:, 2, 2] = 1        # dbp/db
-        # jac[:, 1, 1] = 1 + G - misc.safe_div(a**2, C) * \
-        #     (7 * 25**7 * C**(5/2.) /
-        #      (4 * (C**7 + 25**7)**(3/2.)))  # dap/da
         jac[:, 1, 1] = 1 + G - misc.safe_div(a**2, C) * \
             (7 * 25**7 * C**(5/2.) /
-             (8 * (C**7 + 25**7)**(3/2.)))  # dap/da
+             (4 * (C**7 + 25**7)**(3/2.)))  # dap/da
         jac[C == 0, 1, 1] = 1
-        # jac[:, 1, 2] = - a * misc.safe_div(b, C) * \
-        #     (7 * 25**7 * C**(5/2.) / (4 * (C**7 + 25**7)**(3/2.)))
         jac[:, 1, 2] = - a * misc.safe_div(b, C) * \
-            (7 * 25**7 * C**(5/2.) / (8 * (C**7 + 25**7)**(3/2.)))
+            (7 * 25**7 * C**(5/2.) / (4 * (C**7 + 25**7)**(3/2.)))
         jac[C == 0, 1, 2] = 0
         return jac
 
@@ -925,6 +1461,30 @@ class TransformSRGB(Transform):
             The base colour space.
         """
         super(TransformSRGB, self).__init__(base)
+        self._luts = dict()
+
+    def _lut(self, name):
+        """
+        Return the lookup table approximating to_base or from_base.
+
+        Used with fast approximate mathematics (see misc.fast_math). The
+        tables have 2**14 cells on [0, 1], giving maximum errors of 2e-8
+        (to_base) and 4e-6 (from_base).
+
+        Parameters
+        ----------
+        name : str
+            'to_base' or 'from_base'.
+
+        Returns
+        -------
+        lut : misc.LUT
+            The lookup table.
+        """
+        if name not in self._luts:
+            with misc.fast_math(False):
+                self._luts[name] = misc.LUT(getattr(self, name), 0, 1, 2**14)
+        return self._luts[name]
 
     def to_base(self, ndata):
         """
@@ -940,6 +1500,8 @@ class TransformSRGB(Transform):
         col : ndarray
             Colour data in the linear RGB colour space
         """
+        if misc.use_fast_math():
+            return self._lut('to_base')(ndata)
         nd = ndata.copy()
         nd[nd < 0] = 0
         nd[nd > 1] = 1
@@ -964,18 +1526,42 @@ class TransformSRGB(Transform):
         jacobian : ndarray
             The list of Jacobians to the base colour space.
         """
+        return self.jacobian_base_structured(data).matrix()
+
+    def jacobian_base_structured(self, data):
+        """
+        Return the diagonal Jacobian to linear RGB (base).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianDiagonal
+            The Jacobians to the base colour space.
+        """
         rgb = data.get_linear(self.base)
-        r = rgb[:, 0]
-        g = rgb[:, 1]
-        b = rgb[:, 2]
-        jac = self.empty_matrix(rgb)
-        jac[:, 0, 0] = 1.055 / 2.4 * r**(1 / 2.4 - 1)
-        jac[r < 0.0031308, 0, 0] = 12.92
-        jac[:, 1, 1] = 1.055 / 2.4 * g**(1 / 2.4 - 1)
-        jac[g < 0.0031308, 1, 1] = 12.92
-        jac[:, 2, 2] = 1.055 / 2.4 * b**(1 / 2.4 - 1)
-        jac[b < 0.0031308, 2, 2] = 12.92
-        return jac
+        diag = 1.055 / 2.4 * rgb**(1 / 2.4 - 1)
+        diag[rgb < 0.0031308] = 12.92
+        return misc.JacobianDiagonal(diag)
+
+    def inv_jacobian_base_structured(self, data):
+        """
+        Return the diagonal inverse Jacobian to linear RGB (base).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianDiagonal
+            The Jacobians from the base colour space.
+        """
+        return self.jacobian_base_structured(data).inv()
 
     def from_base(self, ndata):
         """
@@ -991,6 +1577,8 @@ class TransformSRGB(Transform):
         col : ndarray
             Colour data in the sRGB colour space
         """
+        if misc.use_fast_math():
+            return self._lut('from_base')(ndata)
         nd = ndata.copy()
         nd[nd < 0] = 0
         nd[nd > 1] = 1
@@ -1031,10 +1619,7 @@ class TransformLinear(Transform):
         col : ndarray
             Colour data in the base colour space
         """
-        xyz = np.zeros(np.shape(ndata))
-        for i in range(np.shape(ndata)[0]):
-            xyz[i] = np.dot(self.M_inv, ndata[i])
-        return xyz
+        return np.dot(ndata, self.M_inv.T)
 
     def from_base(self, ndata):
         """
@@ -1050,11 +1635,7 @@ class TransformLinear(Transform):
         col : ndarray
             Colour data in the current colour space.
         """
-        xyz = ndata
-        lins = np.zeros(np.shape(xyz))
-        for i in range(np.shape(xyz)[0]):
-            lins[i] = np.dot(self.M, xyz[i])
-        return lins
+        return np.dot(ndata, self.M.T)
 
     def jacobian_base(self, data):
         """
@@ -1100,6 +1681,38 @@ class TransformLinear(Transform):
         jac[:] = self.M_inv
         return jac
 
+    def jacobian_base_structured(self, data):
+        """
+        Return the constant Jacobian to the base, M.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianConstant
+            The Jacobian to the base colour space.
+        """
+        return misc.JacobianConstant(self.M)
+
+    def inv_jacobian_base_structured(self, data):
+        """
+        Return the constant inverse Jacobian to the base, M^-1.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianConstant
+            The Jacobian from the base colour space.
+        """
+        return misc.JacobianConstant(self.M_inv)
+
 
 class TransformGamma(Transform):
     """
@@ -1173,16 +1786,41 @@ class TransformGamma(Transform):
         jacobian : ndarray
             The list of Jacobians to the base colour space.
         """
+        return self.jacobian_base_structured(data).matrix()
+
+    def jacobian_base_structured(self, data):
+        """
+        Return the diagonal Jacobian to XYZ (base).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianDiagonal
+            The Jacobians to the base colour space.
+        """
         basedata = data.get_linear(self.base)
-        jac = self.empty_matrix(basedata)
-        for i in range(np.shape(basedata)[0]):
-            jac[i, 0, 0] = self.gamma * \
-                np.abs(basedata[i, 0])**(self.gamma - 1)
-            jac[i, 1, 1] = self.gamma * \
-                np.abs(basedata[i, 1])**(self.gamma - 1)
-            jac[i, 2, 2] = self.gamma * \
-                np.abs(basedata[i, 2])**(self.gamma - 1)
-        return jac
+        return misc.JacobianDiagonal(
+            self.gamma * np.abs(basedata)**(self.gamma - 1))
+
+    def inv_jacobian_base_structured(self, data):
+        """
+        Return the diagonal inverse Jacobian to XYZ (base).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianDiagonal
+            The Jacobians from the base colour space.
+        """
+        return self.jacobian_base_structured(data).inv()
 
 
 class TransformPolar(Transform):
@@ -1247,6 +1885,163 @@ class TransformPolar(Transform):
         LCh[:, 2] = np.arctan2(y, x)
         return LCh
 
+    def _block(self, data, inverse=False):
+        """
+        Return the polar block of the Jacobian to base.
+
+        The Jacobian is the identity in the first variable, and this 2 x 2
+        block in the last two. At C = 0, the same regularisation as in
+        inv_jacobian_base is used.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+        inverse : bool
+            Whether to return the block of the inverse Jacobian.
+
+        Returns
+        -------
+        block : tuple
+            The elements (j11, j12, j21, j22) of the block as N arrays.
+        """
+        LCh = data.get_linear(self)
+        C = LCh[:, 1]
+        cos_h = np.cos(LCh[:, 2])
+        sin_h = np.sin(LCh[:, 2])
+        zero = C == 0
+        if inverse:
+            return (np.where(zero, 1, cos_h), -C * sin_h,
+                    sin_h, np.where(zero, 1, C * cos_h))
+        C_inv = 1 / np.where(zero, 1, C)
+        return (np.where(zero, 1, cos_h), np.where(zero, 0, sin_h),
+                -sin_h * C_inv, np.where(zero, 1, cos_h * C_inv))
+
+    @staticmethod
+    def _apply_block(block, vectors, transpose=False):
+        """
+        Multiply vectors by the polar block of a Jacobian.
+
+        Parameters
+        ----------
+        block : tuple
+            The elements (j11, j12, j21, j22) of the block, see _block.
+        vectors : ndarray
+            N x 3 array of vectors.
+        transpose : bool
+            Whether to multiply from the left (vector-Jacobian product).
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of products.
+        """
+        j11, j12, j21, j22 = block
+        if transpose:
+            j12, j21 = j21, j12
+        products = np.array(vectors, dtype=float)
+        products[:, 1] = j11 * vectors[:, 1] + j12 * vectors[:, 2]
+        products[:, 2] = j21 * vectors[:, 1] + j22 * vectors[:, 2]
+        return products
+
+    def jacobian_base(self, data):
+        """
+        Return the Jacobian to CIELAB (base), dCIELCH^i/dCIELAB^j.
+
+        The Jacobian is calculated at the given data points (of the
+        Data class). Closed form of the inverse of inv_jacobian_base.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : ndarray
+            The list of Jacobians to the base colour space.
+        """
+        j11, j12, j21, j22 = self._block(data)
+        jac = self.empty_matrix(data.get_linear(self))
+        jac[:, 0, 0] = 1                     # dL/dL
+        jac[:, 1, 1] = j11                   # dC/da
+        jac[:, 1, 2] = j12                   # dC/db
+        jac[:, 2, 1] = j21                   # dh/da
+        jac[:, 2, 2] = j22                   # dh/db
+        return jac
+
+    def jvp_base(self, data, vectors):
+        """
+        Return Jacobian-vector products to base, dx^i/dbase^j v^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in the base space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in this space.
+        """
+        return self._apply_block(self._block(data), vectors)
+
+    def vjp_base(self, data, vectors):
+        """
+        Return vector-Jacobian products to base, v_i dx^i/dbase^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in this space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in the base space.
+        """
+        return self._apply_block(self._block(data), vectors, True)
+
+    def inv_jvp_base(self, data, vectors):
+        """
+        Return inverse Jacobian-vector products, dbase^i/dx^j v^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of tangent vectors in this space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of tangent vectors in the base space.
+        """
+        return self._apply_block(self._block(data, True), vectors)
+
+    def inv_vjp_base(self, data, vectors):
+        """
+        Return inverse vector-Jacobian products, v_i dbase^i/dx^j.
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the products to be computed.
+        vectors : ndarray
+            N x 3 array of covectors in the base space.
+
+        Returns
+        -------
+        products : ndarray
+            N x 3 array of covectors in this space.
+        """
+        return self._apply_block(self._block(data, True), vectors, True)
+
     def inv_jacobian_base(self, data):
         """
         Return the Jacobian from CIELAB (base), dCIELAB^i/dCIELCH^j.
@@ -1268,15 +2063,13 @@ class TransformPolar(Transform):
         C = LCh[:, 1]
         h = LCh[:, 2]
         jac = self.empty_matrix(LCh)
-        for i in range(np.shape(jac)[0]):
-            jac[i, 0, 0] = 1                     # dL/dL
-            jac[i, 1, 1] = np.cos(h[i])          # da/dC
-            jac[i, 1, 2] = -C[i] * np.sin(h[i])  # da/dh
-            jac[i, 2, 1] = np.sin(h[i])          # db/dC
-            jac[i, 2, 2] = C[i] * np.cos(h[i])   # db/dh
-            if C[i] == 0:
-                jac[i, 2, 2] = 1
-                jac[i, 1, 1] = 1
+        jac[:, 0, 0] = 1                     # dL/dL
+        jac[:, 1, 1] = np.cos(h)             # da/dC
+        jac[:, 1, 2] = -C * np.sin(h)        # da/dh
+        jac[:, 2, 1] = np.sin(h)             # db/dC
+        jac[:, 2, 2] = C * np.cos(h)         # db/dh
+        jac[C == 0, 2, 2] = 1
+        jac[C == 0, 1, 1] = 1
         return jac
 
 
@@ -1748,14 +2541,42 @@ class TransformLogCompressL(Transform):
         jacobian : ndarray
             The list of Jacobians to the base colour space.
         """
-        lab = data.get(self.base)
-        L = lab[:, 0]
-        dLp_dL = self.aL * self.bL / (1 + self.bL * L)
-        jac = self.empty_matrix(lab)
-        jac[:, 0, 0] = dLp_dL
-        jac[:, 1, 1] = 1
-        jac[:, 2, 2] = 1
-        return jac
+        return self.jacobian_base_structured(data).matrix()
+
+    def jacobian_base_structured(self, data):
+        """
+        Return the diagonal Jacobian from Lab (base).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianDiagonal
+            The Jacobians to the base colour space.
+        """
+        lab = data.get_linear(self.base)
+        diag = np.ones(np.shape(lab))
+        diag[:, 0] = self.aL * self.bL / (1 + self.bL * lab[:, 0])
+        return misc.JacobianDiagonal(diag)
+
+    def inv_jacobian_base_structured(self, data):
+        """
+        Return the diagonal inverse Jacobian from Lab (base).
+
+        Parameters
+        ----------
+        data : Data
+            Colour data points for the jacobians to be computed.
+
+        Returns
+        -------
+        jacobian : JacobianDiagonal
+            The Jacobians from the base colour space.
+        """
+        return self.jacobian_base_structured(data).inv()
 
 
 class TransformLogCompressC(Transform):
@@ -2121,6 +2942,29 @@ _test_space_poincare_disk = TransformPoincareDisk(cielab)
 _test_space_gamma = TransformGamma(xyz, .43)
 
 
+def space_name(sp):
+    """
+    Return the name of a predefined colour space of this module.
+
+    The name can be used to store the space in files, and the space is
+    recovered with getattr(space, name).
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space.
+
+    Returns
+    -------
+    name : str
+        The name of the space in this module.
+    """
+    for name, value in globals().items():
+        if value is sp:
+            return name
+    raise ValueError('The colour space must be a predefined space')
+
+
 # =============================================================================
 # Test module
 # =============================================================================
@@ -270,6 +270,176 @@ def minimal_dataset_distance(dataset, ground_truth):
         opt_data, params[0], params[1], params[2]
 
 
+# =============================================================================
+# Streaming statistics
+# =============================================================================
+
+
+class StreamingStatistics(object):
+    """
+    Summary statistics of colour differences accumulated in chunks.
+
+    Keeps the count, mean and variance (using the parallel form of
+    Welford's algorithm, Chan et al.), minimum and maximum, a histogram
+    with fixed bins, and a merging t-digest for approximate quantiles,
+    without keeping the differences themselves. Non-finite differences
+    are counted separately and otherwise ignored.
+    """
+
+    def __init__(self, bins=np.linspace(0, 20, 201), compression=500):
+        """
+        Construct empty statistics.
+
+        Parameters
+        ----------
+        bins : ndarray
+            The bin edges of the histogram. Differences outside the edges
+            are not counted in the histogram.
+        compression : float
+            The compression parameter (delta) of the t-digest. The number
+            of centroids is of the order of compression.
+        """
+        self.n = 0
+        self.n_nonfinite = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.min = np.inf
+        self.max = -np.inf
+        self.bins = np.array(bins, dtype=float)
+        self.histogram = np.zeros(len(self.bins) - 1, dtype=int)
+        self.compression = compression
+        self.centroids = np.zeros(0)
+        self.weights = np.zeros(0)
+
+    def update(self, diff):
+        """
+        Add a chunk of colour differences to the statistics.
+
+        Parameters
+        ----------
+        diff : ndarray
+            The colour differences, of any shape.
+        """
+        diff = np.ravel(diff)
+        finite = np.isfinite(diff)
+        self.n_nonfinite += np.size(diff) - np.count_nonzero(finite)
+        diff = diff[finite]
+        n = np.size(diff)
+        if n == 0:
+            return
+        mean = np.mean(diff)
+        self._merge_moments(n, mean, np.sum((diff - mean)**2))
+        self.min = min(self.min, np.min(diff))
+        self.max = max(self.max, np.max(diff))
+        self.histogram += np.histogram(diff, self.bins)[0]
+        self._merge_digest(diff, np.ones(n))
+
+    def merge(self, other):
+        """
+        Add the statistics accumulated in another instance.
+
+        The two instances must have the same histogram bins.
+
+        Parameters
+        ----------
+        other : StreamingStatistics
+            The other statistics.
+        """
+        self.n_nonfinite += other.n_nonfinite
+        if other.n == 0:
+            return
+        self._merge_moments(other.n, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.histogram += other.histogram
+        self._merge_digest(other.centroids, other.weights)
+
+    def _merge_moments(self, n, mean, m2):
+        """
+        Merge count, mean and sum of squared deviations of a chunk.
+
+        Parameters
+        ----------
+        n : int
+            The number of differences in the chunk.
+        mean : float
+            The mean of the chunk.
+        m2 : float
+            The sum of squared deviations from the mean of the chunk.
+        """
+        n_tot = self.n + n
+        delta = mean - self.mean
+        self.mean += delta * n / n_tot
+        self.m2 += m2 + delta**2 * self.n * n / n_tot
+        self.n = n_tot
+
+    def _merge_digest(self, values, weights):
+        """
+        Merge weighted values into the t-digest and compress it.
+
+        The sorted centroids are grouped such that each group spans less
+        than one unit of the scale function k(q) = delta / (2 pi) *
+        arcsin(2q - 1), giving small centroids near the tails.
+
+        Parameters
+        ----------
+        values : ndarray
+            The values (or centroid means).
+        weights : ndarray
+            The weights (or centroid counts).
+        """
+        values = np.concatenate((self.centroids, values))
+        weights = np.concatenate((self.weights, weights))
+        order = np.argsort(values, kind='mergesort')
+        values = values[order]
+        weights = weights[order]
+        cum = np.cumsum(weights)
+        q = (cum - .5 * weights) / cum[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        group = np.floor(k - k[0]).astype(int)
+        group = np.unique(group, return_inverse=True)[1]
+        self.weights = np.bincount(group, weights)
+        self.centroids = np.bincount(group, weights * values) / self.weights
+
+    @property
+    def variance(self):
+        """
+        The (population) variance of the differences.
+        """
+        return self.m2 / self.n if self.n else np.nan
+
+    @property
+    def std(self):
+        """
+        The standard deviation of the differences.
+        """
+        return np.sqrt(self.variance)
+
+    def quantile(self, q):
+        """
+        Return approximate quantiles of the differences.
+
+        Interpolates linearly between the t-digest centroids, and between
+        the extreme centroids and the minimum and maximum.
+
+        Parameters
+        ----------
+        q : float or ndarray
+            The quantile(s), between 0 and 1.
+
+        Returns
+        -------
+        quantile : float or ndarray
+            The approximate quantile(s).
+        """
+        if self.n == 0:
+            return np.full(np.shape(q), np.nan)[()]
+        cum = np.cumsum(self.weights)
+        pos = np.concatenate(([0], cum - .5 * self.weights, [cum[-1]]))
+        val = np.concatenate(([self.min], self.centroids, [self.max]))
+        return np.interp(np.asarray(q) * cum[-1], pos, val)[()]
+
+
 # =============================================================================
 # Test module
 # =============================================================================
@@ -20,7 +20,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import numpy as np
-from . import data, space
+from . import data, space, misc
 
 
 # =============================================================================
@@ -46,10 +46,7 @@ def euclidean(sp, dat):
     Euclidean : TensorData
         The metric tensors.
     """
-    g = sp.empty_matrix(dat.linear_XYZ)
-    for i in range(np.shape(g)[0]):
-        g[i] = np.eye(3)
-    return data.TensorData(sp, dat, g)
+    return data.TensorData(sp, dat, misc.SymIdentity())
 
 
 def dE_ab(dat):
@@ -171,11 +168,13 @@ def dE_DIN99d(dat):
     return euclidean(space.din99d, dat)
 
 
-def dE_00(dat, k_L=1, k_C=1, k_h=1):
+def dE_00(dat, k_L=1, k_C=1, k_h=1, fast=None):
     """
     Compute the Riemannised CIEDE00 metric for the given data points.
 
     Returns TensorData. Be aware that the tensor is singluar at C = 0.
+    With fast approximate mathematics (see misc.fast_math), the
+    trigonometric functions are replaced by lookup tables.
 
     Parameters
     ----------
@@ -187,12 +186,16 @@ def dE_00(dat, k_L=1, k_C=1, k_h=1):
         Parameter of the CIEDE00 metric
     k_h : float
         Parameter of the CIEDE00 metric
+    fast : bool or None
+        Whether to use fast approximate mathematics. None means the global
+        setting.
 
     Returns
     -------
     DE00 : TensorData
         The metric tensors.
     """
+    fast = misc.use_fast_math(fast)
     lch = dat.get_linear(space.ciede00lch)
     L = lch[:, 0]
     C = lch[:, 1]
@@ -201,20 +204,19 @@ def dE_00(dat, k_L=1, k_C=1, k_h=1):
     h_deg[h_deg < 0] = h_deg[h_deg < 0] + 360
     S_L = 1 + (0.015 * (L - 50)**2) / np.sqrt(20 + (L - 50)**2)
     S_C = 1 + 0.045 * C
-    T = 1 - 0.17 * np.cos(np.deg2rad(h_deg - 30)) + \
-        .24 * np.cos(2*h) + \
-        .32 * np.cos(np.deg2rad(3 * h_deg + 6)) - \
-        .2 * np.cos(np.deg2rad(4 * h_deg - 63))
+    T = 1 - 0.17 * misc.cos_deg(h_deg - 30, fast) + \
+        .24 * (misc.cos_deg(2 * h_deg, fast) if fast else np.cos(2*h)) + \
+        .32 * misc.cos_deg(3 * h_deg + 6, fast) - \
+        .2 * misc.cos_deg(4 * h_deg - 63, fast)
     S_h = 1 + 0.015 * C * T
     R_C = 2 * np.sqrt(C**7 / (C**7 + 25**7))
     d_theta = 30 * np.exp(-((h_deg - 275) / 25)**2)
-    R_T = - R_C * np.sin(np.deg2rad(2 * d_theta))
-    g = space.ciede00lch.empty_matrix(lch)
-    g[:, 0, 0] = (k_L * S_L)**(-2)
-    g[:, 1, 1] = (k_C * S_C)**(-2)
-    g[:, 2, 2] = C**2 * (k_h * S_h)**(-2)
-    g[:, 1, 2] = .5 * C * R_T / (k_C * S_C * k_h * S_h)
-    g[:, 2, 1] = .5 * C * R_T / (k_C * S_C * k_h * S_h)
+    R_T = - R_C * misc.sin_deg(2 * d_theta, fast)
+    g = np.zeros((np.shape(lch)[0], 6))     # packed symmetric storage
+    g[:, 0] = (k_L * S_L)**(-2)
+    g[:, 1] = (k_C * S_C)**(-2)
+    g[:, 2] = C**2 * (k_h * S_h)**(-2)
+    g[:, 3] = .5 * C * R_T / (k_C * S_C * k_h * S_h)
     return data.TensorData(space.ciede00lch, dat, g)
 
 
@@ -236,12 +238,11 @@ def poincare_disk(sp, dat):
         The metric tensors.
     """
     d = dat.get_linear(sp)
-    g = sp.empty_matrix(d)
-    for i in range(np.shape(g)[0]):
-        g[i, 0, 0] = 1
-        g[i, 1, 1] = sp.R**2 * 4. / (1 - d[i, 1]**2 - d[i, 2]**2)**2
-        g[i, 2, 2] = sp.R**2 * 4. / (1 - d[i, 1]**2 - d[i, 2]**2)**2
-    return data.TensorData(sp, dat, g)
+    g = np.zeros(np.shape(d))               # diagonal tensors
+    g[:, 0] = 1
+    g[:, 1] = sp.R**2 * 4. / (1 - d[:, 1]**2 - d[:, 2]**2)**2
+    g[:, 2] = sp.R**2 * 4. / (1 - d[:, 1]**2 - d[:, 2]**2)**2
+    return data.TensorData(sp, dat, misc.SymDiagonal(g))
 
 # TODO:
 #
@@ -255,6 +256,258 @@ def poincare_disk(sp, dat):
 #     +++
 
 
+# =============================================================================
+# Riemannisation of colour difference formulae
+# =============================================================================
+
+
+def riemannise(sp, dat, metric_function, step=1e-4, **kwargs):
+    """
+    Derive the metric tensors of a colour difference formula.
+
+    The tensor g at a point x is the Hessian of f(x, x + dx)**2 / 2 at
+    dx = 0, where f is the colour difference formula. It is estimated by
+    central differences in the given colour space: the quadratic form
+    dx^T g dx along the nine directions e_i and e_i +/- e_j is evaluated
+    from the symmetric pair of displacements +/- h dx, and the off-diagonal
+    components follow by polarisation. All 18 displaced copies of the data
+    are compared with the original data in a single call to the metric
+    function, which must thus broadcast like the functions in the metric
+    module. Conversions of dat are cached in the Data object as usual.
+
+    Parameters
+    ----------
+    sp : Space
+        The colour space in which to take the finite differences.
+    dat : Data
+        The colour points for which to compute the metric.
+    metric_function : function
+        The colour difference formula, e.g., metric.dE_00.
+    step : float
+        The relative step length. The step at a point is
+        step * (1 + max(abs(x))) in the given space.
+    **kwargs : dict
+        Additional keyword arguments for the metric function.
+
+    Returns
+    -------
+    tensor : TensorData
+        The metric tensors in the given colour space.
+    """
+    d = dat.get(sp)
+    h = step * (1 + np.max(np.abs(d), -1))
+    # Directions e_0, e_1, e_2, then e_i + e_j and e_i - e_j for the
+    # off-diagonal packed components 3, 4, 5
+    eye = np.eye(3)
+    plus = eye[misc.sym_i[3:]] + eye[misc.sym_j[3:]]
+    minus = eye[misc.sym_i[3:]] - eye[misc.sym_j[3:]]
+    dirs = np.concatenate((eye, plus, minus))
+    dirs = np.concatenate((dirs, -dirs))
+    displaced = d + h[..., np.newaxis] * \
+        dirs.reshape((18,) + (1,) * (d.ndim - 1) + (3,))
+    f2 = np.asarray(metric_function(
+        dat, data.Data(sp, displaced), **kwargs))**2
+    f2 = np.broadcast_to(f2, (18,) + d.shape[:-1]).reshape((18, -1))
+    q = (f2[:9] + f2[9:]) / (2 * h.reshape(-1)**2)  # dx^T g dx per direction
+    g = np.empty((q.shape[1], 6))
+    g[:, :3] = q[:3].T
+    g[:, 3:] = ((q[3:6] - q[6:]) / 4).T
+    return data.TensorData(sp, dat, g)
+
+
+# =============================================================================
+# Precomputed tensor fields
+# =============================================================================
+
+
+def _sym_function(packed, func):
+    """
+    Apply a scalar function to packed symmetric tensors via eigenvalues.
+
+    For the logarithm, the eigenvalues are clamped to 1e-12 times the
+    largest one, so that singular tensors give finite results.
+
+    Parameters
+    ----------
+    packed : ndarray
+        ... x 6 array of packed symmetric tensors.
+    func : function
+        Vectorised scalar function, e.g. np.log or np.exp.
+
+    Returns
+    -------
+    packed : ndarray
+        ... x 6 array of the packed tensors func(g).
+    """
+    w, v = np.linalg.eigh(misc.unpack_sym(packed))
+    if func is np.log:                      # regularise singular tensors
+        w = np.maximum(w, 1e-12 * np.max(w, -1, keepdims=True))
+    return np.einsum('...in,...n->...i', v[..., misc.sym_i, :] *
+                     v[..., misc.sym_j, :], func(w))
+
+
+class TensorField(object):
+    """
+    Metric tensors sampled on a regular grid, with fast interpolation.
+
+    The tensor function is evaluated once on the grid given by the three
+    axes in the given colour space (see data.d_regular), and the packed
+    tensors are stored in that space. At other points, the tensors are
+    interpolated trilinearly, either component-wise or log-Euclidean,
+    i.e., by interpolating the matrix logarithms, which preserves positive
+    definiteness (tensors must then be positive semi-definite on the
+    grid). Outside the grid, the values at the boundary are used.
+
+    A field is called like the tensor functions of this module, returning
+    TensorData, and can thus be used in their place, e.g., in
+    metric.linear.
+    """
+
+    def __init__(self, metric_tensor_function, sp, x_val, y_val, z_val,
+                 log_euclidean=False):
+        """
+        Construct the field by sampling the tensor function on the grid.
+
+        Parameters
+        ----------
+        metric_tensor_function : function
+            Function giving TensorData at given colour data points.
+        sp : Space
+            The colour space of the grid.
+        x_val : ndarray
+            Increasing array of at least two x values.
+        y_val : ndarray
+            Increasing array of at least two y values.
+        z_val : ndarray
+            Increasing array of at least two z values.
+        log_euclidean : bool
+            Whether to interpolate the matrix logarithms of the tensors.
+        """
+        axes = [np.asarray(x_val, dtype=float), np.asarray(y_val, dtype=float),
+                np.asarray(z_val, dtype=float)]
+        grid = metric_tensor_function(data.d_regular(sp, *axes))
+        self.set(sp, axes, grid.get_packed(sp), log_euclidean)
+
+    def set(self, sp, axes, packed, log_euclidean):
+        """
+        Set the colour space, grid axes and tensors.
+
+        Parameters
+        ----------
+        sp : Space
+            The colour space of the grid.
+        axes : list
+            The three arrays of grid values.
+        packed : ndarray
+            N x 6 array of packed tensors on the grid, ordered as by
+            data.d_regular.
+        log_euclidean : bool
+            Whether to interpolate the matrix logarithms of the tensors.
+        """
+        self.space = sp
+        self.axes = axes
+        self.log_euclidean = log_euclidean
+        self.packed = np.reshape(packed, tuple(len(ax) for ax in axes) + (6,))
+        if log_euclidean:
+            self.values = _sym_function(self.packed, np.log)
+        else:
+            self.values = self.packed
+
+    def interpolate(self, points):
+        """
+        Return the interpolated packed tensors at the given points.
+
+        Parameters
+        ----------
+        points : ndarray
+            N x 3 array of colour data in the colour space of the field.
+
+        Returns
+        -------
+        packed : ndarray
+            N x 6 array of packed tensors in the colour space of the field.
+        """
+        n = np.shape(points)[0]
+        shape = np.shape(self.values)[:3]
+        index = np.zeros(n, dtype=np.intp)
+        weight = []
+        for k, ax in enumerate(self.axes):
+            step = (ax[-1] - ax[0]) / (len(ax) - 1)
+            if np.allclose(np.diff(ax), step):              # uniform axis
+                i = np.floor((points[:, k] - ax[0]) / step).astype(np.intp)
+            else:
+                i = np.searchsorted(ax, points[:, k], 'right') - 1
+            i = np.clip(i, 0, len(ax) - 2)
+            t = np.clip((points[:, k] - ax[i]) / (ax[i + 1] - ax[i]), 0, 1)
+            index = index * shape[k] + i
+            weight.append(t)
+        values = np.reshape(self.values, (-1, 6))
+        packed = np.zeros((n, 6))
+        for corner in np.ndindex(2, 2, 2):
+            w = np.where(corner[0], weight[0], 1 - weight[0])
+            w *= np.where(corner[1], weight[1], 1 - weight[1])
+            w *= np.where(corner[2], weight[2], 1 - weight[2])
+            offset = (corner[0] * shape[1] + corner[1]) * shape[2] + corner[2]
+            packed += w[:, np.newaxis] * np.take(values, index + offset, 0)
+        if self.log_euclidean:
+            packed = _sym_function(packed, np.exp)
+        return packed
+
+    def __call__(self, dat):
+        """
+        Return the interpolated metric tensors at the given points.
+
+        Parameters
+        ----------
+        dat : Data
+            The colour points for which to compute the metric.
+
+        Returns
+        -------
+        tensors : TensorData
+            The metric tensors.
+        """
+        return data.TensorData(self.space, dat,
+                               self.interpolate(dat.get_linear(self.space)))
+
+    def save(self, filename):
+        """
+        Save the field to a NumPy .npz file.
+
+        The colour space is stored by name, see space.space_name.
+
+        Parameters
+        ----------
+        filename : str
+            The file name.
+        """
+        np.savez(filename, space=space.space_name(self.space),
+                 x_val=self.axes[0], y_val=self.axes[1], z_val=self.axes[2],
+                 packed=self.packed, log_euclidean=self.log_euclidean)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a field saved by save.
+
+        Parameters
+        ----------
+        filename : str
+            The file name.
+
+        Returns
+        -------
+        field : TensorField
+            The loaded field.
+        """
+        f = np.load(filename)
+        field = cls.__new__(cls)
+        field.set(getattr(space, str(f['space'])),
+                  [f['x_val'], f['y_val'], f['z_val']], f['packed'],
+                  bool(f['log_euclidean']))
+        return field
+
+
 # =============================================================================
 # Test module
 # =============================================================================
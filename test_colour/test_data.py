@@ -22,3 +22,64 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import numpy as np
+from colour import data, space, tensor
+
+
+class TestTensorData(unittest.TestCase):
+
+    def test_packed_storage(self):
+        d = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                           np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        g = tensor.dE_00(d)
+        self.assertEqual(g.get_packed(space.xyz).shape, (27, 6))     # Stored packed
+        self.assertEqual(g.get(space.xyz).shape, (27, 3, 3))         # Expanded on request
+        self.assertTrue(np.allclose(g.get(space.cielab),
+                                    np.transpose(g.get(space.cielab), (0, 2, 1))))
+
+        # Full and packed input give the same tensor data
+        g_full = data.TensorData(space.ciede00lch, d, g.get(space.ciede00lch))
+        self.assertTrue(np.allclose(g_full.get_packed(space.cielab), g.get_packed(space.cielab)))
+
+    def test_ellipse_parameters(self):
+        d = data.Data(space.cielab, np.array([[50., 10., 10.], [50., 0., 0.]]))
+        theta = np.pi / 6
+        a, b = 2., 1.
+        g = np.zeros((2, 3, 3))
+        g[:, 0, 0] = 1
+        g[:, 1, 1] = (np.cos(theta) / a)**2 + (np.sin(theta) / b)**2
+        g[:, 2, 2] = (np.sin(theta) / a)**2 + (np.cos(theta) / b)**2
+        g[:, 1, 2] = np.cos(theta) * np.sin(theta) * (1 / a**2 - 1 / b**2)
+        g[:, 2, 1] = g[:, 1, 2]
+        g[1, 1, 2] = g[1, 2, 1] = 0                                   # Axis aligned ellipse
+        g[1, 1, 1] = 1 / b**2
+        g[1, 2, 2] = 1 / a**2
+        tdata = data.TensorData(space.cielab, d, g)
+        abt = tdata.get_ellipse_parameters(space.cielab, tdata.plane_ab)
+        # The same ellipse, with the axes swapped and rotated by pi/2
+        self.assertTrue(np.allclose(abt, [[b, a, theta - np.pi / 2], [b, a, 0]]))
+
+    def test_ancestor_conversion(self):
+        d = data.Data(space.cielch, np.array([[50., 20., 1.], [30., 10., -2.]]))
+        lab = d.get(space.cielab)                                     # Converted via to_base only
+        self.assertNotIn(space.xyz, d.data)
+        self.assertTrue(np.allclose(lab, space.cielab.from_XYZ(d.linear_XYZ)))
+        g = data.TensorData(space.cielch, d, np.array([np.diag([1., 2., 3.])] * 2))
+        g_lab = g.get(space.cielab)                                   # Pulled back via polar only
+        jac = np.matmul(space.cielch.jacobian_XYZ(d), space.cielab.inv_jacobian_XYZ(d))
+        g_ref = np.einsum('nki,nkl,nlj->nij', jac, g.get(space.cielch), jac)
+        self.assertTrue(np.allclose(g_lab, g_ref))
+
+    def test_covariance(self):
+        d = data.Data(space.srgb, np.array([[.2, .5, .7], [.9, .3, .4]]))
+        A = np.random.randn(2, 3, 3) * 1e-3
+        cov = np.matmul(A, np.swapaxes(A, 1, 2))
+        c = data.CovarianceData(space.srgb, d, cov)
+        for sp in [space.cielab, space.ciede00lch, space.xyz]:
+            jac = np.matmul(sp.jacobian_XYZ(d), space.srgb.inv_jacobian_XYZ(d))
+            ref = np.einsum('nik,nkl,njl->nij', jac, cov, jac)
+            self.assertTrue(np.allclose(c.get(sp), ref))
+        self.assertTrue(np.allclose(c.get_std(space.cielab) ** 2,
+                                    np.diagonal(c.get(space.cielab), axis1=1, axis2=2)))
+        c_lab = data.CovarianceData(space.cielab, d, c.get(space.cielab))
+        self.assertTrue(np.allclose(c_lab.get(space.srgb), cov))
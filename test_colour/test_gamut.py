@@ -21,9 +21,11 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import os
+import tempfile
 import unittest
 import numpy as np
-from colour import data, gamut, space
+from colour import data, gamut, metric, space
 import matplotlib.pyplot as plt
 
 # Global variables.
@@ -134,6 +136,26 @@ class TestGamut(unittest.TestCase):
         a = g.is_inside(space.srgb, c_data)
         self.assertTrue(np.allclose(a, np.zeros(a.shape)))             # Assert that all points lie without the gamut
 
+    def test_in_half_spaces(self):
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, cube))
+        points = np.random.rand(20, 30, 3) * 14 - 2
+        a = g.is_inside(space.srgb, data.Data(space.srgb, points), block=100)
+        self.assertEqual(a.shape, points.shape[:-1])
+        self.assertTrue(np.array_equal(a, np.all((points >= 0) & (points <= 10), -1)))
+        self.assertTrue(np.all(g.in_half_spaces(cube)))                 # Points on the surface are inside
+        self.assertFalse(np.any(g.in_half_spaces(cube[g.vertices] * 1.01 - .05)))  # Just outside
+
+    def test_is_inside_modified(self):
+        points = polyhedron.copy()
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, points), gamma=.5, center=np.array([30., 25., 28.]))
+        self.assertTrue(np.array_equal(points, polyhedron))                 # The gamut data are not modified
+        q = np.random.RandomState(0).rand(5, 10, 3) * 60
+        a = g.is_inside(space.srgb, data.Data(space.srgb, q))
+        self.assertEqual(a.shape, q.shape[:-1])
+        b = [g.feito_torres(p) for p in g.modify_radius(q.reshape((-1, 3)))]  # The hull is convex when mapped
+        self.assertTrue(np.array_equal(a.ravel(), b))
+        self.assertTrue(np.any(a) and not np.all(a))
+
     def test_get_vertices(self):
         # Test for gamut.Gamut.get_vertices
         c_data = data.Data(space.srgb, cube)  # Generating the colour Data object
@@ -531,7 +553,7 @@ class TestGamut(unittest.TestCase):
 
         d = g.find_plane(p_data)
         r = np.array([-0.57735027, -0.57735027, -0.57735027, -0.57735027])
-        np.alltrue(d == r)
+        np.all(d == r)
         print("find plane:", d)                 # Normalvektor xyz and distance.
 
     def test_intersectionpoint_on_line(self):
@@ -543,5 +565,185 @@ class TestGamut(unittest.TestCase):
         a = g.intersectionpoint_on_line(d, center, sp)
         print("Nearest point:", a)
 
+    def test_intersectionpoints_on_lines(self):
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, cube))
+        d = np.random.rand(100, 3) * 30 - 10
+        d[0] = [5, 5, 20]                       # Line through the edge midpoints of facets
+        d[1] = [20, 20, 20]                     # Line through a vertex
+        p = g.intersectionpoints_on_lines(d, [5, 5, 5], space.srgb, block=30)
+        radius = np.max(np.abs(d - 5), -1, keepdims=True)
+        outside = radius[:, 0] > 5
+        self.assertTrue(np.allclose(p[outside], 5 + (d[outside] - 5) * 5 / radius[outside]))
+        self.assertTrue(np.all(np.isnan(p[~outside])))
+
+        center = d[::-1] / 10 + 3               # One center for each line, all inside the gamut
+        p = g.intersectionpoints_on_lines(d, center, space.srgb)
+        self.assertTrue(np.allclose(np.min(np.minimum(p[outside], 10 - p[outside]), -1), 0))
+        self.assertTrue(np.allclose(np.cross(p - center, d - center)[outside], 0))
+
+    def test_facet_tree(self):
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, self.generate_sphere(10, 500)))
+        tree = g.get_tree(space.srgb, leaf_size=4)
+        self.assertIs(g.get_tree(space.srgb), tree)
+        self.assertTrue(np.array_equal(np.sort(tree.order), np.arange(len(g.simplices))))
+        d = np.random.rand(200, 3) * 30 - 15
+        p = g.intersectionpoints_on_lines(d, [1, 0, 0], space.srgb)
+        self.assertTrue(np.allclose(g.intersectionpoints_on_lines(d, [1, 0, 0], space.srgb, tree=True), p,
+                                    equal_nan=True))
+        c_data = data.Data(space.srgb, d)
+        self.assertTrue(np.array_equal(g.is_inside(space.srgb, c_data, tree=True), g.is_inside(space.srgb, c_data)))
+        self.assertTrue(np.array_equal(g.is_inside(space.srgb, c_data, block=7, tree=True),
+                                       g.is_inside(space.srgb, c_data, tree=True)))
+        self.assertTrue(np.allclose(g.intersectionpoints_on_lines(d, [1, 0, 0], space.srgb, block=7, tree=True), p,
+                                    equal_nan=True))
+        nearest, distance = tree.nearest(d)
+        nearest_block, distance_block = tree.nearest(d, block=7)
+        self.assertTrue(np.array_equal(nearest_block, nearest) and np.array_equal(distance_block, distance))
+
+        # Nearest points, compared with all facets
+        nearest = g.nearest_points(space.srgb, c_data)
+        facets = np.tile(np.arange(len(g.simplices)), len(d))
+        closest = tree.closest_points(np.repeat(d, len(g.simplices), 0), facets)
+        distance = np.min(np.linalg.norm(closest.reshape((len(d), -1, 3)) - d[:, np.newaxis], axis=-1), -1)
+        self.assertTrue(np.allclose(np.linalg.norm(nearest - d, axis=-1), distance))
+        signed = g.signed_distance(space.srgb, c_data)
+        self.assertTrue(np.allclose(np.abs(signed), distance))
+        self.assertTrue(np.array_equal(signed < 0, g.is_inside(space.srgb, c_data)))
+
+        # Cube: the nearest points of outside points are clipped coordinates
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, cube))
+        d = np.random.rand(20, 3) * 10 + [12, 0, 0]
+        self.assertTrue(np.allclose(g.nearest_points(space.srgb, data.Data(space.srgb, d)), np.clip(d, 0, 10)))
+
+        # Lines parallel to an axis, lying on a bound of the root box
+        tree = g.get_tree(space.srgb)
+        tree.lo[0, 2] = 5
+        p = g.intersectionpoints_on_lines(np.array([[20., 5, 5], [5, 20, 5]]), [5, 5, 5], space.srgb, tree=True)
+        self.assertTrue(np.allclose(p, [[10, 5, 5], [5, 10, 5]]))
+
+        # Modified convex hull
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, polyhedron.copy()), gamma=.5,
+                        center=np.array([30., 25., 28.]))
+        c_data = data.Data(space.srgb, np.random.rand(100, 3) * 60)
+        self.assertTrue(np.array_equal(g.is_inside(space.srgb, c_data, tree=True), g.is_inside(space.srgb, c_data)))
+
+    def test_map_toward_center(self):
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, cube))
+        d = np.random.rand(10, 20, 3) * 30 - 10
+        mapped = g.map_toward_center(space.srgb, data.Data(space.srgb, d))
+        self.assertEqual(mapped.sh, d.shape)
+        radius = np.max(np.abs(d - 5), -1)[..., np.newaxis]
+        self.assertTrue(np.allclose(mapped.get(space.srgb), 5 + (d - 5) * np.minimum(1, 5 / radius)))
+        tiled = g.map_toward_center(space.srgb, data.Data(space.srgb, d), tile=7, tree=True)
+        self.assertTrue(np.allclose(tiled.get(space.srgb), mapped.get(space.srgb)))
+
+        # Lightness dependent center, with the neutral axis along the first coordinate
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, cube - [0, 5, 5]))
+        d = np.random.rand(100, 3) * [10, 20, 20] - [0, 10, 10]
+        mapped = g.map_toward_center(space.srgb, data.Data(space.srgb, d), center='lightness').get(space.srgb)
+        radius = np.max(np.abs(d[:, 1:]), -1)[:, np.newaxis]
+        self.assertTrue(np.allclose(mapped[:, 0], d[:, 0]))
+        self.assertTrue(np.allclose(mapped[:, 1:], d[:, 1:] * np.minimum(1, 5 / radius)))
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, cube + [0, 20, 20]))   # Away from the neutral axis
+        self.assertRaises(ValueError, g.map_toward_center, space.srgb, data.Data(space.srgb, d), center='lightness')
+
+        # Modified convex hull, mapped along the radial lines in the mapped coordinates
+        rng = np.random.RandomState(3)
+        g = gamut.Gamut(space.srgb, data.Data(space.srgb, rng.rand(40, 3) * 50), gamma=.5, center=np.full(3, 25.))
+        c_data = data.Data(space.srgb, rng.rand(2000, 3) * 100 - 25)
+        mapped = g.map_toward_center(space.srgb, c_data)
+        self.assertTrue(np.all(g.is_inside(space.srgb, mapped)))
+        self.assertTrue(np.allclose(g.map_toward_center(space.srgb, c_data, tree=True).get(space.srgb),
+                                    mapped.get(space.srgb)))
+        outside = ~g.is_inside(space.srgb, c_data)
+        self.assertTrue(np.allclose(mapped.get(space.srgb)[~outside], c_data.get(space.srgb)[~outside]))
+        beyond = 25 + (mapped.get(space.srgb)[outside] - 25) * 1.01        # Just outside, on the same rays
+        self.assertFalse(np.any(g.is_inside(space.srgb, data.Data(space.srgb, beyond))))
+        self.assertRaises(ValueError, g.map_toward_center, space.srgb, c_data, center='lightness')
+        self.assertRaises(ValueError, g.map_toward_center, space.cielab, c_data)
+        self.assertRaises(ValueError, g.nearest_points, space.srgb, c_data)
+
+    def test_map_minimum_difference(self):
+        lo, hi = np.array([30., -20, -20]), np.array([70., 20, 20])
+        box = np.array(np.meshgrid(*zip(lo, hi))).reshape((3, -1)).T
+        g = gamut.Gamut(space.cielab, data.Data(space.cielab, box))
+        rng = np.random.RandomState(0)          # dE_00 is not convex, the refinement finds local minima
+        d = rng.rand(4, 5, 3) * [80, 100, 100] + [10, -50, -50]
+        c_data = data.Data(space.cielab, d)
+        mapped = g.map_minimum_difference(space.cielab, c_data, metric.dE_ab)
+        self.assertEqual(mapped.sh, d.shape)
+        self.assertTrue(np.allclose(mapped.get(space.cielab), np.clip(d, lo, hi)))   # Euclidean projection
+
+        # dE_00 at least as good as the best point on a grid on the surface
+        mapped = g.map_minimum_difference(space.cielab, c_data, tile=7)
+        self.assertTrue(np.all(g.is_inside(space.cielab, mapped, tol=1e-6)))
+        surface = []
+        for i in range(3):
+            for value in (lo[i], hi[i]):
+                axes = [np.linspace(lo[j], hi[j], 41) if j != i else [value] for j in range(3)]
+                surface.append(np.array(np.meshgrid(*axes)).reshape((3, -1)).T)
+        surface = data.Data(space.cielab, np.vstack(surface))
+        diff = metric.dE_00(c_data, mapped)
+        for point, point_diff in zip(d.reshape((-1, 3)), diff.ravel()):
+            self.assertLessEqual(point_diff, np.min(metric.dE_00(data.Data(space.cielab, point), surface)) + 1e-6)
+
+        # Polyhedral sphere, compared with points sampled on the facets
+        sphere = rng.normal(size=(200, 3))
+        sphere = [50, 0, 0] + 30 * sphere / np.linalg.norm(sphere, axis=-1, keepdims=True)
+        g = gamut.Gamut(space.cielab, data.Data(space.cielab, sphere))
+        d = rng.normal(size=(50, 3))
+        d = [50, 0, 0] + d / np.linalg.norm(d, axis=-1, keepdims=True) * rng.uniform(32, 40, (50, 1))
+        c_data = data.Data(space.cielab, d)
+        mapped = g.map_minimum_difference(space.cielab, c_data)
+        self.assertTrue(np.all(g.is_inside(space.cielab, mapped, tol=1e-6)))
+        diff = metric.dE_00(c_data, mapped)
+        nearest = data.Data(space.cielab, g.nearest_points(space.cielab, c_data))
+        self.assertTrue(np.all(diff <= metric.dE_00(c_data, nearest) + 1e-10))
+        u, v = np.meshgrid(np.linspace(0, 1, 11), np.linspace(0, 1, 11))
+        weights = np.column_stack((u.ravel(), v.ravel(), 1 - u.ravel() - v.ravel()))[u.ravel() + v.ravel() <= 1]
+        surface = np.einsum('kj,fjc->fkc', weights, g.get_facets(space.cielab))
+        surface = data.Data(space.cielab, surface.reshape((-1, 3)))
+        self.assertTrue(np.all(diff <= np.min(metric.pairwise(metric.dE_00, c_data, surface), -1) + 1e-6))
+
+    def test_boundary_descriptor(self):
+        sphere = self.generate_sphere(10, 2000) + [50, 0, 0]
+        g = gamut.Gamut(space.cielab, data.Data(space.cielab, sphere))
+        descriptor = gamut.BoundaryDescriptor(g, space.cielab, 30, 60, center=[50, 0, 0])
+        self.assertEqual(descriptor.radius.shape, (31, 60))
+        self.assertTrue(np.all((descriptor.radius > 9.5) & (descriptor.radius <= 10 + 1e-10)))
+
+        directions = self.generate_sphere(1, 100)
+        inside = data.Data(space.cielab, [50, 0, 0] + 9 * directions.reshape((10, 10, 3)))
+        outside = data.Data(space.cielab, [50, 0, 0] + 11 * directions)
+        self.assertTrue(np.all(descriptor.is_inside(inside)))
+        self.assertEqual(descriptor.is_inside(inside).shape, (10, 10))
+        self.assertFalse(np.any(descriptor.is_inside(outside)))
+        boundary = descriptor.boundary_points(outside)
+        self.assertTrue(np.allclose(boundary, [50, 0, 0] + 10 * directions, atol=.5))
+
+        hue = np.linspace(-np.pi, np.pi, 7)
+        cusp = descriptor.cusp(hue)
+        chroma = np.linalg.norm(cusp[:, 1:], axis=-1)       # On the faceted sphere, the cusp is near the equator
+        self.assertTrue(np.all((chroma > 9.5) & (chroma <= 10 + 1e-10)))
+        self.assertTrue(np.allclose(cusp[:, 1:], chroma[:, np.newaxis] * np.array([np.cos(hue), np.sin(hue)]).T))
+        self.assertTrue(np.all(np.abs(cusp[:, 0] - 50) < 10 * np.sin(np.arccos(.95))))
+
+        # Modified convex hull, around its center of expansion
+        rng = np.random.RandomState(3)
+        modified = gamut.Gamut(space.cielab, data.Data(space.cielab, rng.rand(40, 3) * 50), gamma=.5,
+                               center=np.full(3, 25.))
+        m_descriptor = gamut.BoundaryDescriptor(modified, space.cielab, 10, 20)
+        nodes = data.Data(space.cielab, 25 + m_descriptor.radius[..., np.newaxis] * m_descriptor.directions(
+            *np.meshgrid(np.linspace(0, np.pi, 11), np.linspace(-np.pi, np.pi, 21)[:-1], indexing='ij')))
+        self.assertTrue(np.all(modified.is_inside(space.cielab, nodes)))
+        self.assertRaises(ValueError, gamut.BoundaryDescriptor, modified, space.cielab, center=[30, 25, 25])
+
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'descriptor.npz')
+            descriptor.save(filename)
+            loaded = gamut.BoundaryDescriptor.load(filename)
+        self.assertIs(loaded.space, space.cielab)
+        self.assertTrue(np.array_equal(loaded.boundary_points(outside), boundary))
+
 if __name__ == '__main__':
     unittest.main(exit=False)
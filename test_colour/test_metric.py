@@ -21,4 +21,250 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import functools
 import unittest
+import numpy as np
+from colour import data, space, tensor, metric, misc
+
+
+class TestMetric(unittest.TestCase):
+
+    def test_linear(self):
+        d1 = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                            np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        d2 = data.Data(space.cielab, d1.get(space.cielab) + .5)
+        self.assertTrue(np.allclose(metric.linear(space.cielab, d1, d2, tensor.dE_ab),
+                                    metric.dE_ab(d1, d2)))
+        lin = metric.linear(space.ciede00lch, d1, d2, tensor.dE_00)
+        lch1, lch2 = d1.get(space.ciede00lch), d2.get(space.ciede00lch)
+        g = tensor.dE_00(data.Data(space.ciede00lch, (lch1 + lch2) / 2)).get(space.ciede00lch)
+        diff = lch1 - lch2
+        self.assertTrue(np.allclose(lin, np.sqrt(np.einsum('ni,nij,nj->n', diff, g, diff)),
+                                    rtol=1e-12, atol=0))    # Full tensors
+        self.assertTrue(np.allclose(lin, metric.dE_00(d1, d2), rtol=4e-2))  # Linearisation error
+
+    def test_broadcast_reference(self):
+        d1 = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                            np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        lab = np.array([50., 10., -20.])
+        ref = metric.Reference(data.Data(space.cielab, lab))
+        tiled = data.Data(space.cielab, np.tile(lab, (27, 1)))
+        for met in [metric.dE_ab, metric.dE_00, metric.dE_DIN99]:
+            self.assertTrue(np.allclose(met(ref, d1), met(tiled, d1)))
+        self.assertTrue(np.allclose(metric.linear(space.cielab, d1, ref, tensor.dE_ab),
+                                    metric.dE_ab(d1, tiled)))
+
+        # Image rows against a reference row
+        img = data.Data(space.cielab, np.reshape(d1.get(space.cielab), (3, 9, 3)))
+        row = metric.Reference(data.Data(space.cielab, d1.get(space.cielab)[:9]))
+        self.assertEqual(metric.dE_00(img, row).shape, (3, 9))
+        self.assertTrue(np.allclose(metric.dE_00(img, row)[0], 0))
+
+    def test_dE_00_fused(self):
+        rng = np.random.RandomState(1)
+        lab = np.column_stack((rng.uniform(0, 100, 1000),
+                               rng.uniform(-100, 100, (1000, 2))))
+        d1 = data.Data(space.cielab, lab)
+        d2 = data.Data(space.cielab, lab[::-1])
+        for k in [(1, 1, 1), (2, 1.5, .7)]:
+            self.assertTrue(np.array_equal(metric.dE_00_fused(d1, d2, *k, block=300),
+                                           metric.dE_00(d1, d2, *k)))
+        img = data.Data(space.cielab, np.reshape(lab, (10, 100, 3)))
+        ref = metric.Reference(data.Data(space.cielab, lab[:100]))
+        self.assertTrue(np.array_equal(metric.dE_00_fused(img, ref), metric.dE_00(img, ref)))
+        s1 = data.Data(space.cielab, lab[0])
+        s2 = data.Data(space.cielab, lab[1])
+        self.assertEqual(metric.dE_00_fused(s1, s2), metric.dE_00(s1, s2))
+        try:
+            import numexpr                                      # noqa: F401
+        except ImportError:
+            return
+        self.assertTrue(np.allclose(metric.dE_00_fused(d1, d2, backend='numexpr'),
+                                    metric.dE_00(d1, d2)))
+
+    def test_fast_math(self):
+        rng = np.random.RandomState(3)
+        rgb = rng.uniform(0, 1, (1000, 3))
+        d1 = data.Data(space.srgb, rgb)
+        d2 = data.Data(space.srgb, rgb[::-1])
+        exact = metric.dE_00(d1, d2)
+        self.assertTrue(np.max(np.abs(metric.dE_00(d1, d2, fast=True) - exact)) < 1e-4)
+        with misc.fast_math():
+            f1 = data.Data(space.srgb, rgb)
+            f2 = data.Data(space.srgb, rgb[::-1])
+            self.assertTrue(np.max(np.abs(metric.dE_00(f1, f2) - exact)) < 1e-4)
+            g = tensor.dE_00(f1).get_tensor(space.ciede00lch).full(1000)
+        self.assertTrue(np.allclose(g, tensor.dE_00(d1).get_tensor(space.ciede00lch).full(1000),
+                                    rtol=1e-5))
+        rgb[0] = np.nan                     # Invalid colours give NaN, not errors
+        with np.errstate(invalid='ignore'), misc.fast_math():
+            diff = metric.dE_00(data.Data(space.srgb, rgb), data.Data(space.srgb, rgb[::-1]))
+        self.assertTrue(np.isnan(diff[0]) and np.isnan(diff[-1]) and not np.any(np.isnan(diff[1:-1])))
+
+    def test_gradient(self):
+        rng = np.random.RandomState(4)
+        rgb1 = rng.uniform(.05, .95, (200, 3))
+        rgb2 = np.clip(rgb1 + rng.normal(0, .05, (200, 3)), .01, .99)
+        d1 = data.Data(space.srgb, rgb1)
+        d2 = data.Data(space.srgb, rgb2)
+        eps = 1e-6
+        for met in [metric.dE_ab, metric.dE_uv, metric.dE_00, metric.dE_DIN99d]:
+            for sp in [metric.metric_spaces[met], space.cielab, space.srgb]:
+                for wrt in [1, 2]:
+                    grad = metric.gradient(met, d1, d2, sp, wrt)
+                    x = [d1, d2][wrt - 1].get(sp)
+                    for i in range(3):
+                        e = np.zeros(3)
+                        e[i] = eps
+                        dp = [d1, d2]
+                        dm = [d1, d2]
+                        dp[wrt - 1] = data.Data(sp, x + e)
+                        dm[wrt - 1] = data.Data(sp, x - e)
+                        fd = (met(*dp) - met(*dm)) / (2 * eps)
+                        self.assertTrue(np.allclose(grad[:, i], fd, atol=1e-5))
+        ref = metric.Reference(data.Data(space.srgb, rgb1[0]))
+        single = data.Data(space.srgb, rgb1[0])
+        self.assertTrue(np.allclose(metric.gradient(metric.dE_00, ref, d2, space.srgb),
+                                    metric.gradient(metric.dE_00, single, d2, space.srgb)))
+        self.assertTrue(np.all(metric.gradient(metric.dE_00, d1, d1) == 0))
+
+    def test_uncertainty(self):
+        rng = np.random.RandomState(5)
+        rgb1 = rng.uniform(.2, .8, (50, 3))
+        rgb2 = np.clip(rgb1 + rng.normal(0, .05, (50, 3)), .01, .99)
+        d1 = data.Data(space.srgb, rgb1)
+        d2 = data.Data(space.srgb, rgb2)
+        A = rng.randn(50, 3, 3) * 1e-3
+        cov = np.matmul(A, np.swapaxes(A, 1, 2))
+        c1 = data.CovarianceData(space.srgb, d1, cov)
+        c2 = data.CovarianceData(space.srgb, d2, cov[::-1])
+        for met in [metric.dE_ab, metric.dE_00]:
+            diff, std = metric.uncertainty(met, c1, c2)
+            self.assertTrue(np.allclose(diff, met(d1, d2)))
+            g1 = metric.gradient(met, d1, d2, space.srgb, 1)
+            g2 = metric.gradient(met, d1, d2, space.srgb, 2)
+            var = np.einsum('ni,nij,nj->n', g1, cov, g1) + \
+                np.einsum('ni,nij,nj->n', g2, cov[::-1], g2)
+            self.assertTrue(np.allclose(std, np.sqrt(var)))
+            self.assertTrue(np.all(metric.uncertainty(met, d1, d2)[1] == 0))
+
+    def test_geodesic(self):
+        rng = np.random.RandomState(6)
+        lab1 = np.column_stack((rng.uniform(20, 80, 20), rng.uniform(-60, 60, (20, 2))))
+        lab2 = np.column_stack((rng.uniform(20, 80, 20), rng.uniform(-60, 60, (20, 2))))
+        d1 = data.Data(space.cielab, lab1)
+        d2 = data.Data(space.cielab, lab2)
+        self.assertTrue(np.allclose(metric.geodesic(space.cielab, d1, d2, tensor.dE_ab),
+                                    metric.dE_ab(d1, d2)))
+        pd = space.TransformPoincareDisk(space.cielab, R=100)
+
+        def poincare(dat):
+            return tensor.poincare_disk(pd, dat)
+        exact = metric.poincare_disk(pd, d1, d2)
+        dist, paths = metric.geodesic(pd, d1, d2, poincare, n=16, return_paths=True)
+        self.assertTrue(np.allclose(dist, exact, rtol=1e-3))
+        self.assertFalse(np.allclose(metric.linear(pd, d1, d2, poincare), exact, rtol=1e-3))
+        self.assertEqual(paths.shape, (20, 17, 3))
+        self.assertTrue(np.allclose(paths[:, 0], d1.get(pd)))
+        self.assertTrue(np.allclose(paths[:, -1], d2.get(pd)))
+        field = tensor.TensorField(poincare, pd, np.linspace(0, 100, 6),
+                                   np.linspace(-.9, .9, 19), np.linspace(-.9, .9, 19))
+        self.assertTrue(np.allclose(metric.geodesic(pd, d1, d2, field, field=field),
+                                    metric.geodesic(pd, d1, d2, field), rtol=1e-4))
+
+        # Grid paths: diagonal steps with mixed signs are single edges
+        field = tensor.TensorField(tensor.dE_ab, space.cielab, *[np.linspace(0, 4, 5)] * 3)
+        p1 = np.array([[0., 4, 0], [0, 0, 0], [2, 2, 2]])
+        p2 = np.array([[4., 0, 0], [4, 0, 0], [2, 2, 2]])
+        paths = metric._graph_paths(field, p1, p2)
+        self.assertTrue(np.allclose(paths[0], [[0, 4, 0], [1, 3, 0], [2, 2, 0], [3, 1, 0], [4, 0, 0]]))
+        self.assertTrue(np.allclose(paths[1], np.arange(5)[:, np.newaxis] * [1, 0, 0]))
+        self.assertTrue(np.allclose(paths[2], [[2, 2, 2], [2, 2, 2]]))
+
+    def test_pairwise(self):
+        d1 = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                            np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        d2 = data.Data(space.cielab, d1.get(space.cielab)[::2] + [1., -2., .5])
+        for met in [metric.dE_ab, metric.dE_00]:
+            ref = np.array([met(data.Data(space.cielab, lab), d2)
+                            for lab in d1.get(space.cielab)])
+            dist = metric.pairwise(met, d1, d2, block=5, n_threads=2)
+            self.assertTrue(np.allclose(dist, ref))
+            index, dmin = metric.pairwise_argmin(met, d1, d2, block=4)
+            self.assertTrue(np.all(index == np.argmin(ref, axis=1)))
+            self.assertTrue(np.allclose(dmin, np.min(ref, axis=1)))
+        empty = data.Data(space.cielab, np.zeros((0, 3)))
+        index, dmin = metric.pairwise_argmin(metric.dE_00, empty, d2)
+        self.assertEqual(index.shape, (0,))
+        self.assertEqual(dmin.shape, (0,))
+        self.assertEqual(metric.pairwise(metric.dE_00, empty, d2).shape, (0, 14))
+
+    def test_nearest_index(self):
+        rng = np.random.RandomState(0)
+        lib = data.Data(space.srgb, rng.uniform(0, 1, (200, 3)))
+        query = data.Data(space.srgb, rng.uniform(0, 1, (10, 30, 3)))
+        for met in [metric.dE_00, metric.dE_ab, metric.dE_DIN99d]:
+            dist = metric.pairwise(met, query, lib)
+            index = metric.NearestIndex(lib, met)
+            i, d = index.query(query, k=3)
+            self.assertEqual(i.shape, (10, 30, 3))
+            order = np.argsort(dist, axis=1)[:, :3]
+            self.assertTrue(np.all(np.reshape(i, (300, 3)) == order))
+            self.assertTrue(np.allclose(np.reshape(d, (300, 3)),
+                                        np.take_along_axis(dist, order, 1)))
+            inside = index.query_radius(query, 5.)
+            for row, found in zip(dist, inside):
+                self.assertTrue(np.all(found == np.flatnonzero(row <= 5.)))
+            empty = data.Data(space.srgb, np.zeros((0, 3)))
+            self.assertEqual(index.query_radius(empty, 5.), [])
+
+    def test_pairs_within(self):
+        rng = np.random.RandomState(1)
+        d1 = data.Data(space.srgb, rng.uniform(0, 1, (300, 3)))
+        d2 = data.Data(space.srgb, rng.uniform(0, 1, (5, 20, 3)))
+        for met in [metric.dE_00, metric.dE_ab]:
+            dist = metric.pairwise(met, d1, d1)
+            pairs, d = metric.pairs_within(met, d1, 8.)
+            i, j = np.nonzero(np.triu(dist <= 8., 1))
+            self.assertTrue(np.all(pairs == np.column_stack((i, j))))
+            self.assertTrue(np.allclose(d, dist[i, j]))
+            dist = metric.pairwise(met, d1, d2)
+            pairs, d = metric.pairs_within(met, d1, 8., d2)
+            i, j = np.nonzero(dist <= 8.)
+            self.assertTrue(np.all(pairs == np.column_stack((i, j))))
+            self.assertTrue(np.allclose(d, dist[i, j]))
+
+    def test_evaluate(self):
+        d1 = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                            np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        lab = np.reshape(d1.get(space.cielab), (3, 9, 3))
+        d1 = data.Data(space.cielab, lab)
+        d2 = data.Data(space.cielab, lab + [1., -1., .5])
+        plan = metric.conversion_plan([space.din99, space.ciede00lch])
+        self.assertEqual(plan[:2], [space.xyz, space.cielab])         # Shared prefix first
+        for block in [None, 5]:
+            res = metric.evaluate(d1, d2, block=block)
+            self.assertEqual(len(res), len(metric.all_metrics))
+            for met in metric.all_metrics:
+                self.assertTrue(np.allclose(res[met.__name__], met(d1, d2)))
+        dE_00_2 = functools.partial(metric.dE_00, k_L=2)
+        res = metric.evaluate(d1, d2, metrics=[dE_00_2, metric.dE_ab], block=5)
+        self.assertTrue(np.allclose(res[repr(dE_00_2)], metric.dE_00(d1, d2, k_L=2)))
+        res = metric.evaluate(d1, d2, metrics={'dE_00_2': dE_00_2})
+        self.assertTrue(np.allclose(res['dE_00_2'], metric.dE_00(d1, d2, k_L=2)))
+
+    def test_accumulate(self):
+        rng = np.random.RandomState(2)
+        pairs = []
+        for i in range(3):
+            rgb = rng.uniform(0, 1, (20, 30, 3))
+            pairs.append((data.Data(space.srgb, rgb),
+                          data.Data(space.srgb, np.clip(rgb + .05, 0, 1))))
+        stats = metric.accumulate(iter(pairs), [metric.dE_00, metric.dE_ab], block=250)
+        for met in [metric.dE_00, metric.dE_ab]:
+            diff = np.concatenate([met(d1, d2).ravel() for d1, d2 in pairs])
+            self.assertEqual(stats[met.__name__].n, 1800)
+            self.assertAlmostEqual(stats[met.__name__].mean, np.mean(diff))
+            self.assertAlmostEqual(stats[met.__name__].max, np.max(diff))
+        stats = metric.accumulate(iter(pairs), {'dE_00_2': functools.partial(metric.dE_00, k_L=2)})
+        self.assertEqual(stats['dE_00_2'].n, 1800)
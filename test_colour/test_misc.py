@@ -22,3 +22,83 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import numpy as np
+from colour import misc
+
+
+class TestMisc(unittest.TestCase):
+
+    def test_pack_sym(self):
+        g = np.array([[[1., 6., 5.], [6., 2., 4.], [5., 4., 3.]]])
+        p = misc.pack_sym(g)
+        self.assertEqual(p.shape, (1, 6))
+        self.assertTrue(np.allclose(p, [[1, 2, 3, 4, 5, 6]]))    # Order (00, 11, 22, 12, 02, 01)
+        self.assertTrue(np.allclose(misc.unpack_sym(p), g))
+
+    def test_congruence_sym(self):
+        jac = np.random.randn(10, 3, 3)
+        g = np.random.randn(10, 3, 3)
+        g = g + np.transpose(g, (0, 2, 1))
+        res = misc.congruence_sym(jac, misc.pack_sym(g))
+        full = np.einsum('nki,nkl,nlj->nij', jac, g, jac)
+        self.assertTrue(np.allclose(misc.unpack_sym(res), full))
+
+        # A single tensor is broadcast against all the Jacobians
+        res = misc.congruence_sym(jac, misc.pack_sym(g[0]))
+        full = np.einsum('nki,kl,nlj->nij', jac, g[0], jac)
+        self.assertTrue(np.allclose(misc.unpack_sym(res), full))
+
+    def test_inner_packed(self):
+        x = np.random.randn(10, 3)
+        y = np.random.randn(10, 3)
+        g = np.random.randn(10, 3, 3)
+        g = g + np.transpose(g, (0, 2, 1))
+        p = misc.pack_sym(g)
+        self.assertTrue(np.allclose(misc.inner(x, y, p), misc.inner(x, y, g)))
+        self.assertTrue(np.allclose(misc.norm_sq(x, p), misc.norm_sq(x, g)))
+
+    def test_sym_tensor_congruence(self):
+        jac = np.random.randn(10, 3, 3)
+        d = np.random.rand(10, 3)
+        g = np.random.randn(3, 3)
+        g = g + g.T
+        for st, full in [(misc.SymIdentity(), np.tile(np.eye(3), (10, 1, 1))),
+                         (misc.SymConstant(g), np.tile(g, (10, 1, 1))),
+                         (misc.SymDiagonal(d), np.einsum('ni,ij->nij', d, np.eye(3))),
+                         (misc.SymFull(np.tile(g, (10, 1, 1))), np.tile(g, (10, 1, 1)))]:
+            self.assertTrue(np.allclose(st.full(10), full))
+            res = st.congruence(jac).full(10)
+            self.assertTrue(np.allclose(res, np.einsum('nki,nkl,nlj->nij', jac, full, jac)))
+
+    def test_jacobian_dot(self):
+        M = np.random.randn(3, 3)
+        d = np.random.rand(10, 3) + .5
+        J = np.random.randn(10, 3, 3)
+        jacs = [misc.JacobianIdentity(), misc.JacobianConstant(M),
+                misc.JacobianDiagonal(d), misc.JacobianFull(J)]
+        for a in jacs:
+            self.assertTrue(np.allclose(np.matmul(a.full(10), a.inv().full(10)),
+                                        np.eye(3)))
+            for b in jacs:
+                self.assertTrue(np.allclose(a.dot(b).full(10),
+                                            np.matmul(a.full(10), b.full(10))))
+
+    def test_fast_math(self):
+        self.assertFalse(misc.use_fast_math())
+        with misc.fast_math():
+            self.assertTrue(misc.use_fast_math())
+            self.assertFalse(misc.use_fast_math(False))
+        self.assertFalse(misc.use_fast_math())
+        x = np.linspace(-720, 720, 10001)
+        self.assertTrue(np.max(np.abs(misc.cos_deg(x, True) - misc.cos_deg(x))) < 3e-7)
+        self.assertTrue(np.max(np.abs(misc.sin_deg(x, True) - misc.sin_deg(x))) < 3e-7)
+        lut = misc.LUT(np.sqrt, 1, 4, 1024)
+        x = np.linspace(0, 5, 1001)
+        self.assertTrue(np.allclose(lut(x), np.sqrt(np.clip(x, 1, 4)), atol=lut.max_error * 1.1))
+        x = np.array([np.nan, 2, np.inf, -np.inf])
+        self.assertTrue(np.array_equal(np.isnan(lut(x)), [True, False, True, True]))
+        self.assertTrue(np.all(np.isnan(misc.cos_deg(x[[0, 2]], True))))
+        self.assertAlmostEqual(lut(2.), np.sqrt(2), delta=lut.max_error * 1.1)    # Scalars
+        self.assertAlmostEqual(lut(np.float64(9)), 2)
+        self.assertTrue(np.isnan(lut(np.nan)))
+        self.assertAlmostEqual(misc.cos_deg(60., True), .5, delta=3e-7)
@@ -22,3 +22,79 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import numpy as np
+from colour import data, space, misc
+
+
+class TestSpace(unittest.TestCase):
+
+    def test_jacobian_structured(self):
+        d = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                           np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        for sp in [space.ciecat02, space.srgb, space.rgb_adobe, space.ipt,
+                   space.din99, space.din99d]:
+            jac = sp.jacobian_XYZ(d)
+            ijac = sp.inv_jacobian_XYZ(d)
+            self.assertTrue(np.allclose(np.matmul(jac, ijac), np.eye(3)))
+
+            # Compare with the unstructured chain rule
+            chain = np.eye(3)
+            s = sp
+            while s is not space.xyz:
+                chain = np.matmul(chain, s.jacobian_base(d))
+                s = s.base
+            self.assertTrue(np.allclose(jac, chain))
+        self.assertIsInstance(space.ciecat02.jacobian_XYZ_structured(d),
+                              misc.JacobianConstant)
+
+    def test_jacobian_finite_difference(self):
+        d = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                           np.linspace(-40, 40, 4), np.linspace(-40, 40, 4))
+        xyz = d.get(space.xyz)
+        eps = 1e-7
+        for sp in [space.cielch, space.ciede00lab, space.ciede00lch]:
+            jac = sp.jacobian_XYZ(d)
+            for i in range(3):
+                e = np.zeros(3)
+                e[i] = eps
+                fd = (data.Data(space.xyz, xyz + e).get(sp) -
+                      data.Data(space.xyz, xyz - e).get(sp)) / (2 * eps)
+                self.assertTrue(np.allclose(jac[:, :, i], fd, atol=1e-4))
+
+    def test_jvp(self):
+        d = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                           np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        v = np.random.randn(27, 3)
+        for sp in [space.cielch, space.ciede00lch, space.srgb, space.din99d]:
+            for anc in sp.base_chain():
+                jac = sp.jacobian_ancestor_structured(d, anc).full(27)
+                ijac = sp.inv_jacobian_ancestor_structured(d, anc).full(27)
+                self.assertTrue(np.allclose(sp.jvp(d, v, anc),
+                                            np.einsum('nij,nj->ni', jac, v)))
+                self.assertTrue(np.allclose(sp.vjp(d, v, anc),
+                                            np.einsum('nji,nj->ni', jac, v)))
+                self.assertTrue(np.allclose(sp.inv_jvp(d, v, anc),
+                                            np.einsum('nij,nj->ni', ijac, v)))
+                self.assertTrue(np.allclose(sp.inv_vjp(d, v, anc),
+                                            np.einsum('nji,nj->ni', ijac, v)))
+        self.assertTrue(np.allclose(space.srgb.vjp(d, space.srgb.inv_vjp(d, v)), v))
+
+    def test_srgb_lut(self):
+        class TransformDark(space.TransformSRGB):
+            def to_base(self, ndata):
+                if misc.use_fast_math():
+                    return self._lut('to_base')(ndata)
+                return super(TransformDark, self).to_base(ndata) / 2
+
+        dark = TransformDark(space.srgb.base)
+        rgb = np.random.rand(100, 3)
+        with misc.fast_math():
+            srgb = data.Data(space.srgb, rgb).get(space.xyz)
+            dark_xyz = data.Data(dark, rgb).get(space.xyz)
+        self.assertIsNot(dark._luts, space.srgb._luts)
+        self.assertTrue(np.allclose(dark_xyz, srgb / 2, atol=1e-6))
+
+    def test_space_name(self):
+        self.assertEqual(space.space_name(space.cielab), 'cielab')
+        self.assertIs(getattr(space, space.space_name(space.din99d)), space.din99d)
+        self.assertRaises(ValueError, space.space_name, space.TransformCIELAB(space.xyz))
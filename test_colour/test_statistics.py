@@ -22,3 +22,31 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import numpy as np
+from colour import statistics
+
+
+class TestStatistics(unittest.TestCase):
+
+    def test_streaming_statistics(self):
+        diff = np.random.RandomState(0).gamma(2., 1., 100000)
+        stats = statistics.StreamingStatistics()
+        for i in range(0, len(diff), 7000):
+            stats.update(diff[i:i + 7000])
+        stats.update(np.array([np.nan]))
+        self.assertEqual((stats.n, stats.n_nonfinite), (len(diff), 1))
+        self.assertAlmostEqual(stats.mean, np.mean(diff))
+        self.assertAlmostEqual(stats.std, np.std(diff))
+        self.assertEqual(stats.max, np.max(diff))
+        self.assertTrue(np.all(stats.histogram == np.histogram(diff, stats.bins)[0]))
+        q = np.array([.5, .95, .99])
+        self.assertTrue(np.allclose(stats.quantile(q), np.quantile(diff, q), rtol=5e-3))
+
+        # Merging gives the same as accumulating
+        other = statistics.StreamingStatistics()
+        other.update(diff[:500])
+        rest = statistics.StreamingStatistics()
+        rest.update(diff[500:])
+        other.merge(rest)
+        self.assertAlmostEqual(other.mean, stats.mean)
+        self.assertAlmostEqual(other.variance, stats.variance)
@@ -21,4 +21,65 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
-import unittest
\ No newline at end of file
+import os
+import tempfile
+import unittest
+import numpy as np
+from colour import data, space, tensor, metric, misc
+
+
+class TestTensor(unittest.TestCase):
+
+    def test_euclidean(self):
+        d = data.d_regular(space.cielab, np.linspace(20, 80, 3),
+                           np.linspace(-40, 40, 3), np.linspace(-40, 40, 3))
+        g = tensor.dE_ab(d)
+        self.assertIsInstance(g.get_tensor(space.cielab), misc.SymIdentity)   # No tensors materialised
+        self.assertTrue(np.allclose(g.get(space.cielab), np.eye(3)))
+
+        # Pulled back to XYZ, the identity becomes J^T J
+        jac = space.cielab.jacobian_XYZ(d)
+        self.assertTrue(np.allclose(g.get(space.xyz), np.einsum('nki,nkj->nij', jac, jac)))
+        g_full = data.TensorData(space.cielab, d, np.tile(np.eye(3), (27, 1, 1)))
+        self.assertTrue(np.allclose(g.get(space.cieluv), g_full.get(space.cieluv)))
+
+    def test_tensor_field(self):
+        def affine(dat):                        # Trilinear in the coordinates
+            lab = dat.get_linear(space.cielab)
+            g = np.zeros((np.shape(lab)[0], 6))
+            g[:, :3] = 2 + np.abs(lab) / 100
+            g[:, 3] = lab[:, 1] * lab[:, 2] / 1e5
+            return data.TensorData(space.cielab, dat, g)
+
+        axes = [np.linspace(0, 100, 6), np.linspace(-100, 100, 5), [-100., -20, 0, 50, 100]]
+        field = tensor.TensorField(affine, space.cielab, *axes)
+        lab = np.random.rand(100, 3) * [100, 200, 200] - [0, 100, 100]
+        lab[:, 1:] = np.abs(lab[:, 1:])                      # Keep |a|, |b| linear
+        d = data.Data(space.cielab, lab)
+        self.assertTrue(np.allclose(field(d).get_packed(space.cielab),
+                                    affine(d).get_packed(space.cielab)))
+        grid = data.d_regular(space.cielab, *axes)
+        self.assertTrue(np.allclose(field(grid).get(space.xyz), affine(grid).get(space.xyz)))
+
+        # Log-Euclidean interpolation of dE_00 stays positive definite
+        field = tensor.TensorField(tensor.dE_00, space.cielab, *axes, log_euclidean=True)
+        self.assertTrue(np.all(np.linalg.eigvalsh(field(d).get(space.cielab)) > 0))
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = os.path.join(tmp, 'field.npz')
+            field.save(filename)
+            loaded = tensor.TensorField.load(filename)
+        self.assertIs(loaded.space, space.cielab)
+        self.assertTrue(loaded.log_euclidean)
+        self.assertTrue(np.allclose(loaded(d).get(space.cielab), field(d).get(space.cielab)))
+
+    def test_riemannise(self):
+        lab = np.random.rand(50, 3) * [80, 100, 100] + [10, 10, -50]  # C > 0
+        d = data.Data(space.cielab, lab.reshape(5, 10, 3))
+        g = tensor.riemannise(space.cielab, d, metric.dE_ab).get(space.cielab)
+        self.assertTrue(np.allclose(g, np.eye(3)))
+        d = data.Data(space.cielab, lab)
+        g = tensor.riemannise(space.cielab, d, metric.dE_DIN99).get(space.cielab)
+        self.assertTrue(np.allclose(g, tensor.dE_DIN99(d).get(space.cielab), rtol=1e-5))
+        g = tensor.riemannise(space.cielab, d, metric.dE_00).get(space.cielab)
+        g_00 = tensor.dE_00(d).get(space.cielab)
+        self.assertTrue(np.allclose(g, g_00, rtol=1e-3, atol=1e-3 * np.abs(g_00).max()))